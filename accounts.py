@@ -0,0 +1,226 @@
+# --- Chart of Accounts ---
+from bisect import bisect_left, insort
+
+# ---------- Classification Options ----------
+sub_classification_options = {
+    "Asset": ["Non-Current Assets", "Current Assets"],
+    "Liability": ["Non-Current Liabilities", "Current Liabilities"],
+    "Equity": ["Capital", "Retained Earnings", "Incomes", "Expenses"]
+}
+
+line_item_options = {
+    "Non-Current Assets": ["Property, Plant & Equipment", "Intangible Assets", "Long Term Investments", "Other Non Current Assets"],
+    "Current Assets": ["Inventory", "Trade Receivables", "Cash and Cash Equivalents", "Other Current Assets"],
+    "Current Liabilities": ["Trade Payables", "Short Term Borrowings", "Outstanding Expenses", "Short Term Provisions", "Advance from Customers", "Other Current Liabilities"],
+    "Non-Current Liabilities": ["Borrowings", "Long Term Provisions", "Other Non Current Liabilities"],
+    "Capital": ["Not Applicable"],
+    "Retained Earnings": ["Not Applicable"],
+    "Incomes": ["Revenue from Operations", "Other Incomes"],
+    "Expenses": ["Material related Expenses", "Employee Compensation Expenses", "Depreciation & Amortization", "Finance Costs", "Other Expenses", "Tax Expenses"]
+}
+
+BASE_CURRENCY = "INR"   # postings without a "currency" are in this one
+
+# Assets = Liabilities + Equity, so a balanced transaction nets to zero with these signs;
+# a positive signed amount is a debit
+TYPE_SIGNS = {"Asset": 1.0, "Liability": -1.0, "Equity": -1.0}
+
+# Small integer ids for (type, sub, line_item); anything outside the options is appended on first sight
+classifications = [
+    (acc_type, sub, line_item)
+    for acc_type, subs in sub_classification_options.items()
+    for sub in subs
+    for line_item in line_item_options[sub]
+]
+classification_ids = {cls: class_id for class_id, cls in enumerate(classifications)}
+
+
+def classification_id(acc_type, sub, line_item):
+    key = (acc_type, sub, line_item)
+    class_id = classification_ids.get(key)
+    if class_id is None:
+        class_id = classification_ids.setdefault(key, len(classifications))
+        if class_id == len(classifications):
+            classifications.append(key)
+    return class_id
+
+
+def posting_currency(acc):
+    return acc.get("currency") or BASE_CURRENCY
+
+
+def account_key(name):
+    # "cash", "cash " and "Cash" are one name
+    return " ".join(name.split()).casefold()
+
+
+def posting_class(acc):
+    return acc["type"], acc["sub"], acc["line_item"]
+
+
+class AccountRegistry:
+    """Normalised account name and classification -> integer account id, with alias merging.
+
+    "cash" as an asset and "cash " as capital are two accounts: a name only joins an account
+    booked under the same classification. Postings store the ``account_id`` they were committed
+    with. Merging an account into another only redirects its id, so aggregations map ids through
+    ``canonical_id`` instead of rewriting postings.
+    """
+
+    def __init__(self):
+        self.accounts = {}      # account id -> record
+        self.by_key = {}        # (normalised name, type, sub, line item) -> account id
+        self.by_name = {}       # same with the exact spelling, so repeat names skip normalising
+        self.by_norm = {}       # normalised name -> ids of every account spelled that way
+        self.merged = set()     # ids of accounts merged into another
+        self.name_index = None  # sorted (normalised name from each word on, account id), built on first search
+        self.label_index = None # picker label -> account id, built on first lookup
+        self.next_id = 1
+
+    @classmethod
+    def from_dict(cls, data):
+        registry = cls()
+        for record in data.get("accounts", []):
+            registry.accounts[record["id"]] = dict(record, aliases=list(record.get("aliases", [])))
+            registry._index(record["id"], record["name"])
+            for alias in record.get("aliases", []):
+                registry._index(record["id"], alias)
+            if record.get("merged_into") is not None:
+                registry.merged.add(record["id"])
+        registry.next_id = max([data.get("next_id", 1)] + [account_id + 1 for account_id in registry.accounts])
+        return registry
+
+    def to_dict(self):
+        return {"next_id": self.next_id, "classified": True, "accounts": list(self.accounts.values())}
+
+    # ---------- Lookups ----------
+    def canonical_id(self, account_id):
+        while account_id in self.merged:
+            account_id = self.accounts[account_id]["merged_into"]
+        return account_id
+
+    def resolve(self, name, acc_type, sub, line_item):
+        account_id = self.by_name.get((name, acc_type, sub, line_item))
+        if account_id is None:
+            account_id = self.by_key.get((account_key(name), acc_type, sub, line_item))
+            if account_id is None:
+                return None
+            self.by_name[(name, acc_type, sub, line_item)] = account_id
+        return self.canonical_id(account_id)
+
+    def name(self, account_id):
+        return self.accounts[self.canonical_id(account_id)]["name"]
+
+    def label(self, account_id):
+        # The name, with the classification added when another active account is spelled the same way
+        record = self.accounts[self.canonical_id(account_id)]
+        namesakes = [other for other in self.by_norm[account_key(record["name"])] if other not in self.merged]
+        if len(namesakes) < 2:
+            return record["name"]
+        return f"{record['name']} ({record['type']} / {record['sub']} / {record['line_item']})"
+
+    def find(self, label):
+        # Account id of a picker label, or None
+        if self.label_index is None:
+            self.label_index = {self.label(record["id"]): record["id"] for record in self.active()}
+        return self.label_index.get(label)
+
+    def active(self):
+        return [record for record in self.accounts.values() if record.get("merged_into") is None]
+
+    def members(self, account_id):
+        # The account plus every alias merged into it
+        return [account_id] + [other for other in self.merged if self.canonical_id(other) == account_id]
+
+    def classification(self, account_id):
+        record = self.accounts[self.canonical_id(account_id)]
+        return {"type": record["type"], "sub": record["sub"], "line_item": record["line_item"]}
+
+    def search(self, text, limit=20):
+        # Up to `limit` active accounts whose name, or any word in it, starts with `text`, alphabetically;
+        # O(log accounts + limit) whatever the size of the chart
+        if self.name_index is None:
+            self.name_index = sorted(entry for account_id in self.accounts for entry in self._name_entries(account_id))
+        prefix = account_key(text)
+        found = {}
+        for pos in range(bisect_left(self.name_index, (prefix,)), len(self.name_index)):
+            key, account_id = self.name_index[pos]
+            if len(found) == limit or not key.startswith(prefix):
+                break
+            account_id = self.canonical_id(account_id)
+            found.setdefault(account_id, self.accounts[account_id])
+        return sorted(found.values(), key=lambda record: (record["name"].casefold(), record["id"]))
+
+    def _name_entries(self, account_id):
+        words = account_key(self.accounts[account_id]["name"]).split(" ")
+        return {(" ".join(words[start:]), account_id) for start in range(len(words))}
+
+    # ---------- Maintenance ----------
+    def assign(self, txn):
+        # Called under the ledger lock before a commit, so new ids are never handed out twice
+        for acc in txn["accounts"]:
+            self._assign_posting(acc)
+
+    def reassign(self, txn):
+        # Ids for the postings that lack one or carry a misfiled one; the others keep theirs
+        for acc in txn["accounts"]:
+            if "account_id" not in acc or self.misfiled(acc):
+                self._assign_posting(acc)
+
+    def misfiled(self, acc):
+        # True for a posting whose id names an account of another classification, as ids given before
+        # the classification was part of the key could
+        record = self.accounts.get(acc["account_id"])
+        return record is not None and (record["type"], record["sub"], record["line_item"]) != posting_class(acc)
+
+    def _assign_posting(self, acc):
+        account_id = self.resolve(acc["name"], *posting_class(acc))
+        if account_id is None:
+            account_id = self.next_id
+            self._register(account_id, acc)
+        acc["account_id"] = account_id
+
+    def observe(self, txn):
+        # Every applied transaction, own or replayed from another process
+        for acc in txn["accounts"]:
+            account_id = acc["account_id"]
+            if account_id not in self.accounts:
+                self._register(account_id, acc)
+            record = self.accounts[account_id]
+            if acc["name"] != record["name"] and acc["name"] not in record["aliases"]:
+                record["aliases"].append(acc["name"])
+                self._index(account_id, acc["name"])
+
+    def _index(self, account_id, name):
+        record = self.accounts[account_id]
+        self.by_key.setdefault((account_key(name), record["type"], record["sub"], record["line_item"]), account_id)
+        namesakes = self.by_norm.setdefault(account_key(name), set())
+        if account_id not in namesakes:
+            namesakes.add(account_id)
+            self.label_index = None
+
+    def _register(self, account_id, acc):
+        self.accounts[account_id] = {
+            "id": account_id,
+            "name": " ".join(acc["name"].split()),
+            "type": acc["type"],
+            "sub": acc["sub"],
+            "line_item": acc["line_item"],
+            "aliases": [] if acc["name"] == " ".join(acc["name"].split()) else [acc["name"]],
+            "merged_into": None
+        }
+        self._index(account_id, acc["name"])
+        self.next_id = max(self.next_id, account_id + 1)
+        if self.name_index is not None:
+            for entry in self._name_entries(account_id):
+                insort(self.name_index, entry)
+
+    def merge(self, alias_id, target_id):
+        self.accounts[alias_id]["merged_into"] = target_id
+        self.merged.add(alias_id)
+        self.label_index = None
+
+    def unmerge(self, alias_id):
+        self.accounts[alias_id]["merged_into"] = None
+        self.merged.discard(alias_id)
+        self.label_index = None
@@ -0,0 +1,115 @@
+# --- Load Test for the Ledger HTTP API ---
+# Usage: python api_loadtest.py [--host 127.0.0.1] [--port 8765] [--clients 8] [--duration 10] [--write-ratio 0] [--batch 0]
+# Start api_server.py first. Writes add real transactions, so point the server at a scratch copy when --write-ratio > 0.
+import argparse
+import http.client
+import json
+import random
+import sys
+import threading
+import time
+
+READ_PATHS = [
+    "/reports/balance-sheet",
+    "/reports/income-statement",
+    "/reports/cash-flow",
+    "/reports/ratios",
+    "/transactions?limit=20",
+    "/health"
+]
+
+
+def sample_transaction(rnd):
+    amount = float(rnd.randrange(100, 100000))
+    return {
+        "description": f"load test sale {rnd.randrange(1_000_000)}",
+        "accounts": [
+            {"name": "cash", "type": "Asset", "sub": "Current Assets", "line_item": "Cash and Cash Equivalents", "amount": amount},
+            {"name": "sales", "type": "Equity", "sub": "Incomes", "line_item": "Revenue from Operations", "amount": amount}
+        ]
+    }
+
+
+def next_request(rnd, write_ratio):
+    if rnd.random() < write_ratio:
+        return "POST", "/transactions", sample_transaction(rnd)
+    return "GET", rnd.choice(READ_PATHS), None
+
+
+def run_client(args, seed, deadline, results):
+    # One keep-alive connection per client, as an integrating service would hold
+    rnd = random.Random(seed)
+    connection = http.client.HTTPConnection(args.host, args.port, timeout=30)
+    latencies, requests, errors = [], 0, 0
+    while time.perf_counter() < deadline:
+        if args.batch:
+            calls = [next_request(rnd, args.write_ratio) for _ in range(args.batch)]
+            method, path = "POST", "/batch"
+            body = {"requests": [{"method": m, "path": p, "body": b} for m, p, b in calls]}
+        else:
+            method, path, body = next_request(rnd, args.write_ratio)
+        data = json.dumps(body).encode() if body is not None else None
+        headers = {"Content-Type": "application/json"} if data else {}
+
+        start = time.perf_counter()
+        try:
+            connection.request(method, path, body=data, headers=headers)
+            response = connection.getresponse()
+            payload = response.read()
+            ok = response.status < 400
+            if ok and args.batch:
+                statuses = [item["status"] for item in json.loads(payload)["responses"]]
+                errors += sum(status >= 400 for status in statuses)
+            elif not ok:
+                errors += 1
+        except (OSError, http.client.HTTPException):
+            errors += 1
+            connection.close()
+            connection = http.client.HTTPConnection(args.host, args.port, timeout=30)
+        latencies.append(time.perf_counter() - start)
+        requests += args.batch or 1
+    connection.close()
+    results.append((latencies, requests, errors))
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure throughput and latency of a running api_server.py.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--clients", type=int, default=8, help="concurrent keep-alive connections")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run")
+    parser.add_argument("--write-ratio", type=float, default=0.0, help="share of requests that post a transaction")
+    parser.add_argument("--batch", type=int, default=0, help="send calls in /batch requests of this size")
+    args = parser.parse_args(argv)
+
+    results = []
+    deadline = time.perf_counter() + args.duration
+    threads = [threading.Thread(target=run_client, args=(args, seed, deadline, results)) for seed in range(args.clients)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(latency for client_latencies, _, _ in results for latency in client_latencies)
+    requests = sum(count for _, count, _ in results)
+    errors = sum(count for _, _, count in results)
+    if not latencies:
+        print("No requests completed.")
+        return 1
+    print(f"clients={args.clients} duration={elapsed:.1f}s write_ratio={args.write_ratio} batch={args.batch or 'off'}")
+    print(f"requests: {requests} ({requests / elapsed:,.0f} req/s) over {len(latencies)} HTTP calls, errors: {errors}")
+    print("latency per HTTP call (ms): " + ", ".join(
+        f"{name} {percentile(latencies, fraction) * 1000:.2f}"
+        for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+    ))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,547 @@
+# --- Ledger HTTP API ---
+# Usage: python api_server.py [student_transactions.json] [--host 127.0.0.1] [--port 8765] [--workers 8] [--verbose]
+#
+#   GET    /health
+#   GET    /transactions?offset=0&limit=100      POST /transactions        POST /transactions/bulk
+#   GET    /transactions/<id>                    PUT  /transactions/<id>   DELETE /transactions/<id>
+#   GET    /accounts                             GET  /accounts/<id>/history?offset=0&limit=100
+#   GET    /reports/balance-sheet | /reports/income-statement | /reports/cash-flow | /reports/ratios   (?currency=USD)
+#   GET    /reports/aging?side=Receivables&as_of=2026-06-30&offset=0&limit=100
+#   GET    /reports/open-items?side=Payables&counterparty=Acme&due_by=2026-06-30&limit=100
+#   GET    /export?format=json|csv|jsonl                (streamed, one chunk of transactions at a time)
+#   POST   /batch   {"requests": [{"method": "GET", "path": "/reports/ratios"}, ...]}
+#
+# limit is at most MAX_PAGE_SIZE; larger values, like negative or non-integer ones, get a 400.
+# Changes are recorded in the ledger's audit trail under the X-Actor request header, or the client's address.
+import argparse
+import io
+import json
+import math
+import re
+import sys
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from itertools import islice
+from urllib.parse import parse_qs, urlsplit
+
+from accounts import BASE_CURRENCY, line_item_options, sub_classification_options
+from audit import set_actor
+from cash_flow import CashFlowIndex
+from exporter import EXPORT_COLUMNS, export_postings, posting_chunks
+from fx import RateTable, currency_code_error, day_ordinal, posting_frame_builder, rates_path, report_cash_flow, report_totals
+from general_ledger import AccountPostingIndex, account_history
+from ledger import LedgerStore, LedgerTotals
+from subledger import SIDES, SUBLEDGERS, SubledgerIndex, aging_summary, counterparty_balances, open_item_rows
+from reports import balance_sheet, cash_flow_statement, income_statement, ratios
+
+KEEP_ALIVE_TIMEOUT = 5              # seconds an idle keep-alive connection may hold a worker
+MAX_BODY_BYTES = 16 * 1024 * 1024
+MAX_BATCH_SIZE = 1000
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+
+
+class APIError(Exception):
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Streamed:
+    """A response body too big to build first: write(out) sends it to a binary stream piece by piece."""
+
+    def __init__(self, content_type, write):
+        self.content_type = content_type
+        self.write = write
+
+
+class ChunkedWriter(io.RawIOBase):
+    """Binary stream that frames every write as one HTTP/1.1 chunk."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        if data:
+            self.wfile.write(b"%x\r\n" % len(data) + bytes(data) + b"\r\n")
+        return len(data)
+
+    def end(self):
+        self.wfile.write(b"0\r\n\r\n")
+
+
+def open_ledger(path):
+    return LedgerStore(path, {
+        "totals": LedgerTotals.build,
+        "postings": AccountPostingIndex.build,
+        "cash_flow": CashFlowIndex.build,
+        "subledger": SubledgerIndex.build,
+        "fx_postings": posting_frame_builder(RateTable(rates_path(path)))
+    })
+
+
+# ---------- Validation ----------
+def validate_transaction(txn):
+    # The same rules the entry form enforces, plus the classification options it offers
+    if not isinstance(txn, dict):
+        raise APIError(400, "transaction must be a JSON object")
+    description = txn.get("description")
+    if not isinstance(description, str) or not description.strip():
+        raise APIError(400, "description is required")
+    postings = txn.get("accounts")
+    if not isinstance(postings, list) or not postings:
+        raise APIError(400, "accounts must be a non-empty list")
+    txn_date = txn.get("date")
+    if txn_date is not None:
+        try:
+            day_ordinal(txn_date)
+        except (TypeError, ValueError):
+            raise APIError(400, "date must be an ISO date such as 2024-03-31")
+
+    accounts = []
+    for pos, acc in enumerate(postings):
+        where = f"accounts[{pos}]"
+        if not isinstance(acc, dict):
+            raise APIError(400, f"{where} must be a JSON object")
+        name, acc_type, sub, line_item, amount = (acc.get(key) for key in ("name", "type", "sub", "line_item", "amount"))
+        if not isinstance(name, str) or not name.strip():
+            raise APIError(400, f"{where}.name is required")
+        if acc_type not in sub_classification_options:
+            raise APIError(400, f"{where}.type must be one of {list(sub_classification_options)}")
+        if sub not in sub_classification_options[acc_type]:
+            raise APIError(400, f"{where}.sub must be one of {sub_classification_options[acc_type]}")
+        if line_item not in line_item_options[sub]:
+            raise APIError(400, f"{where}.line_item must be one of {line_item_options[sub]}")
+        if isinstance(amount, bool) or not isinstance(amount, (int, float)) or not math.isfinite(amount) or amount == 0:
+            raise APIError(400, f"{where}.amount must be a non-zero number")
+        currency = acc.get("currency", BASE_CURRENCY)
+        if currency_code_error(currency):
+            raise APIError(400, f"{where}.{currency_code_error(currency)}")
+        posting = {"name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": float(amount), "currency": currency}
+        if "counterparty" in acc or "due_date" in acc:
+            if line_item not in SUBLEDGERS:
+                raise APIError(400, f"{where}: counterparty and due_date apply to {' and '.join(SUBLEDGERS)} only")
+            counterparty, due_date = acc.get("counterparty"), acc.get("due_date")
+            if counterparty is not None:
+                if not isinstance(counterparty, str) or not counterparty.strip():
+                    raise APIError(400, f"{where}.counterparty must be a non-empty string")
+                posting["counterparty"] = counterparty.strip()
+            if due_date is not None:
+                try:
+                    day_ordinal(due_date)
+                except (TypeError, ValueError):
+                    raise APIError(400, f"{where}.due_date must be an ISO date such as 2024-03-31")
+                posting["due_date"] = due_date
+        accounts.append(posting)
+    validated = {"description": description, "accounts": accounts}
+    if txn_date is not None:
+        validated["date"] = txn_date
+    return validated
+
+
+def query_int(query, name, default, maximum=None):
+    try:
+        value = int(query.get(name, [default])[0])
+    except ValueError:
+        raise APIError(400, f"{name} must be an integer")
+    if value < 0:
+        raise APIError(400, f"{name} must not be negative")
+    if maximum is not None and value > maximum:
+        raise APIError(400, f"{name} must be at most {maximum}")
+    return value
+
+
+def query_date(query, name):
+    # An ISO date string, or None when absent
+    value = query.get(name, [None])[0]
+    if value is None:
+        return None
+    try:
+        day_ordinal(value)
+    except (TypeError, ValueError):
+        raise APIError(400, f"{name} must be an ISO date such as 2024-03-31")
+    return value
+
+
+def query_side(query):
+    side = query.get("side", [SIDES[0]])[0]
+    if side not in SIDES:
+        raise APIError(400, f"side must be one of {list(SIDES)}")
+    return side
+
+
+def query_totals(ledger, query):
+    # Totals in ?currency= (default the base currency); refused rather than silently dropping postings
+    currency = query.get("currency", [BASE_CURRENCY])[0]
+    if currency_code_error(currency):
+        raise APIError(400, currency_code_error(currency))
+    totals, missing = report_totals(ledger, currency)
+    if missing:
+        raise APIError(422, f"no exchange rate for {', '.join(missing)}")
+    return totals, currency
+
+
+def existing_transaction(ledger, txn_id):
+    txn = ledger.get(int(txn_id))
+    if txn is None:
+        raise APIError(404, f"transaction {txn_id} not found")
+    return txn
+
+
+# ---------- Routes ----------
+def health(ledger, query, body):
+    return 200, {"status": "ok", "transactions": len(ledger), "version": ledger.version}
+
+
+def list_transactions(ledger, query, body):
+    offset = query_int(query, "offset", 0)
+    limit = query_int(query, "limit", DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    with ledger.reading():
+        return 200, {"total": len(ledger), "transactions": list(islice(ledger, offset, offset + limit))}
+
+
+def create_transaction(ledger, query, body):
+    txn_id = ledger.add(validate_transaction(body))
+    return 201, {"id": txn_id}
+
+
+def bulk_create(ledger, query, body):
+    txns = body.get("transactions") if isinstance(body, dict) else None
+    if not isinstance(txns, list) or not txns:
+        raise APIError(400, "transactions must be a non-empty list")
+    if len(txns) > MAX_BATCH_SIZE:
+        raise APIError(413, f"at most {MAX_BATCH_SIZE} transactions per request")
+    # Validate everything first so a bad entry rejects the whole batch
+    validated = []
+    for pos, txn in enumerate(txns):
+        try:
+            validated.append(validate_transaction(txn))
+        except APIError as error:
+            raise APIError(error.status, f"transactions[{pos}]: {error}")
+    return 201, {"ids": ledger.add_many(validated)}
+
+
+def get_transaction(ledger, query, body, txn_id):
+    with ledger.reading():
+        return 200, existing_transaction(ledger, txn_id)
+
+
+def update_transaction(ledger, query, body, txn_id):
+    if not ledger.replace(int(txn_id), validate_transaction(body)):
+        raise APIError(404, f"transaction {txn_id} not found")
+    return 200, ledger.get(int(txn_id))
+
+
+def delete_transaction(ledger, query, body, txn_id):
+    if not ledger.delete(int(txn_id)):
+        raise APIError(404, f"transaction {txn_id} not found")
+    return 200, {"deleted": int(txn_id)}
+
+
+def list_accounts(ledger, query, body):
+    with ledger.reading():
+        return 200, {"accounts": sorted(ledger.accounts.active(), key=lambda record: record["id"])}
+
+
+def get_account_history(ledger, query, body, account_id):
+    offset = query_int(query, "offset", 0)
+    limit = query_int(query, "limit", DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    with ledger.reading():
+        account_id = ledger.accounts.canonical_id(int(account_id))
+        if account_id not in ledger.accounts.accounts:
+            raise APIError(404, f"account {account_id} not found")
+        rows, count, closing_balance = account_history(ledger, account_id, offset, limit)
+        return 200, {"total": count, "closing_balance": closing_balance, "postings": rows}
+
+
+def get_balance_sheet(ledger, query, body):
+    with ledger.reading():
+        totals, currency = query_totals(ledger, query)
+        return 200, dict(balance_sheet(totals, ledger.accounts), currency=currency)
+
+
+def get_income_statement(ledger, query, body):
+    with ledger.reading():
+        totals, currency = query_totals(ledger, query)
+        return 200, dict(income_statement(totals, ledger.accounts), currency=currency)
+
+
+def get_cash_flow(ledger, query, body):
+    with ledger.reading():
+        totals, currency = query_totals(ledger, query)
+        return 200, dict(cash_flow_statement(report_cash_flow(ledger, currency)[0], totals), currency=currency)
+
+
+def get_ratios(ledger, query, body):
+    with ledger.reading():
+        return 200, ratios(query_totals(ledger, query)[0])
+
+
+def get_aging(ledger, query, body):
+    side, as_of = query_side(query), query_date(query, "as_of")
+    offset = query_int(query, "offset", 0)
+    limit = query_int(query, "limit", DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    as_of = date.fromisoformat(as_of) if as_of else date.today()
+    balances = counterparty_balances(ledger, side, as_of)
+    return 200, {
+        "side": side, "as_of": as_of.isoformat(),
+        "buckets": aging_summary(ledger, side, as_of).to_dict(orient="records"),
+        "total_counterparties": len(balances),
+        "counterparties": balances.iloc[offset:offset + limit].to_dict(orient="records")
+    }
+
+
+def get_open_items(ledger, query, body):
+    side, as_of, due_by = query_side(query), query_date(query, "as_of"), query_date(query, "due_by")
+    rows = open_item_rows(
+        ledger, side, date.fromisoformat(as_of) if as_of else None, counterparty=query.get("counterparty", [None])[0],
+        due_by=date.fromisoformat(due_by) if due_by else None, limit=query_int(query, "limit", DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE)
+    )
+    return 200, {"side": side, "open_items": rows}
+
+
+def export(ledger, query, body):
+    # Every column of exporter.EXPORT_COLUMNS, streamed: the rows are never all in memory at once
+    file_format = query.get("format", ["json"])[0]
+    columns = list(EXPORT_COLUMNS)
+    if file_format == "csv":
+        return 200, Streamed("text/csv; charset=utf-8", lambda out: export_postings(ledger, out, "csv", columns))
+    if file_format == "jsonl":
+        return 200, Streamed("application/x-ndjson", lambda out: export_postings(ledger, out, "jsonl", columns))
+    if file_format == "json":
+        return 200, Streamed("application/json", lambda out: write_json_rows(ledger, out, columns))
+    raise APIError(400, "format must be json, csv or jsonl")
+
+
+def write_json_rows(ledger, out, columns):
+    # {"rows": [...]} written a chunk of transactions at a time
+    out.write(b'{"rows": [')
+    separator = b""
+    for rows in posting_chunks(ledger, columns):
+        out.write(separator + ", ".join(json.dumps(dict(zip(columns, row))) for row in rows).encode())
+        separator = b", "
+    out.write(b"]}")
+
+
+def batch(ledger, query, body):
+    # Many calls in one round trip; each gets its own status, and one failure doesn't stop the rest
+    requests = body.get("requests") if isinstance(body, dict) else None
+    if not isinstance(requests, list) or not requests:
+        raise APIError(400, "requests must be a non-empty list")
+    if len(requests) > MAX_BATCH_SIZE:
+        raise APIError(413, f"at most {MAX_BATCH_SIZE} requests per batch")
+    responses = []
+    for request in requests:
+        try:
+            if not isinstance(request, dict) or not isinstance(request.get("path"), str):
+                raise APIError(400, "each request needs a path")
+            url = urlsplit(request["path"])
+            if url.path == "/batch":
+                raise APIError(400, "batches cannot be nested")
+            status, payload = dispatch(ledger, str(request.get("method", "GET")).upper(), url.path, parse_qs(url.query), request.get("body"))
+            if isinstance(payload, Streamed):
+                raise APIError(400, f"{url.path} is streamed and cannot be batched")
+        except APIError as error:
+            status, payload = error.status, {"error": str(error)}
+        responses.append({"status": status, "body": payload})
+    return 200, {"responses": responses}
+
+
+ROUTES = [
+    ("GET", r"/health", health),
+    ("GET", r"/transactions", list_transactions),
+    ("POST", r"/transactions", create_transaction),
+    ("POST", r"/transactions/bulk", bulk_create),
+    ("GET", r"/transactions/(\d+)", get_transaction),
+    ("PUT", r"/transactions/(\d+)", update_transaction),
+    ("DELETE", r"/transactions/(\d+)", delete_transaction),
+    ("GET", r"/accounts", list_accounts),
+    ("GET", r"/accounts/(\d+)/history", get_account_history),
+    ("GET", r"/reports/balance-sheet", get_balance_sheet),
+    ("GET", r"/reports/income-statement", get_income_statement),
+    ("GET", r"/reports/cash-flow", get_cash_flow),
+    ("GET", r"/reports/ratios", get_ratios),
+    ("GET", r"/reports/aging", get_aging),
+    ("GET", r"/reports/open-items", get_open_items),
+    ("GET", r"/export", export),
+    ("POST", r"/batch", batch)
+]
+COMPILED_ROUTES = [(method, re.compile(pattern + "$"), handler) for method, pattern, handler in ROUTES]
+
+
+def dispatch(ledger, method, path, query, body):
+    path = path.rstrip("/") or "/"
+    path_matched = False
+    for route_method, pattern, handler in COMPILED_ROUTES:
+        match = pattern.match(path)
+        if match:
+            path_matched = True
+            if route_method == method:
+                return handler(ledger, query, body, *match.groups())
+    if path_matched:
+        raise APIError(405, f"{method} is not allowed on {path}")
+    raise APIError(404, f"no route for {path}")
+
+
+# ---------- HTTP ----------
+class LedgerRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"   # keep-alive: connections stay open between requests
+    timeout = KEEP_ALIVE_TIMEOUT
+    # Headers and body leave in one buffered send with Nagle off, avoiding the delayed-ACK stall
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    server_version = "LedgerAPI/1.0"
+
+    def do_GET(self):
+        self.handle_api("GET")
+
+    def do_POST(self):
+        self.handle_api("POST")
+
+    def do_PUT(self):
+        self.handle_api("PUT")
+
+    def do_DELETE(self):
+        self.handle_api("DELETE")
+
+    def handle_api(self, method):
+        url = urlsplit(self.path)
+        try:
+            body = self.read_body()
+            set_actor(f"api:{self.headers.get('X-Actor') or self.client_address[0]}")
+            # Pick up commits made by other processes (the Streamlit app) before answering
+            self.server.ledger.refresh()
+            status, payload = dispatch(self.server.ledger, method, url.path, parse_qs(url.query), body)
+        except APIError as error:
+            status, payload = error.status, {"error": str(error)}
+        except Exception:
+            self.log_error("%s", traceback.format_exc())
+            status, payload = 500, {"error": "internal server error"}
+        self.send_payload(status, payload)
+
+    def read_body(self):
+        try:
+            length = int(self.headers.get("Content-Length") or 0)
+        except ValueError:
+            self.close_connection = True
+            raise APIError(400, "Content-Length is not an integer")
+        if length > MAX_BODY_BYTES:
+            # The unread body would be taken for the next request, so drop the connection
+            self.close_connection = True
+            raise APIError(413, "request body too large")
+        if not length:
+            return None
+        try:
+            return json.loads(self.rfile.read(length))
+        except ValueError:
+            raise APIError(400, "request body is not valid JSON")
+
+    def send_payload(self, status, payload):
+        if isinstance(payload, Streamed):
+            self.send_streamed(status, payload)
+            return
+        if isinstance(payload, str):
+            data, content_type = payload.encode(), "text/csv; charset=utf-8"
+        else:
+            data, content_type = json.dumps(payload).encode(), "application/json"
+        if self.server.saturated():
+            # Others are queued for a worker; don't let this connection idle on one
+            self.close_connection = True
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        self.wfile.write(data)
+
+    def send_streamed(self, status, payload):
+        if self.server.saturated():
+            self.close_connection = True
+        self.send_response(status)
+        self.send_header("Content-Type", payload.content_type)
+        self.send_header("Transfer-Encoding", "chunked")
+        if self.close_connection:
+            self.send_header("Connection", "close")
+        self.end_headers()
+        out = ChunkedWriter(self.wfile)
+        try:
+            payload.write(out)
+        except Exception:
+            # The status is already sent; leaving out the last chunk tells the client the body is incomplete
+            self.log_error("%s", traceback.format_exc())
+            self.close_connection = True
+            return
+        out.end()
+
+    def log_message(self, format, *args):
+        if not self.server.quiet:
+            super().log_message(format, *args)
+
+
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands each connection to a fixed pool of worker threads."""
+
+    request_queue_size = 128
+
+    def __init__(self, address, handler, ledger, workers=8, quiet=True):
+        # The pool exists before binding, since a failed bind calls server_close()
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ledger-api")
+        self.ledger = ledger
+        self.quiet = quiet
+        self.workers = workers
+        self.connections = 0        # accepted and not yet closed, including those waiting for a worker
+        self.connections_lock = threading.Lock()
+        super().__init__(address, handler)
+
+    def saturated(self):
+        return self.connections > self.workers
+
+    def process_request(self, request, client_address):
+        with self.connections_lock:
+            self.connections += 1
+        self.pool.submit(self.process_request_in_worker, request, client_address)
+
+    def process_request_in_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            with self.connections_lock:
+                self.connections -= 1
+
+    def server_close(self):
+        super().server_close()
+        self.pool.shutdown(wait=True)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the ledger as a local JSON API.")
+    parser.add_argument("ledger", nargs="?", default="student_transactions.json")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--workers", type=int, default=8, help="worker threads; each serves one connection at a time, keep-alive is dropped while more are waiting")
+    parser.add_argument("--verbose", action="store_true", help="log every request")
+    args = parser.parse_args(argv)
+
+    server = PooledHTTPServer((args.host, args.port), LedgerRequestHandler, open_ledger(args.ledger), args.workers, quiet=not args.verbose)
+    print(f"Serving {args.ledger} on http://{args.host}:{server.server_port} with {args.workers} workers")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
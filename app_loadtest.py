@@ -0,0 +1,265 @@
+# --- Rerun Latency Load Test for the Streamlit App ---
+# Usage: python app_loadtest.py [--sessions 8] [--actions 30] [--transactions 2000] [--write-ratio 0.2] [--delete-ratio 0.1] [--seed 0]
+#
+# Runs combined_app.py headless through Streamlit's AppTest, one thread per simulated session, all in this
+# process so they share the cached ledger as browser sessions share one server. Each session navigates
+# between pages, submits transactions through the entry form and deletes its own entries through search.
+# Every AppTest run is one rerun. AppTest swaps a process-wide runtime in and out on each run, so runs
+# take turns under a lock, much as the GIL makes CPU-bound reruns take turns in a real server; latency
+# counts the time a rerun waits for its turn, and the run time alone is reported next to it.
+# The ledger is a seeded scratch copy in a temporary directory; student_transactions.json is never
+# touched. Memory is read from /proc, so Linux only.
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+
+import streamlit as st
+from streamlit.testing.v1 import AppTest
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+APP_SCRIPT = os.path.join(APP_DIR, "combined_app.py")
+SAVE_FILE = "student_transactions.json"
+RERUN_TIMEOUT = 120
+ENTRY_PAGE = "➕ Transaction Entry"
+RERUN_FLAG = "_app_loadtest_rerun"
+RUN_LOCK = threading.Lock()
+
+SEED_ACCOUNTS = {
+    "cash": ("Asset", "Current Assets", "Cash and Cash Equivalents"),
+    "inventory": ("Asset", "Current Assets", "Inventory"),
+    "receivables": ("Asset", "Current Assets", "Trade Receivables"),
+    "equipment": ("Asset", "Non-Current Assets", "Property, Plant & Equipment"),
+    "payables": ("Liability", "Current Liabilities", "Trade Payables"),
+    "bank loan": ("Liability", "Non-Current Liabilities", "Borrowings"),
+    "capital": ("Equity", "Capital", "Not Applicable"),
+    "sales": ("Equity", "Incomes", "Revenue from Operations"),
+    "rent": ("Equity", "Expenses", "Other Expenses")
+}
+# (description, (account, sign), (account, sign)); every template balances
+SEED_TEMPLATES = [
+    ("cash sale", ("cash", 1), ("sales", 1)),
+    ("credit sale", ("receivables", 1), ("sales", 1)),
+    ("collected from customer", ("cash", 1), ("receivables", -1)),
+    ("bought inventory", ("inventory", 1), ("cash", -1)),
+    ("bought inventory on credit", ("inventory", 1), ("payables", 1)),
+    ("paid rent", ("cash", -1), ("rent", -1)),
+    ("took a bank loan", ("cash", 1), ("bank loan", 1)),
+    ("bought equipment", ("equipment", 1), ("cash", -1)),
+    ("owner invested", ("cash", 1), ("capital", 1))
+]
+
+
+def posting(name, amount):
+    acc_type, sub, line_item = SEED_ACCOUNTS[name]
+    return {"selected_account": name, "name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": amount}
+
+
+def seed_ledger(path, count, seed):
+    # Dated over the last two years, in the pre-registry file format, so the app migrates it on first load
+    rnd = random.Random(seed)
+    today = date.today()
+    transactions = []
+    for _ in range(count):
+        description, *legs = rnd.choice(SEED_TEMPLATES)
+        amount = float(rnd.randrange(100, 50000))
+        transactions.append({
+            "description": description,
+            "date": (today - timedelta(days=rnd.randrange(730))).isoformat(),
+            "accounts": [posting(name, sign * amount) for name, sign in legs]
+        })
+    with open(path, "w") as f:
+        json.dump({"submitted_transactions": transactions}, f)
+
+
+def halt_for_rerun():
+    # AppTest (Streamlit 1.31) never finishes a run that calls st.rerun(). Halt the run as st.rerun() does
+    # and flag it, and Session.run starts the next one, as the server would for a browser session.
+    st.session_state[RERUN_FLAG] = True
+    st.stop()
+
+
+def rss_bytes():
+    with open("/proc/self/statm") as f:
+        return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+class Session:
+    """One simulated browser session: an AppTest, its random script and its timed reruns."""
+
+    def __init__(self, number, args):
+        self.number = number
+        self.args = args
+        self.rnd = random.Random(args.seed * 1000 + number)
+        self.app = AppTest.from_file(APP_SCRIPT, default_timeout=RERUN_TIMEOUT)
+        self.timings = []           # (action, latency including the wait for a turn, run time) in seconds
+        self.errors = []
+        self.submitted = 0
+        self.deleted = 0
+        self.pages = []
+
+    def run(self, action):
+        queued = time.perf_counter()
+        with RUN_LOCK:
+            start = time.perf_counter()
+            self.app.run()
+            finished = time.perf_counter()
+        self.timings.append((action, finished - queued, finished - start))
+        if self.app.exception:
+            self.errors.append(f"{action}: {self.app.exception[0].value}")
+        if RERUN_FLAG in self.app.session_state and self.app.session_state[RERUN_FLAG]:
+            self.app.session_state[RERUN_FLAG] = False
+            self.run(action)
+
+    def page(self):
+        return self.app.sidebar.selectbox[0]
+
+    def go_to(self, page, action="navigate"):
+        if self.page().value != page:
+            self.page().set_value(page)
+            self.run(action)
+
+    def navigate(self):
+        self.go_to(self.rnd.choice(self.pages))
+
+    def submit(self):
+        # Two rows through the account picker, one amount each way, then Submit
+        self.go_to(ENTRY_PAGE, "submit")
+        for _ in range(2):
+            self.app.button(key="add_account_btn").click()
+            self.run("submit")
+        names = [name for name in self.app.selectbox(key="select_0").options if name in SEED_ACCOUNTS]
+        if len(names) < 2:
+            return
+        first, second = self.rnd.sample(names, 2)
+        amount = float(self.rnd.randrange(100, 10000))
+        self.submitted += 1
+        self.app.text_input(key="entry_transaction_desc").set_value(f"load test session {self.number} entry {self.submitted}")
+        self.app.selectbox(key="select_0").set_value(first)
+        self.app.selectbox(key="select_1").set_value(second)
+        self.run("submit")
+        # Balanced: both up when they sit on opposite sides of the equation, one up one down otherwise
+        same_side = (SEED_ACCOUNTS[first][0] == "Asset") == (SEED_ACCOUNTS[second][0] == "Asset")
+        self.app.number_input(key="amount_0").set_value(amount)
+        self.app.number_input(key="amount_1").set_value(-amount if same_side else amount)
+        self.app.button(key="submit_transaction").click()
+        self.run("submit")
+
+    def delete(self):
+        # Only this session's own entries, found through the search box
+        if not self.submitted:
+            return self.submit()
+        self.go_to(ENTRY_PAGE, "delete")
+        self.app.text_input(key="txn_search_query").set_value(f"load test session {self.number}")
+        self.run("delete")
+        buttons = [button for button in self.app.button if "_delete_txn_" in (button.key or "")]
+        if buttons:
+            self.rnd.choice(buttons).click()
+            self.run("delete")
+            self.deleted += 1
+        self.app.text_input(key="txn_search_query").set_value("")
+
+    def script(self):
+        try:
+            self.run("first load")
+            self.pages = list(self.page().options)
+            for _ in range(self.args.actions):
+                roll = self.rnd.random()
+                if roll < self.args.write_ratio:
+                    self.submit()
+                elif roll < self.args.write_ratio + self.args.delete_ratio:
+                    self.delete()
+                else:
+                    self.navigate()
+        except Exception as error:
+            # A timed-out or broken rerun ends this session; the others carry on
+            self.errors.append(f"session stopped: {error!r}")
+
+
+def percentile(sorted_values, fraction):
+    return sorted_values[min(len(sorted_values) - 1, int(fraction * len(sorted_values)))]
+
+
+def latency_line(latencies):
+    latencies = sorted(latencies)
+    return ", ".join(
+        f"{name} {percentile(latencies, fraction) * 1000:,.1f}"
+        for name, fraction in (("p50", 0.50), ("p95", 0.95), ("p99", 0.99), ("max", 1.0))
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Measure rerun latency and memory of combined_app.py under simulated concurrent sessions.")
+    parser.add_argument("--sessions", type=int, default=8, help="concurrent simulated sessions")
+    parser.add_argument("--actions", type=int, default=30, help="scripted actions per session")
+    parser.add_argument("--transactions", type=int, default=2000, help="size of the seeded ledger")
+    parser.add_argument("--write-ratio", type=float, default=0.2, help="share of actions that submit a transaction")
+    parser.add_argument("--delete-ratio", type=float, default=0.1, help="share of actions that delete one")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--keep", action="store_true", help="leave the scratch directory in place")
+    args = parser.parse_args(argv)
+
+    workdir = tempfile.mkdtemp(prefix="app_loadtest_")
+    seed_ledger(os.path.join(workdir, SAVE_FILE), args.transactions, args.seed)
+    # The app opens its ledger relative to the working directory and imports its modules from APP_DIR
+    os.chdir(workdir)
+    sys.path.insert(0, APP_DIR)
+    st.rerun = halt_for_rerun
+    rss_start = rss_bytes()
+
+    try:
+        # One session loads first, so the shared ledger and caches are built outside the measurement
+        warm = Session(-1, args)
+        warm.run("first load")
+        rss_warm = rss_bytes()
+
+        sessions = [Session(number, args) for number in range(args.sessions)]
+        threads = [threading.Thread(target=session.script) for session in sessions]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        rss_end = rss_bytes()
+        from ledger import LedgerStore
+        ledger_size = len(LedgerStore(SAVE_FILE, read_only=True))
+    finally:
+        os.chdir(APP_DIR)
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+    timings = [timing for session in sessions for timing in session.timings]
+    errors = [error for session in sessions for error in session.errors]
+    by_action = defaultdict(list)
+    for action, latency, _ in timings:
+        by_action[action].append(latency)
+    print(f"sessions={args.sessions} actions={args.actions} ledger={args.transactions:,} transactions "
+          f"write_ratio={args.write_ratio} delete_ratio={args.delete_ratio} duration={elapsed:.1f}s")
+    print(f"warm-up first load: {warm.timings[0][2] * 1000:,.1f} ms")
+    print(f"reruns: {len(timings):,} ({len(timings) / elapsed:,.1f}/s), errors: {len(errors)}; "
+          f"{sum(session.submitted for session in sessions)} submitted, {sum(session.deleted for session in sessions)} deleted, "
+          f"{ledger_size:,} transactions at the end")
+    print(f"rerun latency (ms): {latency_line([latency for _, latency, _ in timings])}")
+    print(f"run time only (ms): {latency_line([run for _, _, run in timings])}")
+    for action, latencies in sorted(by_action.items()):
+        print(f"  {action:<10} x{len(latencies):<5} {latency_line(latencies)}")
+    mb = 1024 * 1024
+    print(f"memory (RSS): start {rss_start / mb:,.1f} MB, after warm-up {rss_warm / mb:,.1f} MB, end {rss_end / mb:,.1f} MB, "
+          f"≈ {(rss_end - rss_warm) / max(1, args.sessions) / mb:,.1f} MB per session, "
+          f"peak {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:,.1f} MB")
+    for error in errors[:5]:
+        print(f"  error: {error}")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
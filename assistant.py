@@ -0,0 +1,234 @@
+# --- Offline AI Assistant: BM25 retrieval + ledger intent router ---
+import math
+import re
+import textwrap
+from collections import Counter
+
+from accounts import BASE_CURRENCY, account_key
+from fx import format_amount
+from ledger import ratio_values
+from search_index import tokenize
+
+STOPWORDS = {
+    "a", "an", "and", "are", "about", "as", "at", "be", "by", "can", "do", "does", "explain",
+    "for", "from", "how", "i", "in", "is", "it", "me", "my", "of", "on", "or", "our", "please",
+    "tell", "the", "to", "what", "whats", "when", "where", "which", "why", "with", "you"
+}
+
+FALLBACK_RESPONSE = "I understand you're asking about accounting concepts. Could you be more specific about what you'd like to learn?"
+
+FAQ_ANSWERS = {
+    "The Accounting Equation": "The accounting equation (Assets = Liabilities + Equity) is the foundation of double-entry accounting. It shows that a company's assets are financed by either debt (liabilities) or owner's investment (equity).",
+    "Balance Sheet": "A balance sheet shows a company's financial position at a specific point in time. It lists all assets, liabilities, and equity, following the accounting equation: Assets = Liabilities + Equity.",
+    "Income Statement": "An income statement shows a company's financial performance over a period. It lists revenues (income) and expenses, with the difference being net income or loss."
+}
+
+CLASSIFICATION_DEFINITIONS = {
+    "Asset": "Resources owned by the business that are expected to bring future economic benefit.",
+    "Liability": "Debts and obligations the business owes to outsiders.",
+    "Equity": "The owner's claim on the assets after all liabilities are paid; incomes increase it and expenses reduce it.",
+    "Non-Current Assets": "Assets held for use over more than one year, such as buildings, machinery and long-term investments.",
+    "Current Assets": "Assets expected to be converted into cash or used up within one year.",
+    "Non-Current Liabilities": "Obligations due after more than one year, such as long-term loans.",
+    "Current Liabilities": "Obligations due within one year, such as supplier bills and short-term loans.",
+    "Capital": "Money and assets contributed to the business by its owners.",
+    "Retained Earnings": "Accumulated profits kept in the business instead of being paid out to owners.",
+    "Incomes": "Earnings from selling goods or services and other gains; they increase equity.",
+    "Expenses": "Costs incurred to earn income; they reduce equity.",
+    "Property, Plant & Equipment": "Tangible long-lived assets such as land, buildings, machinery and furniture.",
+    "Intangible Assets": "Non-physical long-lived assets such as patents, trademarks, software and goodwill.",
+    "Long Term Investments": "Investments the business intends to hold for more than one year.",
+    "Other Non Current Assets": "Long-term assets that do not fit another non-current line item, such as long-term deposits.",
+    "Inventory": "Goods held for sale or materials used in production.",
+    "Trade Receivables": "Amounts customers owe for goods or services sold on credit.",
+    "Cash and Cash Equivalents": "Cash in hand, bank balances and very short-term liquid investments.",
+    "Other Current Assets": "Short-term assets such as prepaid expenses and advances to suppliers.",
+    "Trade Payables": "Amounts owed to suppliers for goods or services bought on credit.",
+    "Short Term Borrowings": "Loans and overdrafts repayable within one year.",
+    "Outstanding Expenses": "Expenses already incurred but not yet paid, such as unpaid wages or rent.",
+    "Short Term Provisions": "Amounts set aside for obligations of uncertain amount due within one year, such as tax or warranty provisions.",
+    "Advance from Customers": "Money received from customers before the goods or services are delivered.",
+    "Other Current Liabilities": "Short-term obligations that do not fit another current liability line item.",
+    "Borrowings": "Long-term loans, bonds and debentures repayable after more than one year.",
+    "Long Term Provisions": "Amounts set aside for long-term obligations such as employee retirement benefits.",
+    "Other Non Current Liabilities": "Long-term obligations that do not fit another non-current liability line item.",
+    "Revenue from Operations": "Income from the main business activity, such as sales of goods or services.",
+    "Other Incomes": "Income from activities outside the main business, such as interest or dividends received.",
+    "Material related Expenses": "Cost of raw materials and goods purchased for sale.",
+    "Employee Compensation Expenses": "Salaries, wages, bonuses and other staff benefits.",
+    "Depreciation & Amortization": "The portion of the cost of long-lived assets charged as an expense each period.",
+    "Finance Costs": "Interest and other costs of borrowing money.",
+    "Other Expenses": "Operating costs such as rent, utilities and advertising that do not fit another expense line item.",
+    "Tax Expenses": "Income tax charged on the profit for the period."
+}
+
+
+# ---------- BM25 Retrieval ----------
+def stem(token):
+    # Plural folding is enough for headings like "Liability" vs "liabilities"
+    if token.endswith("ies") and len(token) > 4:
+        return token[:-3] + "y"
+    if token.endswith("s") and not token.endswith("ss") and len(token) > 3:
+        return token[:-1]
+    return token
+
+
+def content_tokens(text):
+    # Single letters are left over from apostrophes ("what's", "company's") and match nearly everything
+    return [stem(token) for token in tokenize(text) if len(token) > 1 and token not in STOPWORDS]
+
+
+def split_sections(markdown_text):
+    # One document per "###" heading of a Learning Hub tab
+    sections = []
+    for chunk in re.split(r"^\s*### ", markdown_text, flags=re.MULTILINE):
+        chunk = chunk.strip()
+        if not chunk:
+            continue
+        title, _, body = chunk.partition("\n")
+        sections.append((title.strip(), body.strip()))
+    return sections
+
+
+def build_documents(learning_content, sub_classification_options, line_item_options):
+    documents = [(title, answer) for title, answer in FAQ_ANSWERS.items()]
+
+    for markdown_text in learning_content.values():
+        for title, body in split_sections(textwrap.dedent(markdown_text)):
+            documents.append((title, f"**{title}**\n\n{body}"))
+
+    # Glossary of every classification the entry form offers
+    for acc_type, subs in sub_classification_options.items():
+        documents.append((acc_type, f"**{acc_type}** (account type): {CLASSIFICATION_DEFINITIONS.get(acc_type, '')} "
+                                    f"Sub-classifications: {', '.join(subs)}."))
+        for sub in subs:
+            items = line_item_options.get(sub, [])
+            documents.append((sub, f"**{sub}** (sub-classification of {acc_type}): {CLASSIFICATION_DEFINITIONS.get(sub, '')} "
+                                   f"Line items: {', '.join(items)}."))
+            for item in items:
+                if item == "Not Applicable":
+                    continue
+                documents.append((item, f"**{item}** (line item under {sub}, {acc_type}): {CLASSIFICATION_DEFINITIONS.get(item, '')}"))
+    return documents
+
+
+class BM25Index:
+    """Precomputed BM25 postings over a small, static document collection."""
+
+    def __init__(self, documents, k1=1.5, b=0.75):
+        self.documents = documents
+        self.k1 = k1
+        self.b = b
+        self.postings = {}     # term -> list of (doc id, term frequency)
+        self.doc_lengths = []
+        self.title_terms = [set(content_tokens(title)) for title, _ in documents]
+        for doc_id, (title, text) in enumerate(documents):
+            # Titles count twice so an exact heading match wins
+            terms = content_tokens(title) * 2 + content_tokens(text)
+            self.doc_lengths.append(len(terms))
+            for term, freq in Counter(terms).items():
+                self.postings.setdefault(term, []).append((doc_id, freq))
+        count = len(documents)
+        self.avg_length = sum(self.doc_lengths) / count if count else 0
+        self.idf = {
+            term: math.log(1 + (count - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+
+    def search(self, query, limit=3):
+        query_terms = set(content_tokens(query))
+        scores = {}
+        for term in query_terms:
+            idf = self.idf.get(term)
+            if idf is None:
+                continue
+            for doc_id, freq in self.postings[term]:
+                norm = self.k1 * (1 - self.b + self.b * self.doc_lengths[doc_id] / self.avg_length)
+                scores[doc_id] = scores.get(doc_id, 0.0) + idf * freq * (self.k1 + 1) / (freq + norm)
+        # A question naming the whole heading ("current assets") beats a longer heading that contains it
+        for doc_id in scores:
+            if self.title_terms[doc_id] and self.title_terms[doc_id] <= query_terms:
+                scores[doc_id] *= 2
+        ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+        return [(self.documents[doc_id], score) for doc_id, score in ranked[:limit]]
+
+
+# ---------- Ledger Intent Router ----------
+RATIO_PATTERNS = [
+    (r"\bcurrent ratio\b", "Current Ratio", "Current Assets / Current Liabilities"),
+    (r"\bquick ratio\b|\bacid test\b", "Quick Ratio", "(Current Assets - Inventory) / Current Liabilities"),
+    (r"\bdebt to equity\b|\bdebt equity\b", "Debt to Equity", "Total Liabilities / Total Equity"),
+    (r"\bdebt to assets?\b", "Debt to Assets", "Total Liabilities / Total Assets"),
+    (r"\b(net )?profit margin\b", "Net Profit Margin", "(Net Income / Revenue) × 100"),
+    (r"\breturn on assets\b|\broa\b", "Return on Assets", "(Net Income / Total Assets) × 100"),
+    (r"\breturn on equity\b|\broe\b", "Return on Equity", "(Net Income / Total Equity) × 100")
+]
+
+TOTAL_PATTERNS = [
+    (r"\bcash\b.*\b(balance|have|left|position)\b|\b(balance|how much)\b.*\bcash\b", "cash", "Cash balance"),
+    (r"\btotal assets\b", "total_assets", "Total Assets"),
+    (r"\btotal liabilities\b", "total_liabilities", "Total Liabilities"),
+    (r"\btotal equity\b", "total_equity", "Total Equity"),
+    (r"\bcurrent assets\b", "current_assets", "Current Assets"),
+    (r"\bcurrent liabilities\b", "current_liabilities", "Current Liabilities"),
+    (r"\bnet (income|profit|loss)\b", "net_income", "Net Income"),
+    (r"\b(total )?revenue\b|\b(total )?income(s)?\b(?! statement)", "revenue", "Revenue"),
+    (r"\btotal expenses\b|\bhow much .*\bspen[dt]\b", "total_expenses", "Total Expenses")
+]
+
+# Totals are only looked up for questions about the user's own books, so
+# "what are current assets?" still reaches the glossary
+LEDGER_QUESTION = re.compile(r"\b(my|our|total|balance|how much|currently|now|today)\b")
+
+
+def format_ratio(name, value):
+    if value == float('inf'):
+        return "∞"
+    if "Margin" in name or "Return" in name:
+        return f"{value:.1f}%"
+    return f"{value:.2f}"
+
+
+def answer_ledger_question(question, totals, accounts, currency=BASE_CURRENCY):
+    text = question.lower()
+    for pattern, name, formula in RATIO_PATTERNS:
+        if re.search(pattern, text):
+            if not totals.transaction_count:
+                return "No transactions recorded yet. Add transactions to see your ratios."
+            value = ratio_values(totals.summary())[name]
+            return f"Your **{name}** is **{format_ratio(name, value)}** ({formula})."
+
+    if not LEDGER_QUESTION.search(text):
+        return None
+
+    for pattern, key, label in TOTAL_PATTERNS:
+        if re.search(pattern, text):
+            if not totals.transaction_count:
+                return "No transactions recorded yet. Add transactions to see your balances."
+            return f"Your **{label}** is **{format_amount(totals.summary()[key], currency)}**."
+
+    # "balance of inventory", "rent expenses balance", ...
+    if "balance" in text:
+        for account_id, amount in totals.account_balances(accounts).items():
+            name = accounts.name(account_id)
+            key = account_key(name)
+            if key and re.search(rf"\b{re.escape(key)}\b", text):
+                return f"The balance of **{name}** is **{format_amount(amount, currency)}**."
+    return None
+
+
+class AccountingAssistant:
+    def __init__(self, documents, min_score=1.0):
+        self.index = BM25Index(documents)
+        self.min_score = min_score
+
+    def answer(self, question, totals, accounts, currency=BASE_CURRENCY):
+        ledger_answer = answer_ledger_question(question, totals, accounts, currency)
+        if ledger_answer is not None:
+            return ledger_answer
+
+        results = self.index.search(question, limit=1)
+        if not results or results[0][1] < self.min_score:
+            return FALLBACK_RESPONSE
+        (_, text), _ = results[0]
+        return text
@@ -0,0 +1,465 @@
+# --- Audit Trail: a hash chain over every committed change ---
+# Usage: python audit.py [student_transactions.json] [--full] [--sample N] [--transaction ID] [--json]
+#
+# Every commit appends one entry per change to <ledger>.audit.jsonl, which is never compacted: who made it,
+# when, the change with its before/after images, and a digest of the whole ledger after it. Each entry's
+# "hash" rolls the previous one forward, so editing, dropping or reordering an entry breaks every hash after it.
+# Every AUDIT_CHECKPOINT_INTERVAL entries a checkpoint line records the running hash and the Merkle root over
+# all entries so far, kept as a mountain range: at most log2(n) perfect trees whose peaks stand for the history,
+# plus the Merkle path from the newest entry up to its peak.
+#
+# The default check is O(log n) in the trail's length: the last checkpoint's newest entry is rehashed and climbs
+# its path to a peak, the peaks must fold to the checkpoint's root, and the entries since are rehashed onto its
+# running hash. Earlier entries are not read; --sample N also rehashes N earlier checkpoint intervals picked at
+# random. --full rehashes everything against every checkpoint and names the first entry that no longer matches,
+# and also names the transactions whose stored version differs from the last one the trail saw committed.
+import argparse
+import getpass
+import hashlib
+import json
+import os
+import random
+import sys
+import threading
+from datetime import datetime, timezone
+
+AUDIT_CHECKPOINT_INTERVAL = 1000
+GENESIS = "0" * 64
+DIGEST_MODULUS = 2 ** 256
+REPORT_LIMIT = 20
+
+try:
+    DEFAULT_ACTOR = getpass.getuser()
+except Exception:  # no login name, e.g. in a container without a passwd entry
+    DEFAULT_ACTOR = "unknown"
+
+_actor = threading.local()
+
+
+def set_actor(name):
+    # Who the commits made on this thread are recorded as; each app session and API request sets its own
+    _actor.name = name
+
+
+def current_actor():
+    return getattr(_actor, "name", None) or DEFAULT_ACTOR
+
+
+# ---------- Hashing ----------
+def canonical(value):
+    return json.dumps(value, sort_keys=True, separators=(",", ":")).encode()
+
+
+def leaf_hash(entry):
+    # Everything but the entry's own running hash; the prefixes keep leaves and inner nodes apart
+    return hashlib.sha256(b"\x00" + canonical({key: value for key, value in entry.items() if key != "hash"})).hexdigest()
+
+
+def node_hash(left, right):
+    return hashlib.sha256(b"\x01" + bytes.fromhex(left) + bytes.fromhex(right)).hexdigest()
+
+
+def chain_hash(previous, leaf):
+    return hashlib.sha256(bytes.fromhex(previous) + bytes.fromhex(leaf)).hexdigest()
+
+
+def transaction_hash(txn):
+    return hashlib.sha256(canonical(txn)).hexdigest()
+
+
+class StateDigest:
+    """Order-independent digest of the ledger: the sum of its transactions' hashes, kept up to date per commit."""
+
+    def __init__(self):
+        self.value = 0
+
+    @classmethod
+    def build(cls, items):
+        digest = cls()
+        for txn_id, txn in items:
+            digest.add(txn_id, txn)
+        return digest
+
+    def add(self, txn_id, txn, sign=1):
+        self.value = (self.value + sign * int(transaction_hash(txn), 16)) % DIGEST_MODULUS
+
+    def remove(self, txn_id, txn):
+        self.add(txn_id, txn, sign=-1)
+
+    def hex(self):
+        return f"{self.value:064x}"
+
+
+class MerkleAccumulator:
+    """Merkle mountain range over entry hashes: one perfect tree per set bit of the entry count.
+
+    Adding a leaf merges equal-height peaks, O(log n); the root folds the peaks right to left. The peaks
+    merged are the new leaf's left siblings, kept in ``path`` so a checkpoint can prove its newest entry.
+    """
+
+    def __init__(self, peaks=()):
+        self.peaks = [[height, node] for height, node in peaks]
+        self.path = []              # sibling hashes from the newest leaf up to its peak
+
+    def add(self, leaf):
+        height, node, path = 0, leaf, []
+        while self.peaks and self.peaks[-1][0] == height:
+            sibling = self.peaks.pop()[1]
+            path.append(sibling)
+            node = node_hash(sibling, node)
+            height += 1
+        self.peaks.append([height, node])
+        self.path = path
+
+    def root(self):
+        root = None
+        for _, node in reversed(self.peaks):
+            root = node if root is None else node_hash(node, root)
+        return root or GENESIS
+
+
+def read_checkpoints(path):
+    if not os.path.exists(path):
+        return []
+    with open(path, "rb") as f:
+        return [json.loads(line) for line in f.read().splitlines() if line.strip()]
+
+
+class AuditTrail:
+    """Appends entries to ``<base>.audit.jsonl`` and checkpoints to ``<base>.audit-checkpoints.jsonl``.
+
+    Callers hold the ledger's file lock, so processes take turns; before appending, the entries
+    other processes wrote are folded in, resuming from the last checkpoint on first use.
+    """
+
+    def __init__(self, base, checkpoint_interval=AUDIT_CHECKPOINT_INTERVAL):
+        self.path = base + ".audit.jsonl"
+        self.checkpoint_path = base + ".audit-checkpoints.jsonl"
+        self.checkpoint_interval = checkpoint_interval
+        self.offset = None          # bytes of the trail folded in so far; None until first used
+
+    def _resume(self, size):
+        checkpoint = next((cp for cp in reversed(read_checkpoints(self.checkpoint_path)) if cp["offset"] <= size), None)
+        if checkpoint is None:
+            self.count, self.chain, self.tree, self.offset = 0, GENESIS, MerkleAccumulator(), 0
+        else:
+            self.count, self.chain = checkpoint["n"], checkpoint["chain"]
+            self.tree, self.offset = MerkleAccumulator(checkpoint["peaks"]), checkpoint["offset"]
+
+    def _catch_up(self):
+        size = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        if self.offset is None or size < self.offset:
+            # First use, or the file shrank underneath us: carry on from what the checkpoints vouch for
+            self._resume(size)
+        if size == self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            data = f.read()
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._fold(json.loads(line))
+        self.offset += end
+
+    def _fold(self, entry):
+        leaf = leaf_hash(entry)
+        self.chain = chain_hash(self.chain, leaf)
+        self.tree.add(leaf)
+        self.count += 1
+
+    def is_empty(self):
+        self._catch_up()
+        return self.count == 0
+
+    def append(self, records):
+        # records: (change, ledger digest, transaction count) per committed change, written in one go
+        self._catch_up()
+        time = datetime.now(timezone.utc).isoformat(timespec="milliseconds")
+        actor = current_actor()
+        lines, checkpoints, end = [], [], self.offset
+        for change, state, transactions in records:
+            entry = {"n": self.count, "time": time, "actor": actor, "change": change, "state": state, "transactions": transactions}
+            self._fold(entry)
+            entry["hash"] = self.chain
+            line = (json.dumps(entry) + "\n").encode()
+            lines.append(line)
+            end += len(line)
+            if self.count % self.checkpoint_interval == 0:
+                checkpoints.append({
+                    "n": self.count, "start": end - len(line), "offset": end, "chain": self.chain,
+                    "root": self.tree.root(), "peaks": [list(peak) for peak in self.tree.peaks],
+                    "path": list(self.tree.path), "time": time
+                })
+        with open(self.path, "ab") as f:
+            f.write(b"".join(lines))
+        self.offset = end
+        if checkpoints:
+            with open(self.checkpoint_path, "a") as f:
+                f.write("".join(json.dumps(checkpoint) + "\n" for checkpoint in checkpoints))
+
+
+# ---------- Verification ----------
+def _problem(entry, reason):
+    return {"entry": entry, "reason": reason}
+
+
+def _read_entries(f):
+    # (offset after the line, entry) for each complete line; a trailing partial line is an append in progress
+    offset = f.tell()
+    for line in f:
+        if not line.endswith(b"\n"):
+            return
+        offset += len(line)
+        if line.strip():
+            try:
+                yield offset, json.loads(line)
+            except ValueError:
+                yield offset, None
+
+
+def _check_entry(entry, expected_n, chain):
+    # (new running hash, problem or None) for the next entry of the trail
+    if entry is None:
+        return chain, _problem(expected_n, "entry is not valid JSON")
+    if entry.get("n") != expected_n:
+        return chain, _problem(expected_n, f"entry {expected_n} is missing (found entry {entry.get('n')} in its place)")
+    chain = chain_hash(chain, leaf_hash(entry))
+    if entry.get("hash") != chain:
+        return chain, _problem(expected_n, "content does not match its hash (edited, or an earlier entry was)")
+    return chain, None
+
+
+def _check_segment(f, previous, checkpoint):
+    # Rehash the entries between two checkpoints: (entries checked, problem or None). Starting from the earlier
+    # checkpoint's running hash and peaks, they must arrive at the later one's running hash and Merkle root.
+    if previous is None:
+        first, chain, tree, start = 0, GENESIS, MerkleAccumulator(), 0
+    else:
+        first, chain, tree, start = previous["n"], previous["chain"], MerkleAccumulator(previous["peaks"]), previous["offset"]
+    n = first
+    f.seek(start)
+    for line in f.read(checkpoint["offset"] - start).splitlines():
+        if not line.strip():
+            continue
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            entry = None
+        chain, problem = _check_entry(entry, n, chain)
+        if problem:
+            return n - first, problem
+        tree.add(leaf_hash(entry))
+        n += 1
+    if n != checkpoint["n"]:
+        return n - first, _problem(n, f"entries {n:,}-{checkpoint['n'] - 1:,} are missing before checkpoint {checkpoint['n']:,}")
+    if chain != checkpoint["chain"] or tree.root() != checkpoint["root"]:
+        return n - first, _problem(first, f"entries {first:,}-{n - 1:,} were rewritten with fresh hashes; checkpoint {n:,} disagrees")
+    return n - first, None
+
+
+def _check_checkpoint(f, checkpoint):
+    # O(log n): (the newest entry the checkpoint covers, problem or None). The entry's hash climbs the
+    # checkpoint's Merkle path to its lowest peak, and the peaks, one per set bit of n, fold to its root.
+    n, peaks, path = checkpoint["n"], checkpoint["peaks"], checkpoint["path"]
+    if [height for height, _ in peaks] != [bit for bit in reversed(range(n.bit_length())) if n >> bit & 1]:
+        return None, _problem(n - 1, f"checkpoint {n:,} does not have one peak per set bit of its entry count")
+    if MerkleAccumulator(peaks).root() != checkpoint["root"]:
+        return None, _problem(n - 1, f"checkpoint {n:,}: its peaks do not fold to its root")
+    f.seek(checkpoint["start"])
+    try:
+        entry = json.loads(f.read(checkpoint["offset"] - checkpoint["start"]))
+    except ValueError:
+        entry = None
+    if not isinstance(entry, dict) or entry.get("n") != n - 1:
+        return None, _problem(n - 1, f"entry {n - 1:,} is not where checkpoint {n:,} recorded it")
+    node = leaf_hash(entry)
+    for sibling in path:
+        node = node_hash(sibling, node)
+    if len(path) != peaks[-1][0] or node != peaks[-1][1] or entry.get("hash") != checkpoint["chain"]:
+        return None, _problem(n - 1, f"content does not match checkpoint {n:,} (edited, or rewritten with fresh hashes)")
+    return entry, None
+
+
+def verify_quick(trail, sample=0):
+    # The last checkpoint's newest entry against its Merkle path and root, then the entries after it, plus
+    # `sample` earlier checkpoint intervals picked at random; nothing else is read
+    result = {"mode": "quick", "entries": 0, "checked": 0, "checkpoint": None, "segments": 0, "sampled": 0, "problem": None, "last": None}
+    checkpoints = read_checkpoints(trail.checkpoint_path)
+    if not os.path.exists(trail.path):
+        if checkpoints:
+            result["problem"] = _problem(0, "trail file is missing")
+        return result
+    size = os.path.getsize(trail.path)
+    n, chain, offset = 0, GENESIS, 0
+    with open(trail.path, "rb") as f:
+        if checkpoints:
+            checkpoint = checkpoints[-1]
+            result["checkpoint"], result["segments"], result["entries"] = checkpoint["n"], len(checkpoints), checkpoint["n"]
+            if size < checkpoint["offset"]:
+                result["problem"] = _problem(checkpoint["n"] - 1, f"trail truncated: the last checkpoint covers {checkpoint['n']:,} entries")
+                return result
+            if "path" in checkpoint:
+                result["last"], problem = _check_checkpoint(f, checkpoint)
+                result["checked"] += 1
+            else:
+                # Written before checkpoints kept a path: rehash the interval that ends there instead
+                checked, problem = _check_segment(f, checkpoints[-2] if len(checkpoints) > 1 else None, checkpoint)
+                result["checked"] += checked
+                result["sampled"] += 1
+            if problem:
+                result["problem"] = problem
+                return result
+            earlier = random.sample(range(len(checkpoints) - 1), min(max(sample, 0), len(checkpoints) - 1))
+            for i in sorted(earlier):
+                checked, problem = _check_segment(f, checkpoints[i - 1] if i else None, checkpoints[i])
+                result["checked"] += checked
+                if problem:
+                    result["problem"] = problem
+                    return result
+            result["sampled"] += len(earlier)
+            if result["last"] is None:
+                f.seek(checkpoint["start"])
+                result["last"] = json.loads(f.read(checkpoint["offset"] - checkpoint["start"]))
+            n, chain, offset = checkpoint["n"], checkpoint["chain"], checkpoint["offset"]
+        f.seek(offset)
+        for _, entry in _read_entries(f):
+            chain, problem = _check_entry(entry, n, chain)
+            if problem:
+                result["problem"] = problem
+                return result
+            n += 1
+            result["checked"] += 1
+            result["last"] = entry
+        result["entries"] = n
+    return result
+
+
+def verify_full(trail):
+    # Every entry rehashed, every checkpoint compared; also replays the images to know each transaction's last version
+    result = {"mode": "full", "entries": 0, "checked": 0, "checkpoint": None, "problem": None, "last": None}
+    checkpoints = {checkpoint["n"]: checkpoint for checkpoint in read_checkpoints(trail.checkpoint_path)}
+    n, chain, tree = 0, GENESIS, MerkleAccumulator()
+    latest = {}                     # transaction id -> (entry, its hash or None once deleted)
+    if os.path.exists(trail.path):
+        with open(trail.path, "rb") as f:
+            for _, entry in _read_entries(f):
+                chain, problem = _check_entry(entry, n, chain)
+                if problem:
+                    result["problem"] = problem
+                    return result
+                tree.add(leaf_hash(entry))
+                n += 1
+                result["entries"] = result["checked"] = n
+                checkpoint = checkpoints.get(n)
+                if checkpoint and (checkpoint["chain"] != chain or checkpoint["root"] != tree.root()):
+                    previous = max([k for k in checkpoints if k < n], default=0)
+                    result["problem"] = _problem(previous, f"entries {previous:,}-{n - 1:,} were rewritten with fresh hashes; checkpoint {n:,} disagrees")
+                    return result
+                if checkpoint:
+                    result["checkpoint"] = n
+                _replay(latest, entry)
+                result["last"] = entry
+    missing = [k for k in checkpoints if k > n]
+    if missing:
+        result["problem"] = _problem(n, f"trail truncated: checkpoint {max(missing):,} covers entries up to {max(missing) - 1:,}")
+    result["latest"] = latest
+    return result
+
+
+def _replay(latest, entry):
+    change = entry["change"]
+    if change["op"] in ("undo", "redo"):
+        change = change["change"]
+    op = change["op"]
+    if op in ("add", "restore", "replace"):
+        latest[change["id"]] = (entry["n"], transaction_hash(change["txn"]))
+    elif op == "delete":
+        latest[change["id"]] = (entry["n"], None)
+    elif op in ("clear", "restore-archive"):
+        # Transactions went to or came back from an archive file, whose contents the trail does not hold
+        latest.clear()
+
+
+def verify_ledger(ledger, result):
+    # The ledger's digest against the last entry's, and with a full replay the transactions that differ
+    last = result["last"]
+    if last is None:
+        return []
+    problems = []
+    digest = StateDigest.build(ledger.items())
+    if digest.hex() != last["state"] or len(ledger) != last["transactions"]:
+        problems.append(
+            f"ledger does not match the trail: {len(ledger):,} transactions stored, {last['transactions']:,} "
+            f"after entry {last['n']:,} ({last['actor']}, {last['time']})"
+        )
+    for txn_id, (n, expected) in sorted(result.get("latest", {}).items()):
+        txn = ledger.get(txn_id)
+        found = None if txn is None else transaction_hash(txn)
+        if found != expected:
+            what = "missing" if found is None else ("present though deleted" if expected is None else "edited")
+            problems.append(f"transaction {txn_id} {what} since entry {n:,}")
+    return problems
+
+
+def transaction_history(trail, txn_id):
+    # Every entry touching one transaction, oldest first
+    found = []
+    if os.path.exists(trail.path):
+        with open(trail.path, "rb") as f:
+            for _, entry in _read_entries(f):
+                change = entry and entry["change"]
+                if change and change["op"] in ("undo", "redo"):
+                    change = change["change"]
+                if change and change["op"] not in ("merge", "unmerge") and change.get("id") == txn_id:
+                    found.append(entry)
+    return found
+
+
+def main(argv=None):
+    from ledger import LedgerStore
+
+    parser = argparse.ArgumentParser(description="Verify the ledger's audit trail and report the first corrupted entry.")
+    parser.add_argument("ledger", nargs="?", default="student_transactions.json")
+    parser.add_argument("--full", action="store_true", help="rehash every entry instead of starting from the last checkpoint")
+    parser.add_argument("--sample", type=int, default=0, metavar="N",
+                        help="also rehash N earlier checkpoint intervals picked at random")
+    parser.add_argument("--transaction", type=int, metavar="ID", help="list who changed this transaction and when")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    args = parser.parse_args(argv)
+
+    ledger = LedgerStore(args.ledger, read_only=True)
+    trail = ledger.audit
+    if args.transaction is not None:
+        for entry in transaction_history(trail, args.transaction):
+            change = entry["change"]
+            op = change["op"] if "change" not in change else f"{change['op']} {change['change']['op']}"
+            print(f"#{entry['n']:<8} {entry['time']}  {entry['actor']:<20} {op}")
+        return 0
+
+    with ledger.committed():
+        result = verify_full(trail) if args.full else verify_quick(trail, args.sample)
+        ledger_problems = verify_ledger(ledger, result) if result["problem"] is None else []
+    result.pop("latest", None)
+    if args.json:
+        print(json.dumps(dict(result, ledger=ledger_problems), indent=2))
+    else:
+        print(f"{trail.path}: {result['entries']:,} entries, {result['checked']:,} rehashed")
+        if result["problem"]:
+            print(f"FIRST CORRUPTED ENTRY: #{result['problem']['entry']:,}: {result['problem']['reason']}")
+        for problem in ledger_problems[:REPORT_LIMIT]:
+            print(f"LEDGER: {problem}")
+        if len(ledger_problems) > REPORT_LIMIT:
+            print(f"... and {len(ledger_problems) - REPORT_LIMIT:,} more")
+        if not result["problem"] and not ledger_problems:
+            if result["mode"] == "full" or result["sampled"] == result["segments"]:
+                print("OK: the trail is intact and the ledger matches it")
+            else:
+                print(f"OK: checkpoint {result['checkpoint']:,} matches its Merkle root, the {result['entries'] - result['checkpoint']:,} "
+                      "entries since chain onto it, and the ledger matches the trail")
+                print(f"({result['sampled']:,} of {result['segments']:,} checkpoint intervals rehashed; run --full to rehash the whole history)")
+    return 1 if result["problem"] or ledger_problems else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# --- Direct-Method Cash Flow ---
+from collections import defaultdict
+
+from accounts import TYPE_SIGNS
+
+CASH_LINE_ITEM = "Cash and Cash Equivalents"
+ACTIVITIES = ["Operating", "Investing", "Financing"]
+
+# Where the cash went (or came from), decided by the other side of the entry
+CASH_FLOW_CLASSES = {
+    ("Incomes", "Revenue from Operations"): ("Operating", "Cash received from customers"),
+    ("Incomes", "Other Incomes"): ("Operating", "Other income received"),
+    ("Current Assets", "Trade Receivables"): ("Operating", "Cash received from customers"),
+    ("Current Liabilities", "Advance from Customers"): ("Operating", "Cash received from customers"),
+    ("Current Assets", "Inventory"): ("Operating", "Cash paid to suppliers"),
+    ("Current Liabilities", "Trade Payables"): ("Operating", "Cash paid to suppliers"),
+    ("Expenses", "Material related Expenses"): ("Operating", "Cash paid to suppliers"),
+    ("Expenses", "Employee Compensation Expenses"): ("Operating", "Cash paid to employees"),
+    ("Expenses", "Tax Expenses"): ("Operating", "Income taxes paid"),
+    ("Expenses", "Finance Costs"): ("Financing", "Interest paid"),
+    ("Current Liabilities", "Short Term Borrowings"): ("Financing", "Short-term borrowings"),
+    ("Non-Current Liabilities", "Borrowings"): ("Financing", "Long-term borrowings"),
+    ("Non-Current Liabilities", "Other Non Current Liabilities"): ("Financing", "Other long-term financing"),
+    ("Capital", "Not Applicable"): ("Financing", "Capital contributed (withdrawn)"),
+    ("Retained Earnings", "Not Applicable"): ("Financing", "Distributions to owners"),
+    ("Non-Current Assets", "Property, Plant & Equipment"): ("Investing", "Property, plant & equipment"),
+    ("Non-Current Assets", "Intangible Assets"): ("Investing", "Intangible assets"),
+    ("Non-Current Assets", "Long Term Investments"): ("Investing", "Long-term investments"),
+    ("Non-Current Assets", "Other Non Current Assets"): ("Investing", "Other non-current assets")
+}
+OTHER_OPERATING = ("Operating", "Other operating cash flows")
+UNALLOCATED = ("Operating", "Unallocated (unbalanced entries)")
+
+
+def is_cash(acc):
+    return acc["type"] == "Asset" and acc["line_item"] == CASH_LINE_ITEM
+
+
+def classify_cash_movements(txn):
+    # None for a transaction that never touches cash. Otherwise each counter-posting's share
+    # of the cash change: in a balanced entry it is minus the posting's debit.
+    cash_postings = [acc for acc in txn["accounts"] if is_cash(acc)]
+    if not cash_postings:
+        return None
+    cash_change = sum(acc["amount"] for acc in cash_postings)
+    movements = defaultdict(float)
+    for acc in txn["accounts"]:
+        if not is_cash(acc):
+            line = CASH_FLOW_CLASSES.get((acc["sub"], acc["line_item"]), OTHER_OPERATING)
+            movements[line] -= acc["amount"] * TYPE_SIGNS.get(acc["type"], 1.0)
+    residual = cash_change - sum(movements.values())
+    if abs(residual) > 0.005:
+        movements[UNALLOCATED] += residual
+    return [(activity, label, amount) for (activity, label), amount in movements.items() if amount]
+
+
+class CashFlowIndex:
+    """Pre-classified cash movements of every transaction touching cash, updated on every commit."""
+
+    def __init__(self):
+        self.movements = {}                 # transaction id -> [(activity, label, amount)]
+        self.totals = defaultdict(float)    # (activity, label) -> amount
+        self.counts = defaultdict(int)      # same key -> number of movements, so empty lines drop out
+
+    @classmethod
+    def build(cls, items):
+        index = cls()
+        for txn_id, txn in items:
+            index.add(txn_id, txn)
+        return index
+
+    def add(self, txn_id, txn):
+        movements = classify_cash_movements(txn)
+        if movements is None:
+            return
+        self.movements[txn_id] = movements
+        self._count(movements, 1)
+
+    def remove(self, txn_id, txn):
+        movements = self.movements.pop(txn_id, None)
+        if movements is not None:
+            self._count(movements, -1)
+
+    def _count(self, movements, sign):
+        for activity, label, amount in movements:
+            key = (activity, label)
+            self.totals[key] += sign * amount
+            self.counts[key] += sign
+            if not self.counts[key]:
+                del self.totals[key], self.counts[key]
+
+    def statement(self):
+        # activity -> [(label, amount)] in a stable order, read straight from the running totals
+        lines = {activity: [] for activity in ACTIVITIES}
+        for (activity, label), amount in sorted(self.totals.items()):
+            lines[activity].append((label, amount))
+        return lines
@@ -1,14 +1,26 @@
 # --- Enhanced Streamlit Accounting Tool with AI Chatbot ---
 import streamlit as st
 import pandas as pd
-import json
-import os
-from datetime import datetime
+from datetime import date, datetime
 from io import BytesIO
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
+from search_index import TransactionSearchIndex
+from accounts import BASE_CURRENCY, account_key, classifications, line_item_options, posting_currency, sub_classification_options
+from ledger import LedgerStore, LedgerTotals, PeriodTotals, ratio_values
+from audit import set_actor
+from assistant import AccountingAssistant, build_documents, format_ratio
+from integrity import REPORT_TITLES, check_ledger
+from cash_flow import ACTIVITIES, CASH_LINE_ITEM, CashFlowIndex
+from general_ledger import AccountPostingIndex, account_history, account_posting_count, trial_balance
+from render_cache import RenderCache
+from scenarios import SHOCKS, parse_threshold, simulate, summarise
+from subledger import AGING_BUCKETS, SIDES, SUBLEDGERS, SubledgerIndex, aging_summary, counterparty_balances, open_item_rows
+from exporter import DEFAULT_COLUMNS, EXPORT_COLUMNS, export_postings, posting_rows
+from comparatives import BASELINES, GRANULARITIES, STATEMENTS, baseline_period, comparative_periods, comparative_statement, current_month, period_column, period_label, period_range, ratio_series, report_period_totals
+from fx import RateTable, format_amount, posting_factor, posting_frame_builder, rates_path, report_cash_flow, report_totals, transaction_postings
 
 # Page Configuration
 st.set_page_config(
@@ -104,16 +116,22 @@ st.markdown("""
 
 # Constants
 SAVE_FILE = "student_transactions.json"
+SEARCH_RESULT_LIMIT = 50
+CHAT_HISTORY_LIMIT = 50
+UNDO_MEMORY_BUDGET = 4 * 1024 * 1024  # bytes of undo deltas kept in memory and in the snapshot
+GENERAL_LEDGER_PAGE_SIZE = 50
+OPEN_ITEM_LIMIT = 50
+TYPEAHEAD_LIMIT = 20
+RENDER_CACHE_BUDGET = 32 * 1024 * 1024  # bytes of figures and tables kept across reruns
+SCENARIO_RUNS = 10_000
+SCENARIO_SEED = 0
 
 # Initialize Session State
 if "account_inputs" not in st.session_state:
     st.session_state.account_inputs = []
 
-if "submitted_transactions" not in st.session_state:
-    st.session_state.submitted_transactions = []
-
-if "edit_index" not in st.session_state:
-    st.session_state.edit_index = None
+if "edit_id" not in st.session_state:
+    st.session_state.edit_id = None
 
 if "transaction_desc" not in st.session_state:
     st.session_state.transaction_desc = ""
@@ -127,27 +145,78 @@ if "pending_edit" not in st.session_state:
 if "chat_history" not in st.session_state:
     st.session_state.chat_history = []
 
-# Save & Load Functions
-def save_to_file():
-    with open(SAVE_FILE, "w") as f:
-        json.dump({
-            "submitted_transactions": st.session_state.submitted_transactions
-        }, f)
+if "entry_transaction_date" not in st.session_state:
+    st.session_state.entry_transaction_date = date.today()
+
+# ---------- Ledger ----------
+@st.cache_resource
+def get_rates():
+    # Exchange rates next to the ledger; reloaded when another process adds a quote
+    return RateTable(rates_path(SAVE_FILE))
+
+rates = get_rates()
+
+@st.cache_resource
+def get_ledger():
+    # One store per process shared by every session; writes from other processes arrive through its journal
+    return LedgerStore(SAVE_FILE, {
+        "search_index": TransactionSearchIndex.build,
+        "totals": LedgerTotals.build,
+        "postings": AccountPostingIndex.build,
+        "cash_flow": CashFlowIndex.build,
+        "period_totals": PeriodTotals.build,
+        "subledger": SubledgerIndex.build,
+        "fx_postings": posting_frame_builder(get_rates())
+    }, history_budget=UNDO_MEMORY_BUDGET)
+
+ledger = get_ledger()
+ledger.refresh()
+# Commits made in this rerun go into the audit trail under the name given in the sidebar
+set_actor(f"app:{st.session_state.get('audit_actor') or 'anonymous'}")
+
+@st.cache_resource
+def get_render_cache():
+    # Figures and tables keyed by ledger version, so sessions reuse them until the next commit
+    return RenderCache(RENDER_CACHE_BUDGET)
+
+render_cache = get_render_cache()
+
+def get_search_index():
+    return ledger.view("search_index")
 
-def load_from_file():
-    if os.path.exists(SAVE_FILE):
-        with open(SAVE_FILE, "r") as f:
-            data = json.load(f)
-            st.session_state.submitted_transactions = data.get("submitted_transactions", [])
+def reporting_currency():
+    return st.session_state.get("reporting_currency", BASE_CURRENCY)
+
+def get_report_totals():
+    # Running totals, or the same totals converted into the reporting currency
+    return report_totals(ledger, reporting_currency())[0]
+
+def get_period_totals():
+    # Balances per (month, classification) in the reporting currency, for period columns and trends
+    return report_period_totals(ledger, reporting_currency())[0]
+
+def format_currency(amount):
+    return format_amount(amount, reporting_currency())
+
+def selected_account_for(acc):
+    # An existing account keeps its picker entry unless this posting was booked under another classification
+    known = ledger.accounts.classification(acc["account_id"])
+    if known == {"type": acc["type"], "sub": acc["sub"], "line_item": acc["line_item"]}:
+        return ledger.accounts.label(acc["account_id"])
+    return "Other (New Account)"
 
 # ---------- Apply pending edit ----------
 if st.session_state.pending_edit is not None:
-    entry = st.session_state.submitted_transactions[st.session_state.pending_edit]
-    st.session_state.transaction_desc = entry.get("description", "")
-    for acc in entry["accounts"]:
-        acc["selected_account"] = acc["name"]
-    st.session_state.account_inputs = entry["accounts"].copy()
-    st.session_state.edit_index = st.session_state.pending_edit
+    entry = ledger.get(st.session_state.pending_edit)
+    # Gone if another session deleted it after the Edit button was rendered
+    if entry is not None:
+        st.session_state.transaction_desc = entry.get("description", "")
+        st.session_state.entry_transaction_desc = st.session_state.transaction_desc
+        st.session_state.entry_transaction_date = date.fromisoformat(entry["date"]) if entry.get("date") else date.today()
+        st.session_state.account_inputs = [
+            dict(acc, selected_account=selected_account_for(acc)) for acc in entry["accounts"]
+        ]
+        st.session_state.edit_id = st.session_state.pending_edit
     st.session_state.pending_edit = None
     st.rerun()
 
@@ -156,53 +225,93 @@ if st.session_state.clear_description:
     st.session_state.transaction_desc = ""
     st.session_state.clear_description = False
 
-# ---------- Known Accounts ----------
-def get_known_accounts():
-    account_dict = {}
-    for entry in st.session_state.submitted_transactions:
-        for acc in entry["accounts"]:
-            account_dict[acc["name"]] = {
-                "type": acc["type"],
-                "sub": acc["sub"],
-                "line_item": acc["line_item"]
-            }
-    return account_dict
+# ---------- Account Typeahead ----------
+def account_options(query, selected=None):
+    # The first matches from the chart's prefix index, so a picker costs the same for 50 accounts or 50,000;
+    # one entry per chart-of-accounts account, so "cash" and "Cash " are offered once, and a name used
+    # under two classifications is offered twice, each labelled with its classification
+    names = [ledger.accounts.label(record["id"]) for record in ledger.accounts.search(query, TYPEAHEAD_LIMIT)]
+    if selected is not None and selected not in names:
+        names.insert(0, selected)
+    return names
 
-known_accounts = get_known_accounts()
-known_account_names = sorted(known_accounts.keys())
+def account_picker(label, key):
+    # Filter box plus a selectbox of the matches; returns the picked account id, or None if nothing matches
+    query = st.text_input(f"Find {label}", key=f"{key}_query", placeholder="Type to filter accounts")
+    options = account_options(query)
+    if not options:
+        st.caption("No matching accounts.")
+        return None
+    return ledger.accounts.find(st.selectbox(label, options, key=key))
 
-# ---------- Classification Options ----------
-sub_classification_options = {
-    "Asset": ["Non-Current Assets", "Current Assets"],
-    "Liability": ["Non-Current Liabilities", "Current Liabilities"],
-    "Equity": ["Capital", "Retained Earnings", "Incomes", "Expenses"]
-}
+def assets_liabilities_figure(total_assets, total_liabilities):
+    fig = go.Figure(data=[
+        go.Bar(
+            name='Assets',
+            x=['Financial Position'],
+            y=[total_assets],
+            marker_color='#28a745'
+        ),
+        go.Bar(
+            name='Liabilities',
+            x=['Financial Position'],
+            y=[total_liabilities],
+            marker_color='#dc3545'
+        )
+    ])
+    fig.update_layout(
+        title="Assets vs Liabilities",
+        barmode='group',
+        height=400,
+        showlegend=True,
+        yaxis_title=f"Amount ({reporting_currency()})",
+        margin=dict(t=30, b=0, l=0, r=0)
+    )
+    return fig
 
-line_item_options = {
-    "Non-Current Assets": ["Property, Plant & Equipment", "Intangible Assets", "Long Term Investments", "Other Non Current Assets"],
-    "Current Assets": ["Inventory", "Trade Receivables", "Cash and Cash Equivalents", "Other Current Assets"],
-    "Current Liabilities": ["Trade Payables", "Short Term Borrowings", "Outstanding Expenses", "Short Term Provisions", "Advance from Customers", "Other Current Liabilities"],
-    "Non-Current Liabilities": ["Borrowings", "Long Term Provisions", "Other Non Current Liabilities"],
-    "Capital": ["Not Applicable"],
-    "Retained Earnings": ["Not Applicable"],
-    "Incomes": ["Revenue from Operations", "Other Incomes"],
-    "Expenses": ["Material related Expenses", "Employee Compensation Expenses", "Depreciation & Amortization", "Finance Costs", "Other Expenses", "Tax Expenses"]
-}
+def transaction_trend_figure():
+    transactions, postings = transaction_postings(ledger, reporting_currency())
+    balance_sheet = np.isin(postings["class_id"], [
+        class_id for class_id, (acc_type, _, _) in enumerate(classifications) if acc_type in ("Asset", "Liability")
+    ])
+    dates = [description for _, description in transactions]
+    amounts = np.cumsum(np.bincount(
+        postings["txn"][balance_sheet], weights=postings["amount"][balance_sheet], minlength=len(transactions)
+    ))
+
+    fig = go.Figure()
+    fig.add_trace(
+        go.Scatter(
+            x=dates,
+            y=amounts,
+            mode='lines+markers',
+            name='Cumulative Amount',
+            line=dict(color='#2a5298', width=2),
+            marker=dict(size=8)
+        )
+    )
+    fig.update_layout(
+        title="Transaction Trend",
+        height=400,
+        showlegend=True,
+        xaxis_title="Transaction",
+        yaxis_title=f"Cumulative Amount ({reporting_currency()})",
+        margin=dict(t=30, b=0, l=0, r=0)
+    )
+    return fig
 
 def show_dashboard():
     st.markdown("## 🏠 Dashboard")
     
-    if not st.session_state.submitted_transactions:
+    if not ledger:
         st.info("👋 Welcome! Start by adding transactions to see your financial dashboard.")
         return
     
     # Calculate key metrics
-    total_assets = sum(acc["amount"] for txn in st.session_state.submitted_transactions 
-                      for acc in txn["accounts"] if acc["type"] == "Asset")
-    total_liabilities = sum(acc["amount"] for txn in st.session_state.submitted_transactions 
-                          for acc in txn["accounts"] if acc["type"] == "Liability")
-    total_equity = sum(acc["amount"] for txn in st.session_state.submitted_transactions 
-                      for acc in txn["accounts"] if acc["type"] == "Equity")
+    totals = get_report_totals()
+    total_assets = totals.total("Asset")
+    total_liabilities = totals.total("Liability")
+    total_equity = totals.total("Equity")
     
     # Key Metrics Section
     col1, col2, col3, col4 = st.columns(4)
@@ -211,7 +320,7 @@ def show_dashboard():
         st.markdown(f"""
         <div class="metric-card">
             <h3>Total Assets</h3>
-            <h2>₹{total_assets:,.2f}</h2>
+            <h2>{format_currency(total_assets)}</h2>
         </div>
         """, unsafe_allow_html=True)
     
@@ -219,7 +328,7 @@ def show_dashboard():
         st.markdown(f"""
         <div class="metric-card">
             <h3>Total Liabilities</h3>
-            <h2>₹{total_liabilities:,.2f}</h2>
+            <h2>{format_currency(total_liabilities)}</h2>
         </div>
         """, unsafe_allow_html=True)
     
@@ -227,7 +336,7 @@ def show_dashboard():
         st.markdown(f"""
         <div class="metric-card">
             <h3>Total Equity</h3>
-            <h2>₹{total_equity:,.2f}</h2>
+            <h2>{format_currency(total_equity)}</h2>
         </div>
         """, unsafe_allow_html=True)
     
@@ -246,84 +355,53 @@ def show_dashboard():
     
     with col1:
         # Assets vs Liabilities Chart
-        fig = go.Figure(data=[
-            go.Bar(
-                name='Assets',
-                x=['Financial Position'],
-                y=[total_assets],
-                marker_color='#28a745'
-            ),
-            go.Bar(
-                name='Liabilities',
-                x=['Financial Position'],
-                y=[total_liabilities],
-                marker_color='#dc3545'
-            )
-        ])
-        fig.update_layout(
-            title="Assets vs Liabilities",
-            barmode='group',
-            height=400,
-            showlegend=True,
-            yaxis_title="Amount (₹)",
-            margin=dict(t=30, b=0, l=0, r=0)
+        fig = render_cache.get(
+            "assets_vs_liabilities", ledger.version, lambda: assets_liabilities_figure(total_assets, total_liabilities),
+            reporting_currency(), rates.version
         )
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         # Transaction Trend
-        if len(st.session_state.submitted_transactions) > 1:
-            dates = []
-            amounts = []
-            running_total = 0
-            
-            for txn in st.session_state.submitted_transactions:
-                dates.append(txn["description"])
-                txn_amount = sum(acc["amount"] for acc in txn["accounts"] if acc["type"] in ["Asset", "Liability"])
-                running_total += txn_amount
-                amounts.append(running_total)
-            
-            fig = go.Figure()
-            fig.add_trace(
-                go.Scatter(
-                    x=dates,
-                    y=amounts,
-                    mode='lines+markers',
-                    name='Cumulative Amount',
-                    line=dict(color='#2a5298', width=2),
-                    marker=dict(size=8)
-                )
-            )
-            fig.update_layout(
-                title="Transaction Trend",
-                height=400,
-                showlegend=True,
-                xaxis_title="Transaction",
-                yaxis_title="Cumulative Amount (₹)",
-                margin=dict(t=30, b=0, l=0, r=0)
-            )
+        if len(ledger) > 1:
+            fig = render_cache.get("transaction_trend", ledger.version, transaction_trend_figure, reporting_currency(), rates.version)
             st.plotly_chart(fig, use_container_width=True)
     
     # Recent Transactions
     st.subheader("Recent Transactions")
-    recent_txns = st.session_state.submitted_transactions[-5:]  # Show last 5 transactions
+    recent_txns = ledger.recent(5)  # Show last 5 transactions
     for txn in recent_txns:
         with st.expander(f"📝 {txn['description']}"):
             for acc in txn["accounts"]:
-                st.write(f"• {acc['name']}: ₹{acc['amount']:,.2f} ({acc['type']})")
+                st.write(f"• {acc['name']}: {format_amount(acc['amount'], posting_currency(acc))} ({acc['type']})")
 
 def show_transaction_entry():
     st.markdown("## ➕ Transaction Entry")
     
-    # Add Reset/Delete Transactions Button at the top
+    # Add Undo/Redo and Reset/Delete Transactions Buttons at the top
     col1, col2 = st.columns([3, 1])
+    with col1:
+        undo_col, redo_col = st.columns(2)
+        undo_delta = ledger.peek_undo()
+        redo_delta = ledger.peek_redo()
+        with undo_col:
+            undo_label = f"↩️ Undo {describe_change(undo_delta)}" if undo_delta else "↩️ Undo"
+            if st.button(undo_label, key="undo_btn", disabled=undo_delta is None):
+                # The button names the change it undoes; refuse if another session changed the ledger since
+                if not ledger.undo(undo_delta["seq"]):
+                    st.warning("The ledger changed in another session. Please check before undoing again.")
+                st.rerun()
+        with redo_col:
+            redo_label = f"↪️ Redo {describe_change(redo_delta)}" if redo_delta else "↪️ Redo"
+            if st.button(redo_label, key="redo_btn", disabled=redo_delta is None):
+                if not ledger.redo(redo_delta["seq"]):
+                    st.warning("The ledger changed in another session. Please check before redoing again.")
+                st.rerun()
     with col2:
         if st.button("🗑️ Reset All Transactions", type="secondary"):
-            if st.session_state.submitted_transactions:
+            if ledger:
                 if st.warning("⚠️ Are you sure you want to delete all transactions? Click again to confirm."):
-                    st.session_state.submitted_transactions = []
-                    if os.path.exists(SAVE_FILE):
-                        os.remove(SAVE_FILE)
+                    ledger.clear()
                     st.success("✅ All transactions have been deleted!")
                     st.rerun()
     
@@ -338,6 +416,7 @@ def show_transaction_entry():
         # Transaction Description
         st.subheader("Enter Transaction Details")
         transaction_desc = st.text_input("Transaction Description", key="entry_transaction_desc", label_visibility="visible", disabled=False)
+        transaction_date = st.date_input("Transaction Date", key="entry_transaction_date")
         
         # Add Account Button
         if st.button("➕ Add Another Account", key="add_account_btn"):
@@ -347,7 +426,8 @@ def show_transaction_entry():
                 "type": "Asset",
                 "sub": "Current Assets",
                 "line_item": "",
-                "amount": 0.0
+                "amount": 0.0,
+                "currency": BASE_CURRENCY
             })
         
         # Render Account Inputs
@@ -361,20 +441,25 @@ def show_transaction_entry():
                 
                 col1, col2 = st.columns(2)
                 with col1:
-                    options = known_account_names + ["Other (New Account)"]
+                    query = st.text_input("Find Account", key=f"account_query_{i}", placeholder="Type to filter accounts")
+                    current = acc["selected_account"] if acc["selected_account"] != "Other (New Account)" else None
+                    options = account_options(query, current) + ["Other (New Account)"]
+                    positions = {name: pos for pos, name in enumerate(options)}
                     acc["selected_account"] = st.selectbox(
                         "Select Account",
                         options,
-                        index=options.index(acc["selected_account"]) if acc["selected_account"] in options else len(options) - 1,
+                        index=positions.get(acc["selected_account"], len(options) - 1),
                         key=f"select_{i}"
                     )
                     
-                    is_new = acc["selected_account"] == "Other (New Account)"
+                    # A label no longer in the chart (another session renamed its namesakes) is entered as new
+                    account_id = ledger.accounts.find(acc["selected_account"])
+                    is_new = account_id is None
                     if is_new:
                         acc["name"] = st.text_input("New Account Name", value=acc["name"], key=f"name_{i}", label_visibility="visible", disabled=False)
                     else:
-                        acc["name"] = acc["selected_account"]
-                        acc.update(known_accounts[acc["name"]])
+                        acc["name"] = ledger.accounts.name(account_id)
+                        acc.update(ledger.accounts.classification(account_id))
                 
                 with col2:
                     acc["type"] = st.selectbox(
@@ -407,7 +492,7 @@ def show_transaction_entry():
                             disabled=not is_new
                         )
                 
-                col3, col4 = st.columns([3, 1])
+                col3, currency_col, col4 = st.columns([2, 1, 1])
                 with col3:
                     acc["amount"] = st.number_input(
                         "Amount",
@@ -415,9 +500,29 @@ def show_transaction_entry():
                         key=f"amount_{i}",
                         format="%.2f"
                     )
+                with currency_col:
+                    currencies = sorted(set(rates.currencies()) | {posting_currency(acc)})
+                    acc["currency"] = st.selectbox(
+                        "Currency",
+                        currencies,
+                        index=currencies.index(posting_currency(acc)),
+                        key=f"currency_{i}"
+                    )
                 with col4:
                     if st.button("🗑️ Delete", key=f"delete_{i}"):
                         accounts_to_delete.append(i)
+
+                # Receivables and payables carry who owes and when, for the aging sub-ledger
+                if acc["line_item"] in SUBLEDGERS:
+                    party_col, due_col = st.columns([3, 1])
+                    with party_col:
+                        acc["counterparty"] = st.text_input("Counterparty", value=acc.get("counterparty", ""), key=f"counterparty_{i}", placeholder="Customer or supplier")
+                    with due_col:
+                        due_date = date.fromisoformat(acc["due_date"]) if acc.get("due_date") else transaction_date
+                        acc["due_date"] = st.date_input("Due Date", value=due_date, key=f"due_date_{i}").isoformat()
+                else:
+                    acc.pop("counterparty", None)
+                    acc.pop("due_date", None)
                 
                 st.markdown('</div>', unsafe_allow_html=True)
         
@@ -429,43 +534,115 @@ def show_transaction_entry():
         # Submit Transaction
         if st.button("💾 Submit Transaction", key="submit_transaction"):
             if transaction_desc.strip() and all(acc["name"].strip() and acc["amount"] != 0 for acc in st.session_state.account_inputs):
-                new_entry = {"description": transaction_desc, "accounts": st.session_state.account_inputs.copy()}
-                if st.session_state.edit_index is not None:
-                    st.session_state.submitted_transactions[st.session_state.edit_index] = new_entry
-                    st.session_state.edit_index = None
+                new_entry = {
+                    "description": transaction_desc,
+                    "date": transaction_date.isoformat(),
+                    "accounts": [dict(acc) for acc in st.session_state.account_inputs]
+                }
+                if st.session_state.edit_id is not None:
+                    saved = ledger.replace(st.session_state.edit_id, new_entry)
+                    st.session_state.edit_id = None
                 else:
-                    st.session_state.submitted_transactions.append(new_entry)
-                st.session_state.account_inputs.clear()
-                st.session_state.clear_description = True
-                save_to_file()
-                st.success("✅ Transaction added successfully!")
-                st.rerun()
+                    ledger.add(new_entry)
+                    saved = True
+                if saved:
+                    st.session_state.account_inputs.clear()
+                    st.session_state.clear_description = True
+                    st.success("✅ Transaction added successfully!")
+                    st.rerun()
+                else:
+                    st.warning("This transaction was deleted in another session. Submit again to record it as a new transaction.")
             else:
                 st.warning("Please fill in all details and non-zero amounts.")
         
         st.markdown('</div>', unsafe_allow_html=True)
 
     # Add individual transaction delete buttons below the form
-    if st.session_state.submitted_transactions:
+    if ledger:
         st.markdown("---")
         st.subheader("All Transactions")
-        for idx, txn in enumerate(st.session_state.submitted_transactions):
-            with st.expander(f"📝 {txn['description']}"):
-                for acc in txn["accounts"]:
-                    st.write(f"• {acc['name']}: ₹{acc['amount']:,.2f} ({acc['type']})")
-                if st.button("Delete Transaction", key=f"delete_txn_{idx}"):
-                    del st.session_state.submitted_transactions[idx]
-                    save_to_file()
-                    st.success("Transaction deleted successfully!")
+
+        # Search box backed by the inverted index
+        search_col, type_col, min_col, max_col = st.columns([3, 2, 1, 1])
+        with search_col:
+            query = st.text_input("🔍 Search description or account", key="txn_search_query")
+        with type_col:
+            type_filter = st.multiselect("Account Type", ["Asset", "Liability", "Equity"], key="txn_search_types")
+        with min_col:
+            min_amount = st.number_input("Min Amount", min_value=0.0, value=0.0, format="%.2f", key="txn_search_min")
+        with max_col:
+            max_amount = st.number_input("Max Amount", min_value=0.0, value=0.0, format="%.2f", key="txn_search_max")
+
+        if query.strip() or type_filter or min_amount > 0 or max_amount > 0:
+            match_count, matches = get_search_index().search(
+                query,
+                account_types=type_filter,
+                min_amount=min_amount if min_amount > 0 else None,
+                max_amount=max_amount if max_amount > 0 else None,
+                limit=SEARCH_RESULT_LIMIT
+            )
+            st.caption(f"{match_count} matching transaction(s)")
+            for txn_id in matches:
+                show_transaction_actions(txn_id, ledger.get(txn_id), "search")
+        else:
+            for txn_id, txn in ledger.items():
+                show_transaction_actions(txn_id, txn, "all")
+
+    # Chart of accounts: fold a duplicate account into the one it should have been
+    accounts = sorted(ledger.accounts.active(), key=lambda record: record["name"].casefold())
+    if accounts:
+        with st.expander("🗂️ Chart of Accounts"):
+            st.dataframe(pd.DataFrame([{
+                "ID": record["id"],
+                "Account": record["name"],
+                "Type": record["type"],
+                "Sub-Classification": record["sub"],
+                "Line Item": record["line_item"],
+                "Aliases": ", ".join(repr(alias) for alias in record["aliases"])
+            } for record in accounts]), use_container_width=True, hide_index=True)
+
+            alias_col, target_col = st.columns(2)
+            with alias_col:
+                alias_id = account_picker("Merge Account", "merge_alias")
+            with target_col:
+                target_id = account_picker("Into Account", "merge_target")
+            if st.button("🔗 Merge Accounts", key="merge_accounts_btn"):
+                if alias_id is None or target_id is None or alias_id == target_id:
+                    st.warning("Pick two different accounts to merge.")
+                elif ledger.merge_accounts(alias_id, target_id):
+                    st.success(f"✅ {ledger.accounts.name(alias_id)} now posts to {ledger.accounts.name(target_id)}.")
                     st.rerun()
+                else:
+                    st.warning("The chart of accounts changed in another session. Please check and try again.")
 
-def show_accounting_equation():
-    st.markdown("## 📋 Accounting Equation Table")
-    
-    if not st.session_state.submitted_transactions:
-        st.info("No transactions recorded yet. Add transactions to see the accounting equation in action.")
-        return
+def describe_change(delta):
+    if delta["op"] == "clear":
+        return "reset of all transactions"
+    if delta["op"] == "merge":
+        record = ledger.accounts.accounts[delta["id"]]
+        return f"merge of '{record['name']}' into '{ledger.accounts.accounts[delta['into']]['name']}'"
+    txn = delta.get("before") or delta["txn"]
+    action = {"add": "add", "replace": "edit", "delete": "delete"}[delta["op"]]
+    return f"{action} of '{txn['description'].strip()}'"
 
+def show_transaction_actions(txn_id, txn, key_prefix):
+    with st.expander(f"📝 {txn['description']}"):
+        for acc in txn["accounts"]:
+            st.write(f"• {acc['name']}: {format_amount(acc['amount'], posting_currency(acc))} ({acc['type']})")
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("Edit Transaction", key=f"{key_prefix}_edit_txn_{txn_id}"):
+                st.session_state.pending_edit = txn_id
+                st.rerun()
+        with col2:
+            if st.button("Delete Transaction", key=f"{key_prefix}_delete_txn_{txn_id}"):
+                if ledger.delete(txn_id):
+                    st.success("Transaction deleted successfully!")
+                else:
+                    st.warning("Transaction was already deleted in another session.")
+                st.rerun()
+
+def equation_table():
     # Define the columns for the table
     account_columns = [
         "Cash", "Inventory", "Equipment", "Receivable", "Other Assets",
@@ -473,44 +650,42 @@ def show_accounting_equation():
     ]
     table_columns = ["No."] + account_columns + ["Description"]
 
-    # Prepare the data for the table
-    table_data = []
-    running_totals = {col: 0 for col in account_columns}
+    # Map each (classification, account) pair to its column once, then add every posting into its cell in one go;
+    # postings that belong to no column land in an extra one that is dropped
+    transactions, postings = transaction_postings(ledger, reporting_currency())
+    account_ids = postings["account_id"]
+    width = int(account_ids.max()) + 1 if len(account_ids) else 1
+    keys, key_codes = np.unique(postings["class_id"].astype(np.int64) * width + account_ids, return_inverse=True)
+    column_of = []
+    for key in keys.tolist():
+        class_id, account_id = divmod(key, width)
+        acc_type, sub, _ = classifications[class_id]
+        column = equation_column((account_id, acc_type, sub))
+        column_of.append(len(account_columns) if column is None else account_columns.index(column))
+    cells = np.bincount(
+        postings["txn"] * (len(account_columns) + 1) + np.array(column_of, dtype=np.int64)[key_codes],
+        weights=postings["amount"], minlength=len(transactions) * (len(account_columns) + 1)
+    ).reshape(-1, len(account_columns) + 1)[:, :-1]
+    running_totals = dict(zip(account_columns, cells.sum(axis=0).tolist()))
 
-    for idx, txn in enumerate(st.session_state.submitted_transactions):
-        row = {col: 0 for col in account_columns}
-        for acc in txn["accounts"]:
-            # Map account names/types to columns
-            if acc["name"].lower() == "cash":
-                row["Cash"] += acc["amount"]
-            elif acc["name"].lower() == "inventory":
-                row["Inventory"] += acc["amount"]
-            elif acc["name"].lower() == "equipment":
-                row["Equipment"] += acc["amount"]
-            elif acc["name"].lower() in ["receivable", "receivables"]:
-                row["Receivable"] += acc["amount"]
-            elif acc["type"] == "Asset" and acc["name"].lower() not in ["cash", "inventory", "equipment", "receivable", "receivables"]:
-                row["Other Assets"] += acc["amount"]
-            elif acc["type"] == "Liability":
-                row["Liabilities"] += acc["amount"]
-            elif acc["type"] == "Equity" and acc["sub"] == "Capital":
-                row["Capital"] += acc["amount"]
-            elif acc["type"] == "Equity" and acc["sub"] in ["Incomes", "Income"]:
-                row["Incomes"] += acc["amount"]
-            elif acc["type"] == "Equity" and acc["sub"] == "Expenses":
-                row["Expenses"] += acc["amount"]
-        # Update running totals
-        for col in account_columns:
-            running_totals[col] += row[col]
-        table_data.append([
-            idx + 1,
-            *(row[col] if row[col] != 0 else "" for col in account_columns),
-            txn["description"]
-        ])
+    table = pd.DataFrame(cells, columns=account_columns).astype(object).where(cells != 0, "")
+    table.insert(0, "No.", np.arange(1, len(transactions) + 1))
+    table["Description"] = [description for _, description in transactions]
 
     # Add running totals row (not shown)
     # totals_row = ["Total"] + [running_totals[col] for col in account_columns] + [""]
+
+    return table[table_columns], running_totals
+
+def show_accounting_equation():
+    st.markdown("## 📋 Accounting Equation Table")
     
+    if not ledger:
+        st.info("No transactions recorded yet. Add transactions to see the accounting equation in action.")
+        return
+
+    df, running_totals = render_cache.get("accounting_equation", ledger.version, equation_table, reporting_currency(), rates.version)
+
     # Calculate equation check
     assets_total = running_totals["Cash"] + running_totals["Inventory"] + running_totals["Equipment"] + running_totals["Receivable"] + running_totals["Other Assets"]
     liabilities_total = running_totals["Liabilities"]
@@ -518,7 +693,6 @@ def show_accounting_equation():
     equation_balanced = abs(assets_total - (liabilities_total + equity_total)) < 0.01
 
     # Display as a dataframe
-    df = pd.DataFrame(table_data, columns=table_columns)
     st.dataframe(df, use_container_width=True)
 
     # --- Add summary section for Assets, Liabilities, Equity (as before) ---
@@ -529,52 +703,156 @@ def show_accounting_equation():
         total_assets = 0
         for name in ["Cash", "Inventory", "Equipment", "Receivable", "Other Assets"]:
             amount = running_totals[name]
-            st.write(f"• {name}: ₹{amount:,.2f}")
+            st.write(f"• {name}: {format_currency(amount)}")
             total_assets += amount
-        st.markdown(f"**Total Assets: ₹{total_assets:,.2f}**")
+        st.markdown(f"**Total Assets: {format_currency(total_assets)}**")
     with col2:
         st.markdown('<div class="statement-header">LIABILITIES</div>', unsafe_allow_html=True)
         total_liabilities = running_totals["Liabilities"]
-        st.write(f"• Liabilities: ₹{total_liabilities:,.2f}")
-        st.markdown(f"**Total Liabilities: ₹{total_liabilities:,.2f}**")
+        st.write(f"• Liabilities: {format_currency(total_liabilities)}")
+        st.markdown(f"**Total Liabilities: {format_currency(total_liabilities)}**")
     with col3:
         st.markdown('<div class="statement-header">EQUITY</div>', unsafe_allow_html=True)
         total_equity = running_totals["Capital"] + running_totals["Incomes"] + running_totals["Expenses"]
-        st.write(f"• Capital: ₹{running_totals['Capital']:,.2f}")
-        st.write(f"• Incomes: ₹{running_totals['Incomes']:,.2f}")
-        st.write(f"• Expenses: ₹{running_totals['Expenses']:,.2f}")
-        st.markdown(f"**Total Equity: ₹{total_equity:,.2f}**")
+        st.write(f"• Capital: {format_currency(running_totals['Capital'])}")
+        st.write(f"• Incomes: {format_currency(running_totals['Incomes'])}")
+        st.write(f"• Expenses: {format_currency(running_totals['Expenses'])}")
+        st.markdown(f"**Total Equity: {format_currency(total_equity)}**")
     st.markdown('</div>', unsafe_allow_html=True)
 
     # Show balance check
     st.write(f"**Assets:** {assets_total:,.2f} | **Liabilities + Equity:** {liabilities_total + equity_total:,.2f}")
     if equation_balanced:
-        st.success(f"✅ Equation Balanced! Assets (₹{assets_total:,.2f}) = Liabilities (₹{liabilities_total:,.2f}) + Equity (₹{equity_total:,.2f})")
+        st.success(f"✅ Equation Balanced! Assets ({format_currency(assets_total)}) = Liabilities ({format_currency(liabilities_total)}) + Equity ({format_currency(equity_total)})")
     else:
-        st.error(f"❌ Equation Imbalanced! Assets (₹{assets_total:,.2f}) ≠ Liabilities (₹{liabilities_total:,.2f}) + Equity (₹{equity_total:,.2f})")
+        st.error(f"❌ Equation Imbalanced! Assets ({format_currency(assets_total)}) ≠ Liabilities ({format_currency(liabilities_total)}) + Equity ({format_currency(equity_total)})")
+
+    # Per-transaction check: the totals above can't say which entries are wrong
+    with st.expander("🔍 Ledger Integrity Check"):
+        if st.button("Run Integrity Check", key="run_integrity_check"):
+            report = check_ledger(ledger, rates=rates)
+            if not any(len(frame) for frame in report.values()):
+                st.success("✅ Every transaction balances and every account name is used consistently.")
+            for key, title in REPORT_TITLES.items():
+                frame = report[key]
+                if len(frame):
+                    st.markdown(f"**{title}: {len(frame)}**")
+                    st.dataframe(frame.astype(str), use_container_width=True)
+
+NAMED_ASSET_COLUMNS = {"cash": "Cash", "inventory": "Inventory", "equipment": "Equipment", "receivable": "Receivable", "receivables": "Receivable"}
+
+def equation_column(key):
+    account_id, acc_type, sub = key
+    if acc_type == "Asset":
+        return NAMED_ASSET_COLUMNS.get(account_key(ledger.accounts.name(account_id)), "Other Assets")
+    if acc_type == "Liability":
+        return "Liabilities"
+    if acc_type == "Equity":
+        return {"Capital": "Capital", "Incomes": "Incomes", "Income": "Incomes", "Expenses": "Expenses"}.get(sub)
+    return None
+
+def show_general_ledger():
+    st.markdown("## 📒 General Ledger")
+
+    if not ledger or not ledger.accounts.accounts:
+        st.info("No transactions recorded yet. Add transactions to see each account's ledger.")
+        return
+
+    account_col, page_col = st.columns([3, 1])
+    with account_col:
+        account_id = account_picker("Account", "gl_account")
+    if account_id is None:
+        return
+    pages = max(1, -(-account_posting_count(ledger, account_id) // GENERAL_LEDGER_PAGE_SIZE))
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=pages, value=1, step=1, key=f"gl_page_{account_id}")
+    # Only this account's postings are read, however large the ledger is
+    with ledger.reading():
+        rows, count, closing_balance = account_history(
+            ledger, account_id, (page - 1) * GENERAL_LEDGER_PAGE_SIZE, GENERAL_LEDGER_PAGE_SIZE,
+            factor=posting_factor(ledger, reporting_currency())
+        )
+
+    st.caption(f"{count} posting(s) · page {page} of {pages}")
+    if rows:
+        df = pd.DataFrame(rows)
+        st.dataframe(df.style.format({"Debit": format_currency, "Credit": format_currency, "Balance": format_currency}), use_container_width=True, hide_index=True)
+    st.markdown(f"**Closing Balance: {format_currency(closing_balance)}**")
+
+def show_receivables_payables():
+    st.markdown("## 📇 Receivables & Payables")
+
+    if not any(side.accounts for side in ledger.view("subledger").sides.values()):
+        st.info("No Trade Receivables or Trade Payables postings yet. Give them a counterparty and due date on the entry form to track them here.")
+        return
+
+    side_col, date_col = st.columns([2, 1])
+    with side_col:
+        side = st.radio("Sub-ledger", SIDES, horizontal=True, key="subledger_side")
+    with date_col:
+        as_of = st.date_input("Aging As Of", key="subledger_as_of")
+    st.caption("Payments are applied to each counterparty's open items oldest due date first. Amounts are in each item's own currency.")
+
+    amount_format = {name: "{:,.2f}" for name in [*AGING_BUCKETS, "Total Open", "Unapplied Credit", "Balance", "Open Amount"]}
+    summary = aging_summary(ledger, side, as_of)
+    st.markdown("#### Aging")
+    st.dataframe(summary.style.format(amount_format, subset=[*AGING_BUCKETS, "Total Open"]), use_container_width=True, hide_index=True)
+
+    balances = render_cache.get("counterparty_aging", ledger.version, lambda: counterparty_balances(ledger, side, as_of), side, as_of.toordinal())
+    st.markdown(f"#### Counterparties ({len(balances):,})")
+    query = st.text_input("🔍 Counterparty", key="subledger_counterparty", placeholder="All counterparties").strip()
+    if query:
+        balances = balances[balances["Counterparty"].str.contains(query, case=False, regex=False)]
+    st.dataframe(
+        balances.style.format(amount_format, subset=[*AGING_BUCKETS, "Unapplied Credit", "Balance"]),
+        use_container_width=True, hide_index=True
+    )
+
+    # One counterparty's items when the search names exactly one, otherwise the most overdue items overall
+    names = set(balances["Counterparty"])
+    counterparty = next(iter(names)) if len(names) == 1 else None
+    st.markdown(f"#### Open Items of {counterparty}" if counterparty else "#### Oldest Open Items")
+    rows = open_item_rows(ledger, side, as_of, counterparty=counterparty, limit=OPEN_ITEM_LIMIT)
+    if rows:
+        st.dataframe(pd.DataFrame(rows).style.format(amount_format, subset=["Open Amount"]), use_container_width=True, hide_index=True)
+    else:
+        st.success("✅ Nothing open.")
+
+def show_trial_balance():
+    st.markdown("## ⚖️ Trial Balance")
+
+    if not ledger:
+        st.info("No transactions recorded yet. Add transactions to see the trial balance.")
+        return
+
+    df = pd.DataFrame(trial_balance(get_report_totals(), ledger.accounts))
+    total_debit = df["Debit"].sum()
+    total_credit = df["Credit"].sum()
+    st.dataframe(df.style.format({"Debit": format_currency, "Credit": format_currency}), use_container_width=True, hide_index=True)
+
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown(f"**Total Debits: {format_currency(total_debit)}**")
+    with col2:
+        st.markdown(f"**Total Credits: {format_currency(total_credit)}**")
+    if abs(total_debit - total_credit) < 0.01:
+        st.success("✅ Trial balance agrees: total debits equal total credits.")
+    else:
+        st.error(f"❌ Trial balance is out by {format_currency(total_debit - total_credit)}. Run the Ledger Integrity Check on the Accounting Equation page to find the entries.")
 
 def show_financial_statements():
     st.markdown("## 📊 Financial Statements")
     
-    if not st.session_state.submitted_transactions:
+    if not ledger:
         st.warning("No transactions available. Please add transactions first.")
         return
 
     # Create tabs for different statements
-    bs_tab, is_tab, cf_tab = st.tabs(["Balance Sheet", "Income Statement", "Cash Flow Statement"])
+    bs_tab, is_tab, cf_tab, cmp_tab = st.tabs(["Balance Sheet", "Income Statement", "Cash Flow Statement", "Comparative Statements"])
     
-    # Helper function to format currency
-    def format_currency(amount):
-        return f"₹{amount:,.2f}"
     
-    # Calculate account totals
-    account_totals = {}
-    for txn in st.session_state.submitted_transactions:
-        for acc in txn["accounts"]:
-            key = (acc["type"], acc["sub"], acc["line_item"], acc["name"])
-            if key not in account_totals:
-                account_totals[key] = 0
-            account_totals[key] += acc["amount"]
+    # Calculate account totals, grouped on (classification id, account id) as commits arrive
+    account_totals = get_report_totals().statement_totals(ledger.accounts)
     
     # ---- Balance Sheet ----
     with bs_tab:
@@ -699,178 +977,167 @@ def show_financial_statements():
     # ---- Cash Flow Statement ----
     with cf_tab:
         st.markdown("### Cash Flow Statement")
-        st.markdown("*For the current period*")
-        
-        # Operating Activities
-        st.markdown("#### Operating Activities")
-        operating_cash_flow = 0
-        
-        # Net Income
-        st.write(f"Net Income: {format_currency(net_income)}")
-        operating_cash_flow += net_income
-        
-        # Adjustments for non-cash items
-        depreciation = 0
-        for key, amount in account_totals.items():
-            if key[0] == "Equity" and key[2] == "Depreciation & Amortization":
-                depreciation = abs(amount)
-        st.write(f"Depreciation and Amortization: {format_currency(depreciation)}")
-        operating_cash_flow += depreciation
-        
-        # Changes in working capital
-        working_capital_changes = 0
-        for key, amount in account_totals.items():
-            if key[0] == "Asset" and key[1] == "Current Assets" and key[2] != "Cash and Cash Equivalents":
-                working_capital_changes -= amount
-            elif key[0] == "Liability" and key[1] == "Current Liabilities":
-                working_capital_changes += amount
-        st.write(f"Changes in Working Capital: {format_currency(working_capital_changes)}")
-        operating_cash_flow += working_capital_changes
-        
-        st.markdown(f"**Net Cash from Operating Activities: {format_currency(operating_cash_flow)}**")
-        
-        # Investing Activities
-        st.markdown("#### Investing Activities")
-        investing_cash_flow = 0
-        for key, amount in account_totals.items():
-            if key[0] == "Asset" and key[1] == "Non-Current Assets":
-                investing_cash_flow -= amount
-                st.write(f"Purchase of {key[2]}: {format_currency(-amount)}")
-        st.markdown(f"**Net Cash from Investing Activities: {format_currency(investing_cash_flow)}**")
+        st.markdown("*For the current period (direct method)*")
         
-        # Financing Activities
-        st.markdown("#### Financing Activities")
-        financing_cash_flow = 0
-        for key, amount in account_totals.items():
-            if key[0] == "Liability" and key[1] == "Non-Current Liabilities":
-                financing_cash_flow += amount
-                st.write(f"Proceeds from {key[2]}: {format_currency(amount)}")
-            elif key[0] == "Equity" and key[1] == "Capital":
-                financing_cash_flow += amount
-                st.write(f"Capital Contribution: {format_currency(amount)}")
-        st.markdown(f"**Net Cash from Financing Activities: {format_currency(financing_cash_flow)}**")
+        # Cash movements are classified by their counter-postings when each transaction is committed
+        cash_flow_lines = report_cash_flow(ledger, reporting_currency())[0]
+        net_change_in_cash = 0
+        for activity in ACTIVITIES:
+            st.markdown(f"#### {activity} Activities")
+            activity_total = 0
+            for label, amount in cash_flow_lines[activity]:
+                st.write(f"{label}: {format_currency(amount)}")
+                activity_total += amount
+            st.markdown(f"**Net Cash from {activity} Activities: {format_currency(activity_total)}**")
+            net_change_in_cash += activity_total
         
         # Net Change in Cash
-        net_change_in_cash = operating_cash_flow + investing_cash_flow + financing_cash_flow
         st.markdown("#### Net Change in Cash")
         st.markdown(f"**Net Increase (Decrease) in Cash: {format_currency(net_change_in_cash)}**")
+        closing_cash = get_report_totals().total("Asset", line_item=CASH_LINE_ITEM)
+        st.write(f"Cash and Cash Equivalents at End of Period: {format_currency(closing_cash)}")
+        if abs(net_change_in_cash - closing_cash) >= 0.01:
+            st.warning("Net change in cash does not match the cash balance. Run the Ledger Integrity Check to find unbalanced entries.")
+
+    # ---- Comparative Statements ----
+    with cmp_tab:
+        show_comparative_statements()
+
+def show_comparative_statements():
+    st.markdown("### Comparative Statements")
+    st.markdown("*Undated transactions count in the current month*")
+
+    version = ledger.version
+    period_totals = get_period_totals()
+    current = current_month()
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        granularity = st.selectbox("Period", list(GRANULARITIES), key="comparative_granularity")
+    months = GRANULARITIES[granularity]
+    first, last = period_range(period_totals, months, current)
+    labels = {period_label(period, months): period for period in range(last, first - 1, -1)}
+    with col2:
+        # Keyed per granularity, so switching from months to years never leaves a month selected
+        end = labels[st.selectbox("Ending", list(labels), key=f"comparative_end_{granularity}")]
+    with col3:
+        count = st.number_input("Columns", min_value=1, max_value=24, value=3, key="comparative_columns")
+    with col4:
+        baseline = st.selectbox("Compare With", BASELINES, key="comparative_baseline")
+
+    # Each period column is cached on its own, so adding a column only computes the new period
+    def column(period):
+        return render_cache.get(
+            "period_column", version, lambda: period_column(period_totals, months, period, current),
+            reporting_currency(), rates.version, months, period, current
+        )
+
+    periods = comparative_periods(end, int(count))
+    columns = [column(period) for period in periods]
+    baseline_end = baseline_period(end, months, baseline)
+    for statement in STATEMENTS:
+        st.markdown(f"#### {statement}")
+        table = comparative_statement(
+            statement, columns, [period_label(period, months) for period in periods],
+            column(baseline_end), period_label(baseline_end, months)
+        )
+        money = {name: format_currency for name in table.columns[2:-1]}
+        st.dataframe(
+            table.style.format(money).format({"Change %": "{:,.1f}%"}, na_rep="—"),
+            use_container_width=True, hide_index=True
+        )
+
+# ---------- Ratio Definitions ----------
+# Formula and interpretation bands per ratio; the "poor" band doubles as the breach threshold for scenarios
+RATIO_CATEGORIES = {
+    "Liquidity Ratios": {
+        "Current Ratio": {
+            "formula": "Current Assets / Current Liabilities",
+            "interpretation": {
+                "poor": "< 1.0",
+                "good": "1.0 - 1.5",
+                "excellent": "> 1.5"
+            }
+        },
+        "Quick Ratio": {
+            "formula": "(Current Assets - Inventory) / Current Liabilities",
+            "interpretation": {
+                "poor": "< 1.0",
+                "good": "1.0 - 1.5",
+                "excellent": "> 1.5"
+            }
+        }
+    },
+    "Solvency Ratios": {
+        "Debt to Equity": {
+            "formula": "Total Liabilities / Total Equity",
+            "interpretation": {
+                "excellent": "< 1.0",
+                "good": "1.0 - 2.0",
+                "poor": "> 2.0"
+            }
+        },
+        "Debt to Assets": {
+            "formula": "Total Liabilities / Total Assets",
+            "interpretation": {
+                "excellent": "< 0.4",
+                "good": "0.4 - 0.6",
+                "poor": "> 0.6"
+            }
+        }
+    },
+    "Profitability Ratios": {
+        "Net Profit Margin": {
+            "formula": "(Net Income / Revenue) × 100",
+            "interpretation": {
+                "poor": "< 5%",
+                "good": "5% - 10%",
+                "excellent": "> 10%"
+            }
+        },
+        "Return on Assets": {
+            "formula": "(Net Income / Total Assets) × 100",
+            "interpretation": {
+                "poor": "< 5%",
+                "good": "5% - 10%",
+                "excellent": "> 10%"
+            }
+        },
+        "Return on Equity": {
+            "formula": "(Net Income / Total Equity) × 100",
+            "interpretation": {
+                "poor": "< 10%",
+                "good": "10% - 15%",
+                "excellent": "> 15%"
+            }
+        }
+    }
+}
+
+RATIO_DEFINITIONS = {name: definition for definitions in RATIO_CATEGORIES.values() for name, definition in definitions.items()}
 
 def show_ratio_analysis():
     st.markdown("## 📈 Ratio Analysis")
     
-    if not st.session_state.submitted_transactions:
+    if not ledger:
         st.warning("No transactions available for ratio analysis.")
         return
     
-    # Calculate totals from transactions
-    total_assets = 0
-    total_liabilities = 0
-    total_equity = 0
-    current_assets = 0
-    current_liabilities = 0
-    inventory = 0
-    net_income = 0
-    revenue = 0
-    total_expenses = 0
-    
-    for txn in st.session_state.submitted_transactions:
-        for acc in txn["accounts"]:
-            amount = acc["amount"]
-            
-            if acc["type"] == "Asset":
-                total_assets += amount
-                if acc["sub"] == "Current Assets":
-                    current_assets += amount
-                    if acc["line_item"] == "Inventory":
-                        inventory += amount
-            
-            elif acc["type"] == "Liability":
-                total_liabilities += amount
-                if acc["sub"] == "Current Liabilities":
-                    current_liabilities += amount
-            
-            elif acc["type"] == "Equity":
-                if acc["sub"] == "Incomes":
-                    revenue += amount
-                elif acc["sub"] == "Expenses":
-                    total_expenses += abs(amount)
-                else:
-                    total_equity += amount
-    
-    net_income = revenue - total_expenses
+    # Totals are maintained incrementally on every commit
+    summary = get_report_totals().summary()
+    values = ratio_values(summary)
     
     # Create ratio categories
     ratios = {
-        "Liquidity Ratios": {
-            "Current Ratio": {
-                "value": current_assets / current_liabilities if current_liabilities else float('inf'),
-                "formula": "Current Assets / Current Liabilities",
-                "interpretation": {
-                    "poor": "< 1.0",
-                    "good": "1.0 - 1.5",
-                    "excellent": "> 1.5"
-                }
-            },
-            "Quick Ratio": {
-                "value": (current_assets - inventory) / current_liabilities if current_liabilities else float('inf'),
-                "formula": "(Current Assets - Inventory) / Current Liabilities",
-                "interpretation": {
-                    "poor": "< 1.0",
-                    "good": "1.0 - 1.5",
-                    "excellent": "> 1.5"
-                }
-            }
-        },
-        "Solvency Ratios": {
-            "Debt to Equity": {
-                "value": total_liabilities / total_equity if total_equity else float('inf'),
-                "formula": "Total Liabilities / Total Equity",
-                "interpretation": {
-                    "excellent": "< 1.0",
-                    "good": "1.0 - 2.0",
-                    "poor": "> 2.0"
-                }
-            },
-            "Debt to Assets": {
-                "value": total_liabilities / total_assets if total_assets else 0,
-                "formula": "Total Liabilities / Total Assets",
-                "interpretation": {
-                    "excellent": "< 0.4",
-                    "good": "0.4 - 0.6",
-                    "poor": "> 0.6"
-                }
-            }
-        },
-        "Profitability Ratios": {
-            "Net Profit Margin": {
-                "value": (net_income / revenue * 100) if revenue else 0,
-                "formula": "(Net Income / Revenue) × 100",
-                "interpretation": {
-                    "poor": "< 5%",
-                    "good": "5% - 10%",
-                    "excellent": "> 10%"
-                }
-            },
-            "Return on Assets": {
-                "value": (net_income / total_assets * 100) if total_assets else 0,
-                "formula": "(Net Income / Total Assets) × 100",
-                "interpretation": {
-                    "poor": "< 5%",
-                    "good": "5% - 10%",
-                    "excellent": "> 10%"
-                }
-            },
-            "Return on Equity": {
-                "value": (net_income / total_equity * 100) if total_equity else 0,
-                "formula": "(Net Income / Total Equity) × 100",
-                "interpretation": {
-                    "poor": "< 10%",
-                    "good": "10% - 15%",
-                    "excellent": "> 15%"
-                }
-            }
-        }
+        category: {name: dict(definition, value=values[name]) for name, definition in definitions.items()}
+        for category, definitions in RATIO_CATEGORIES.items()
     }
+
+    granularity = st.radio("Trend", ["Month", "Quarter"], horizontal=True, key="ratio_trend_granularity")
+    current = current_month()
+    sparklines = dict(zip(RATIO_DEFINITIONS, render_cache.get(
+        "ratio_sparklines", ledger.version, lambda: ratio_sparklines(GRANULARITIES[granularity], current),
+        reporting_currency(), rates.version, granularity, current
+    )))
     
     # Display ratios in an organized manner
     for category, category_ratios in ratios.items():
@@ -895,117 +1162,205 @@ def show_ratio_analysis():
                     <p><em>Formula:</em> {ratio_data['formula']}</p>
                 </div>
                 """, unsafe_allow_html=True)
+                st.plotly_chart(sparklines[ratio_name], use_container_width=True, config={"displayModeBar": False})
                 
                 st.markdown("**Interpretation:**")
                 for level, threshold in ratio_data["interpretation"].items():
                     st.markdown(f"- {level.title()}: {threshold}")
 
-def show_learning_hub():
-    st.markdown("## 🎓 Learning Hub")
+    show_ratio_scenarios(summary, values)
+
+def ratio_sparklines(months, current):
+    # One small figure per ratio, every period inception to date; undefined (∞) points are left as gaps
+    labels, series = ratio_series(get_period_totals(), months, current)
+    figures = []
+    for name in RATIO_DEFINITIONS:
+        values = series[name]
+        fig = go.Figure(go.Scatter(
+            x=labels,
+            y=np.where(np.isinf(values), np.nan, values),
+            mode='lines+markers' if len(labels) == 1 else 'lines',
+            line=dict(color='#2a5298', width=2),
+            hovertext=[format_ratio(name, value) for value in values.tolist()],
+            hoverinfo='x+text'
+        ))
+        fig.update_layout(
+            height=80,
+            showlegend=False,
+            xaxis=dict(visible=False),
+            yaxis=dict(visible=False),
+            margin=dict(t=0, b=0, l=0, r=0)
+        )
+        figures.append(fig)
+    return figures
+
+def show_ratio_scenarios(summary, values):
+    st.markdown("### 🎲 What-If Scenarios")
+    st.caption("Each shock is drawn from a normal distribution around its mean (a standard deviation of 0 fixes it) "
+               "and settled in cash, so every simulated balance sheet still balances.")
+    with st.form("scenario_form"):
+        cols = st.columns(len(SHOCKS))
+        for col, (key, label) in zip(cols, SHOCKS.items()):
+            with col:
+                st.number_input(label, value=0.0, format="%.2f", key=f"shock_{key}_mean")
+                st.number_input("Std. Deviation", min_value=0.0, value=0.0, format="%.2f", key=f"shock_{key}_sd")
+        st.number_input("Scenarios", min_value=1000, max_value=200_000, value=SCENARIO_RUNS, step=1000, key="scenario_runs")
+        st.form_submit_button("🎲 Run Scenarios")
+
+    shocks = tuple(
+        (key, st.session_state[f"shock_{key}_mean"], st.session_state[f"shock_{key}_sd"]) for key in SHOCKS
+    )
+    if not any(mean or deviation for _, mean, deviation in shocks):
+        st.info("Set at least one shock and run the scenarios to see how the ratios could move.")
+        return
+    runs = st.session_state.scenario_runs
+
+    # One NumPy batch for all scenarios; reused until the ledger, rates or shocks change
+    thresholds = {name: parse_threshold(definition["interpretation"]["poor"]) for name, definition in RATIO_DEFINITIONS.items()}
+    results, fig = render_cache.get(
+        "ratio_scenarios", ledger.version,
+        lambda: scenario_figure(summarise(simulate(summary, {key: (mean, deviation) for key, mean, deviation in shocks}, runs, SCENARIO_SEED), thresholds)),
+        reporting_currency(), rates.version, shocks, runs
+    )
+
+    st.dataframe(pd.DataFrame([{
+        "Ratio": name,
+        "Now": format_ratio(name, values[name]),
+        "5th Percentile": format_ratio(name, result["percentiles"][5]),
+        "Median": format_ratio(name, result["percentiles"][50]),
+        "95th Percentile": format_ratio(name, result["percentiles"][95]),
+        "Poor Band": RATIO_DEFINITIONS[name]["interpretation"]["poor"],
+        "Breach Probability": f"{result['breach']:.1%}" if result["breach"] is not None else "N/A"
+    } for name, result in results.items()]), use_container_width=True, hide_index=True)
+    st.plotly_chart(fig, use_container_width=True)
+
+def scenario_figure(results):
+    # Pre-binned histograms, so the figure carries 40 bars per ratio rather than every scenario
+    names = list(results)
+    fig = make_subplots(rows=(len(names) + 2) // 3, cols=3, subplot_titles=names)
+    for pos, name in enumerate(names):
+        counts, edges = results[name]["histogram"]
+        row, col = pos // 3 + 1, pos % 3 + 1
+        if counts:
+            centers = [(left + right) / 2 for left, right in zip(edges, edges[1:])]
+            fig.add_trace(go.Bar(x=centers, y=counts, marker_color='#2a5298', showlegend=False), row=row, col=col)
+        if results[name]["threshold"]:
+            fig.add_vline(x=results[name]["threshold"][1], line_dash="dash", line_color='#dc3545', row=row, col=col)
+    fig.update_layout(height=300 * ((len(names) + 2) // 3), bargap=0, margin=dict(t=40, b=0, l=0, r=0))
+    return results, fig
+
+# ---------- Learning Hub Content ----------
+LEARNING_HUB_CONTENT = {
+    "📚 Core Concepts": """
+    ### The Accounting Equation
     
-    tab1, tab2, tab3 = st.tabs(["📚 Core Concepts", "🔄 Transaction Analysis", "📊 Statement Preparation"])
+    The fundamental accounting equation is:
+    ```
+    Assets = Liabilities + Equity
+    ```
     
-    with tab1:
-        st.markdown("""
-        ### The Accounting Equation
-        
-        The fundamental accounting equation is:
-        ```
-        Assets = Liabilities + Equity
-        ```
-        
-        - **Assets**: Resources owned by the business
-        - **Liabilities**: Debts and obligations
-        - **Equity**: Owner's claim on assets
-        
-        ### Double-Entry System
-        
-        Every transaction affects at least two accounts:
-        - One account is debited
-        - Another account is credited
-        
-        ### Types of Accounts
-        
-        1. **Asset Accounts**
-           - Cash
-           - Accounts Receivable
-           - Inventory
-           - Equipment
-        
-        2. **Liability Accounts**
-           - Accounts Payable
-           - Loans Payable
-           - Notes Payable
-        
-        3. **Equity Accounts**
-           - Owner's Capital
-           - Retained Earnings
-           - Revenue
-           - Expenses
-        """)
+    - **Assets**: Resources owned by the business
+    - **Liabilities**: Debts and obligations
+    - **Equity**: Owner's claim on assets
     
-    with tab2:
-        st.markdown("""
-        ### Transaction Analysis Framework
-        
-        1. **Identify the Transaction**
-           - What business event occurred?
-           - What accounts are affected?
-        
-        2. **Analyze Account Changes**
-           - Which accounts increase?
-           - Which accounts decrease?
-        
-        3. **Record the Transaction**
-           - Enter the date
-           - Enter the description
-           - Record the amounts
-        
-        ### Example Transactions
-        
-        1. **Owner Invests Cash**
-           - Cash (Asset) increases
-           - Owner's Capital (Equity) increases
-        
-        2. **Purchase Equipment on Credit**
-           - Equipment (Asset) increases
-           - Accounts Payable (Liability) increases
-        
-        3. **Pay Monthly Rent**
-           - Cash (Asset) decreases
-           - Rent Expense (Equity) increases
-        """)
+    ### Double-Entry System
     
-    with tab3:
-        st.markdown("""
-        ### Financial Statement Preparation
-        
-        1. **Balance Sheet**
-           - Lists all assets, liabilities, and equity
-           - Must balance: Assets = Liabilities + Equity
-           - Shows financial position at a point in time
-        
-        2. **Income Statement**
-           - Shows revenues and expenses
-           - Calculates net income or loss
-           - Covers a period of time
-        
-        ### Tips for Statement Preparation
-        
-        1. **Organize Accounts**
-           - Group similar accounts together
-           - Use proper classifications
-        
-        2. **Check for Accuracy**
-           - Verify all transactions are included
-           - Ensure the accounting equation balances
-           - Cross-reference between statements
-        
-        3. **Present Clearly**
-           - Use consistent formatting
-           - Include proper headings
-           - Show subtotals and totals
-        """)
+    Every transaction affects at least two accounts:
+    - One account is debited
+    - Another account is credited
+    
+    ### Types of Accounts
+    
+    1. **Asset Accounts**
+       - Cash
+       - Accounts Receivable
+       - Inventory
+       - Equipment
+    
+    2. **Liability Accounts**
+       - Accounts Payable
+       - Loans Payable
+       - Notes Payable
+    
+    3. **Equity Accounts**
+       - Owner's Capital
+       - Retained Earnings
+       - Revenue
+       - Expenses
+    """,
+    "🔄 Transaction Analysis": """
+    ### Transaction Analysis Framework
+    
+    1. **Identify the Transaction**
+       - What business event occurred?
+       - What accounts are affected?
+    
+    2. **Analyze Account Changes**
+       - Which accounts increase?
+       - Which accounts decrease?
+    
+    3. **Record the Transaction**
+       - Enter the date
+       - Enter the description
+       - Record the amounts
+    
+    ### Example Transactions
+    
+    1. **Owner Invests Cash**
+       - Cash (Asset) increases
+       - Owner's Capital (Equity) increases
+    
+    2. **Purchase Equipment on Credit**
+       - Equipment (Asset) increases
+       - Accounts Payable (Liability) increases
+    
+    3. **Pay Monthly Rent**
+       - Cash (Asset) decreases
+       - Rent Expense (Equity) increases
+    """,
+    "📊 Statement Preparation": """
+    ### Financial Statement Preparation
+    
+    1. **Balance Sheet**
+       - Lists all assets, liabilities, and equity
+       - Must balance: Assets = Liabilities + Equity
+       - Shows financial position at a point in time
+    
+    2. **Income Statement**
+       - Shows revenues and expenses
+       - Calculates net income or loss
+       - Covers a period of time
+    
+    ### Tips for Statement Preparation
+    
+    1. **Organize Accounts**
+       - Group similar accounts together
+       - Use proper classifications
+    
+    2. **Check for Accuracy**
+       - Verify all transactions are included
+       - Ensure the accounting equation balances
+       - Cross-reference between statements
+    
+    3. **Present Clearly**
+       - Use consistent formatting
+       - Include proper headings
+       - Show subtotals and totals
+    """
+}
+
+def show_learning_hub():
+    st.markdown("## 🎓 Learning Hub")
+    
+    tabs = st.tabs(list(LEARNING_HUB_CONTENT.keys()))
+    for tab, content in zip(tabs, LEARNING_HUB_CONTENT.values()):
+        with tab:
+            st.markdown(content)
+
+@st.cache_resource
+def get_assistant():
+    # Built once per process; the Learning Hub and glossary never change at runtime
+    return AccountingAssistant(build_documents(LEARNING_HUB_CONTENT, sub_classification_options, line_item_options))
 
 def show_ai_assistant():
     st.markdown("## 🤖 AI Assistant")
@@ -1021,55 +1376,70 @@ def show_ai_assistant():
     
     if st.button("Send"):
         if user_input:
-            # Add basic responses for common questions
-            response = "I understand you're asking about accounting concepts. Could you be more specific about what you'd like to learn?"
-            
-            if "accounting equation" in user_input.lower():
-                response = "The accounting equation (Assets = Liabilities + Equity) is the foundation of double-entry accounting. It shows that a company's assets are financed by either debt (liabilities) or owner's investment (equity)."
-            elif "balance sheet" in user_input.lower():
-                response = "A balance sheet shows a company's financial position at a specific point in time. It lists all assets, liabilities, and equity, following the accounting equation: Assets = Liabilities + Equity."
-            elif "income statement" in user_input.lower():
-                response = "An income statement shows a company's financial performance over a period. It lists revenues (income) and expenses, with the difference being net income or loss."
-            
+            response = get_assistant().answer(user_input, get_report_totals(), ledger.accounts, reporting_currency())
             st.session_state.chat_history.append((user_input, response))
+            # Keep session memory bounded
+            del st.session_state.chat_history[:-CHAT_HISTORY_LIMIT]
             st.rerun()
 
 def show_export_section():
     st.markdown("## 📤 Export Data")
     
-    if not st.session_state.submitted_transactions:
+    if not ledger:
         st.warning("No data available for export.")
         return
-    
-    # Prepare transaction data for export
-    data = []
-    for txn in st.session_state.submitted_transactions:
-        for acc in txn["accounts"]:
-            data.append({
-                "Description": txn["description"],
-                "Account Type": acc["type"],
-                "Account Name": acc["name"],
-                "Amount": acc["amount"]
-            })
-    
-    df = pd.DataFrame(data)
-    
-    # Excel export
-    excel_buffer = BytesIO()
-    with pd.ExcelWriter(excel_buffer, engine="xlsxwriter") as writer:
-        df.to_excel(writer, sheet_name="Transactions", index=False)
-    
+
+    with st.form("export_form"):
+        col1, col2 = st.columns(2)
+        with col1:
+            file_format = st.selectbox("Format", ["CSV", "JSONL", "Excel"], key="export_format")
+        with col2:
+            compress = st.checkbox("Compress (gzip)", key="export_gzip", help="CSV and JSONL only")
+        columns = st.multiselect("Columns", list(EXPORT_COLUMNS), default=list(DEFAULT_COLUMNS), key="export_columns")
+        account_types = st.multiselect("Account Types", list(sub_classification_options), key="export_account_types",
+                                       help="Leave empty to export every type")
+        col3, col4 = st.columns(2)
+        with col3:
+            start = st.date_input("From", value=None, key="export_from")
+        with col4:
+            end = st.date_input("To", value=None, key="export_to")
+        submitted = st.form_submit_button("📦 Prepare Export")
+    st.caption("A date range leaves out undated transactions. Excel files are built in memory; "
+               "use CSV or JSONL for large ledgers, or exporter.py from the command line.")
+
+    if not submitted:
+        return
+    if not columns:
+        st.error("Select at least one column.")
+        return
+
+    # Rows stream from the ledger a chunk at a time, so only the finished file is held
+    filters = {
+        "account_types": account_types,
+        "start": start.isoformat() if start else None,
+        "end": end.isoformat() if end else None
+    }
+    buffer = BytesIO()
+    stamp = datetime.now().strftime('%Y%m%d')
+    if file_format == "Excel":
+        df = pd.DataFrame.from_records(posting_rows(ledger, columns, **filters), columns=columns)
+        with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+            df.to_excel(writer, sheet_name="Transactions", index=False)
+        count, file_name, mime = len(df), f"accounting_report_{stamp}.xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+    else:
+        extension = file_format.lower()
+        count = export_postings(ledger, buffer, extension, columns, compress, **filters)
+        file_name = f"accounting_report_{stamp}.{extension}" + (".gz" if compress else "")
+        mime = "application/gzip" if compress else ("text/csv" if extension == "csv" else "application/x-ndjson")
+
     st.download_button(
-        label="📥 Download Excel Report",
-        data=excel_buffer.getvalue(),
-        file_name=f"accounting_report_{datetime.now().strftime('%Y%m%d')}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+        label=f"📥 Download {file_format} ({count:,} rows, {buffer.getbuffer().nbytes / 1024:,.0f} KB)",
+        data=buffer.getvalue(),
+        file_name=file_name,
+        mime=mime
     )
 
 def main():
-    # Load saved transactions
-    load_from_file()
-    
     # Header
     st.markdown("""
     <div class="main-header">
@@ -1085,9 +1455,36 @@ def main():
         selected_tab = st.selectbox(
             "Choose Section:",
             ["🏠 Dashboard", "➕ Transaction Entry", "📋 Accounting Equation", 
-             "📊 Financial Statements", "📈 Ratio Analysis", "🎓 Learning Hub", 
+             "📒 General Ledger", "📇 Receivables & Payables", "⚖️ Trial Balance", "📊 Financial Statements", "📈 Ratio Analysis", "🎓 Learning Hub", 
              "🤖 AI Assistant", "📤 Export Data"]
         )
+        st.text_input("Your Name", key="audit_actor", help="Recorded in the audit trail with every change you commit")
+
+        # Statements, ratios and the dashboard are converted into this currency at each transaction's date
+        currencies = rates.refresh().currencies()
+        st.selectbox(
+            "Reporting Currency",
+            currencies,
+            index=currencies.index(reporting_currency()) if reporting_currency() in currencies else currencies.index(BASE_CURRENCY),
+            key="reporting_currency"
+        )
+        missing = report_totals(ledger, reporting_currency())[1]
+        if missing:
+            st.warning(f"No exchange rate for {', '.join(missing)}; those postings are left out of reports.")
+
+        with st.expander("💱 Exchange Rates"):
+            st.caption(f"{BASE_CURRENCY} per unit of each currency. A transaction uses the latest rate on or before its date.")
+            rate_date = st.date_input("Rate Date", key="rate_date")
+            rate_currency = st.text_input("Currency Code", key="rate_currency", placeholder="USD").strip().upper()
+            rate_value = st.number_input(f"Rate ({BASE_CURRENCY})", min_value=0.0, format="%.6f", key="rate_value")
+            if st.button("Add Rate", key="add_rate_btn"):
+                try:
+                    rates.add(rate_date.isoformat(), rate_currency, rate_value)
+                    st.success(f"✅ 1 {rate_currency} = {format_amount(rate_value)} from {rate_date.isoformat()}")
+                except ValueError as error:
+                    st.warning(str(error))
+            if rates.quotes:
+                st.dataframe(pd.DataFrame(rates.rows()), use_container_width=True, hide_index=True)
     
     # Main Content Based on Selection
     if selected_tab == "🏠 Dashboard":
@@ -1096,6 +1493,12 @@ def main():
         show_transaction_entry()
     elif selected_tab == "📋 Accounting Equation":
         show_accounting_equation()
+    elif selected_tab == "📒 General Ledger":
+        show_general_ledger()
+    elif selected_tab == "📇 Receivables & Payables":
+        show_receivables_payables()
+    elif selected_tab == "⚖️ Trial Balance":
+        show_trial_balance()
     elif selected_tab == "📊 Financial Statements":
         show_financial_statements()
     elif selected_tab == "📈 Ratio Analysis":
@@ -1107,5 +1510,13 @@ def main():
     elif selected_tab == "📤 Export Data":
         show_export_section()
 
+    # After the page, so this rerun's lookups are counted
+    with st.sidebar:
+        stats = render_cache.stats()
+        st.caption(
+            f"Render cache: {stats['hits']} hits · {stats['misses']} misses · "
+            f"{stats['entries']} entries · {stats['bytes'] / 1024:,.0f} of {stats['budget'] / 1024:,.0f} KB"
+        )
+
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -0,0 +1,185 @@
+# --- Comparative Statements: balance sheet and income statement over several periods ---
+# Postings are grouped once into (month, classification) cells, kept up to date on every commit. A period
+# column is read off those cells (its flows for the income statement, everything up to its end for the
+# balance sheet), so adding a column costs one pass over the cells, not over the postings.
+# Undated transactions are treated as booked in the current month, as the conversion treats them as current.
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from accounts import BASE_CURRENCY, classifications, sub_classification_options
+from cash_flow import CASH_LINE_ITEM
+from fx import needs_conversion
+from ledger import UNDATED_MONTH, date_month, ratio_arrays
+
+GRANULARITIES = {"Month": 1, "Quarter": 3, "Year": 12}
+BASELINES = ("Previous period", "Same period last year")
+STATEMENTS = ("Balance Sheet", "Income Statement")
+
+
+def report_period_totals(ledger, reporting=BASE_CURRENCY):
+    # (PeriodTotals, currencies without a rate), like fx.report_totals. The running view is copied, so
+    # the result can be read after the lock is released; the converted one is rebuilt, never changed.
+    with ledger.reading():
+        if not needs_conversion(ledger, reporting):
+            return ledger.view("period_totals").copy(), []
+        return ledger.view("fx_postings").month_totals(reporting)
+
+
+def current_month():
+    return date_month(date.today().isoformat())
+
+
+def period_of(month, months, current):
+    return (current if month == UNDATED_MONTH else month) // months
+
+
+def period_range(totals, months, current):
+    # First and last period with any posting, or the current period for an empty ledger
+    periods = [period_of(month, months, current) for month, _ in totals.cells] or [current // months]
+    return min(periods), max(periods)
+
+
+def period_label(period, months):
+    if months == 12:
+        return str(period)
+    year, month = divmod(period * months, 12)
+    return f"{year}-{month + 1:02d}" if months == 1 else f"{year} Q{month // 3 + 1}"
+
+
+def baseline_period(period, months, baseline):
+    return period - (12 // months if baseline == "Same period last year" else 1)
+
+
+def period_column(totals, months, period, current):
+    # (flows during the period, balances at its end) per classification id
+    flows, closing = np.zeros(len(classifications)), np.zeros(len(classifications))
+    for (month, class_id), amount in totals.cells.items():
+        cell_period = period_of(month, months, current)
+        if cell_period <= period:
+            closing[class_id] += amount
+            if cell_period == period:
+                flows[class_id] += amount
+    return flows, closing
+
+
+def _section(matrix, acc_type, sub, absolute=False):
+    # Line item rows of one sub-classification, skipping lines that are zero in every column
+    class_ids = [class_id for class_id, (t, s, _) in enumerate(classifications) if t == acc_type and s == sub]
+    values = np.abs(matrix[class_ids]) if absolute else matrix[class_ids]
+    lines = [
+        (sub, classifications[class_id][2], row)
+        for class_id, row in zip(class_ids, values)
+        if (np.abs(row) >= 0.005).any()
+    ]
+    return lines, values.sum(axis=0)
+
+
+def _balance_sheet_rows(closing):
+    rows = []
+    totals = {}
+    for acc_type, heading in (("Asset", "Assets"), ("Liability", "Liabilities")):
+        type_total = 0
+        for sub in sub_classification_options[acc_type]:
+            lines, total = _section(closing, acc_type, sub)
+            rows += lines + [(sub, f"Total {sub}", total)]
+            type_total = type_total + total
+        rows.append((heading, f"Total {heading}", type_total))
+        totals[acc_type] = type_total
+    # Same equity as the single-period Balance Sheet: capital plus incomes less absolute expenses
+    capital = _section(closing, "Equity", "Capital")[1]
+    retained_earnings = _section(closing, "Equity", "Incomes")[1] - _section(closing, "Equity", "Expenses", absolute=True)[1]
+    rows += [
+        ("Equity", "Capital", capital),
+        ("Equity", "Retained Earnings", retained_earnings),
+        ("Equity", "Total Equity", capital + retained_earnings),
+        ("Liabilities and Equity", "Total Liabilities and Equity", totals["Liability"] + capital + retained_earnings)
+    ]
+    return rows
+
+
+def _income_statement_rows(flows):
+    revenue_lines, revenue = _section(flows, "Equity", "Incomes")
+    expense_lines, expenses = _section(flows, "Equity", "Expenses", absolute=True)
+    return (
+        revenue_lines + [("Incomes", "Total Revenue", revenue)]
+        + expense_lines + [("Expenses", "Total Expenses", expenses)]
+        + [("Net Income", "Net Income", revenue - expenses)]
+    )
+
+
+def comparative_statement(statement, columns, labels, baseline_column, baseline_label):
+    # One row per line item and subtotal, one column per period, then the last period against the baseline
+    columns = list(columns) + [baseline_column]
+    width = max(len(flows) for flows, _ in columns)
+    picked = [flows if statement == "Income Statement" else closing for flows, closing in columns]
+    matrix = np.column_stack([np.pad(values, (0, width - len(values))) for values in picked])
+    rows = _income_statement_rows(matrix) if statement == "Income Statement" else _balance_sheet_rows(matrix)
+
+    values = np.array([row for _, _, row in rows]).reshape(len(rows), len(columns))
+    latest, baseline = values[:, -2], values[:, -1]
+    change = latest - baseline
+    with np.errstate(divide="ignore", invalid="ignore"):
+        change_pct = np.where(np.abs(baseline) >= 0.005, change / np.abs(baseline) * 100, np.nan)
+    table = pd.DataFrame(values[:, :-1], columns=labels)
+    table.insert(0, "Line Item", [label for _, label, _ in rows])
+    table.insert(0, "Section", [section for section, _, _ in rows])
+    table[f"Change vs {baseline_label}"] = change
+    table["Change %"] = change_pct
+    return table
+
+
+def comparative_periods(last, count):
+    return list(range(last - count + 1, last + 1))
+
+
+def period_summaries(totals, months, first, last, current):
+    # LedgerTotals.summary() at the end of every period first..last, as arrays: each cell is added to its
+    # period, the periods are summed cumulatively, and the inputs are masked sums over classifications
+    count = last - first + 1
+    if totals.cells:
+        keys = np.array(list(totals.cells), dtype=np.int64).reshape(-1, 2)
+        amounts = np.fromiter(totals.cells.values(), dtype=np.float64, count=len(totals.cells))
+    else:
+        keys, amounts = np.zeros((0, 2), dtype=np.int64), np.zeros(0)
+    periods = np.where(keys[:, 0] == UNDATED_MONTH, current, keys[:, 0]) // months - first
+    shown = periods < count
+    balances = np.zeros((count, len(classifications)))
+    np.add.at(balances, (np.maximum(periods[shown], 0), keys[shown, 1]), amounts[shown])
+    balances = np.cumsum(balances, axis=0)
+
+    expense_months = np.array(list(totals.expenses_abs), dtype=np.int64)
+    expense_periods = np.where(expense_months == UNDATED_MONTH, current, expense_months) // months - first
+    expenses = np.zeros(count)
+    shown = expense_periods < count
+    np.add.at(expenses, np.maximum(expense_periods[shown], 0), np.fromiter(totals.expenses_abs.values(), dtype=np.float64)[shown])
+    expenses = np.cumsum(expenses)
+
+    def total(acc_type=None, sub=None, line_item=None):
+        mask = np.array([
+            (acc_type is None or t == acc_type) and (sub is None or s == sub) and (line_item is None or l == line_item)
+            for t, s, l in classifications
+        ])
+        return balances @ mask
+
+    revenue = total("Equity", "Incomes")
+    return {
+        "total_assets": total("Asset"),
+        "total_liabilities": total("Liability"),
+        "total_equity": total("Equity") - revenue - total("Equity", "Expenses"),
+        "current_assets": total("Asset", "Current Assets"),
+        "current_liabilities": total("Liability", "Current Liabilities"),
+        "inventory": total("Asset", "Current Assets", "Inventory"),
+        "cash": total("Asset", line_item=CASH_LINE_ITEM),
+        "revenue": revenue,
+        "total_expenses": expenses,
+        "net_income": revenue - expenses
+    }
+
+
+def ratio_series(totals, months, current):
+    # (period labels, ratio name -> array), inception to date at each period end, with ratio_values' zero rules
+    first, last = period_range(totals, months, current)
+    labels = [period_label(period, months) for period in range(first, last + 1)]
+    return labels, ratio_arrays(period_summaries(totals, months, first, last, current))
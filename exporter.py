@@ -0,0 +1,116 @@
+# --- Streaming Posting Export ---
+# Usage: python exporter.py [student_transactions.json] [-o postings.csv.gz] [--format csv|jsonl] [--columns Date Amount ...] [--type Asset ...] [--from 2026-01-01] [--to 2026-12-31]
+#
+# Rows are generated from the ledger a chunk of transactions at a time and written straight to the
+# output (gzip-compressed when asked), so the export itself holds one chunk in memory however big the
+# ledger is. Writes to stdout when no output file is given; a .gz file name turns compression on.
+import argparse
+import csv
+import gzip
+import io
+import json
+import sys
+from datetime import date
+
+from accounts import posting_currency, sub_classification_options
+from ledger import LedgerStore
+
+EXPORT_CHUNK_TRANSACTIONS = 2000
+EXPORT_GZIP_LEVEL = 6                # zlib's default; 9 is about twice as slow for a few percent smaller files
+EXPORT_FORMATS = ("csv", "jsonl")
+EXPORT_COLUMNS = {
+    "Transaction ID": lambda txn, acc: txn["id"],
+    "Date": lambda txn, acc: txn.get("date", ""),
+    "Description": lambda txn, acc: txn["description"],
+    "Account Type": lambda txn, acc: acc["type"],
+    "Sub Classification": lambda txn, acc: acc["sub"],
+    "Line Item": lambda txn, acc: acc["line_item"],
+    "Account Name": lambda txn, acc: acc["name"],
+    "Amount": lambda txn, acc: acc["amount"],
+    "Currency": lambda txn, acc: posting_currency(acc),
+    "Counterparty": lambda txn, acc: acc.get("counterparty", ""),
+    "Due Date": lambda txn, acc: acc.get("due_date", "")
+}
+# Same columns as the Excel export
+DEFAULT_COLUMNS = ("Date", "Description", "Account Type", "Account Name", "Amount", "Currency")
+
+
+def posting_chunks(ledger, columns=DEFAULT_COLUMNS, account_types=None, start=None, end=None, chunk_size=EXPORT_CHUNK_TRANSACTIONS):
+    # Lists of row tuples, one list per chunk of transactions. A date range (ISO strings, both ends
+    # included) leaves out undated transactions; no account types means every type.
+    getters = [EXPORT_COLUMNS[column] for column in columns]
+    account_types = set(account_types or ())
+    for transactions in ledger.chunks(chunk_size):
+        rows = []
+        for txn in transactions:
+            if start or end:
+                day = txn.get("date")
+                if not day or (start and day < start) or (end and day > end):
+                    continue
+            for acc in txn["accounts"]:
+                if account_types and acc["type"] not in account_types:
+                    continue
+                rows.append(tuple(getter(txn, acc) for getter in getters))
+        if rows:
+            yield rows
+
+
+def posting_rows(ledger, columns=DEFAULT_COLUMNS, **filters):
+    for rows in posting_chunks(ledger, columns, **filters):
+        yield from rows
+
+
+def export_postings(ledger, out, file_format="csv", columns=DEFAULT_COLUMNS, compress=False, **filters):
+    # Writes rows to the binary stream `out`, leaving it open; returns the number of rows written
+    if file_format not in EXPORT_FORMATS:
+        raise ValueError(f"format must be one of {', '.join(EXPORT_FORMATS)}")
+    target = gzip.GzipFile(fileobj=out, mode="wb", compresslevel=EXPORT_GZIP_LEVEL) if compress else out
+    text = io.TextIOWrapper(target, encoding="utf-8", newline="")
+    count = 0
+    if file_format == "csv":
+        writer = csv.writer(text)
+        writer.writerow(columns)
+    for rows in posting_chunks(ledger, columns, **filters):
+        if file_format == "csv":
+            writer.writerows(rows)
+        else:
+            text.write("".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows))
+        count += len(rows)
+    text.flush()
+    text.detach()
+    if compress:
+        target.close()
+    return count
+
+
+def iso_date(value):
+    return date.fromisoformat(value).isoformat()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream the ledger's postings to CSV or JSON Lines.")
+    parser.add_argument("ledger", nargs="?", default="student_transactions.json")
+    parser.add_argument("-o", "--output", help="file to write; stdout when omitted")
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--gzip", action="store_true", help="compress the output (implied by a .gz output name)")
+    parser.add_argument("--columns", nargs="+", choices=list(EXPORT_COLUMNS), default=list(DEFAULT_COLUMNS), metavar="COLUMN")
+    parser.add_argument("--type", dest="account_types", nargs="+", choices=list(sub_classification_options), help="only these account types")
+    parser.add_argument("--from", dest="start", type=iso_date, help="first transaction date, inclusive")
+    parser.add_argument("--to", dest="end", type=iso_date, help="last transaction date, inclusive")
+    args = parser.parse_args(argv)
+
+    ledger = LedgerStore(args.ledger, read_only=True)
+    compress = args.gzip or (args.output or "").endswith(".gz")
+    filters = {"account_types": args.account_types, "start": args.start, "end": args.end}
+    if args.output:
+        with open(args.output, "wb") as out:
+            count = export_postings(ledger, out, args.format, args.columns, compress, **filters)
+    else:
+        count = export_postings(ledger, sys.stdout.buffer, args.format, args.columns, compress, **filters)
+        sys.stdout.buffer.flush()
+    print(f"{count:,} rows written", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
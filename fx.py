@@ -0,0 +1,470 @@
+# --- Currencies, Exchange Rates and Reporting-Currency Conversion ---
+# Postings carry a "currency" (default BASE_CURRENCY) and transactions an ISO "date". Rates live in a
+# local CSV next to the ledger (student_transactions.rates.csv), one "date,currency,rate" line per
+# quote, where rate is units of BASE_CURRENCY per unit of the currency; the latest line for a date wins.
+import os
+import threading
+from collections import defaultdict
+from datetime import date
+from operator import itemgetter
+
+import numpy as np
+import pandas as pd
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from accounts import BASE_CURRENCY, TYPE_SIGNS, classification_id, posting_currency
+from cash_flow import ACTIVITIES, CASH_FLOW_CLASSES, CASH_LINE_ITEM, OTHER_OPERATING, UNALLOCATED, is_cash
+from ledger import UNDATED_MONTH, LedgerTotals, PeriodTotals
+
+CURRENCY_SYMBOLS = {"INR": "₹", "USD": "$", "EUR": "€", "GBP": "£", "JPY": "¥"}
+LATEST_DAY = date.max.toordinal()   # undated transactions convert at the latest rate
+FRAME_COMPACT_MIN = 4096
+
+# Cash flow lines as small integer codes, so a statement is one bincount
+FLOW_LINES = sorted(set(CASH_FLOW_CLASSES.values()) | {OTHER_OPERATING})
+FLOW_CODES = {line: code for code, line in enumerate(FLOW_LINES)}
+NOT_CASH, CASH_POSTING = -1, -2
+
+
+def day_ordinal(value):
+    return date.fromisoformat(value).toordinal() if value else LATEST_DAY
+
+
+def transaction_day(txn):
+    return day_ordinal(txn.get("date"))
+
+
+def month_index(days):
+    # ledger.date_month over an array of day ordinals
+    dated = days != LATEST_DAY
+    months = (np.datetime64("0001-01-01", "D") + (np.where(dated, days, 1).astype(np.int64) - 1)).astype("datetime64[M]")
+    return np.where(dated, months.astype(np.int64) + 1970 * 12, UNDATED_MONTH)
+
+
+def format_amount(amount, currency=BASE_CURRENCY):
+    symbol = CURRENCY_SYMBOLS.get(currency)
+    return f"{symbol}{amount:,.2f}" if symbol else f"{amount:,.2f} {currency}"
+
+
+def currency_code_error(currency):
+    if not isinstance(currency, str) or len(currency) != 3 or not currency.isalpha() or not currency.isupper():
+        return "currency must be a three-letter ISO code such as USD"
+    return None
+
+
+class RateTable:
+    """Dated exchange rates to BASE_CURRENCY, reloaded whenever the CSV changes on disk.
+
+    ``version`` goes up on every reload, so conversions cached against it are never stale.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.lock_path = path + ".lock"
+        self.stamp = None
+        self.version = 0
+        self.quotes = {}    # currency -> (sorted day ordinals, rates)
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def _stamp(self):
+        if not os.path.exists(self.path):
+            return None
+        stat = os.stat(self.path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self):
+        with self._lock:
+            stamp = self._stamp()
+            if stamp != self.stamp:
+                self._load()
+                self.stamp = stamp
+        return self
+
+    def _load(self):
+        by_currency = defaultdict(dict)
+        if os.path.exists(self.path):
+            with open(self.path, "r") as f:
+                for line in f:
+                    fields = line.strip().split(",")
+                    if len(fields) != 3 or fields[0] == "date":
+                        continue
+                    day, currency, rate = fields
+                    by_currency[currency][date.fromisoformat(day).toordinal()] = float(rate)
+        self.quotes = {}
+        for currency, rates in by_currency.items():
+            days = np.array(sorted(rates), dtype=np.int64)
+            self.quotes[currency] = (days, np.array([rates[day] for day in days], dtype=np.float64))
+        self.version += 1
+
+    def add(self, day, currency, rate):
+        # Appended like a journal line, so concurrent writers never lose each other's quotes
+        error = currency_code_error(currency)
+        if error:
+            raise ValueError(error)
+        if currency == BASE_CURRENCY:
+            raise ValueError(f"{BASE_CURRENCY} is the base currency; its rate is always 1")
+        if not rate > 0:
+            raise ValueError("rate must be positive")
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            new_file = not os.path.exists(self.path)
+            with open(self.path, "a") as f:
+                f.write(("date,currency,rate\n" if new_file else "") + f"{date.fromisoformat(str(day)).isoformat()},{currency},{float(rate)!r}\n")
+        return self.refresh()
+
+    def currencies(self):
+        return sorted(set(self.quotes) | {BASE_CURRENCY})
+
+    def rows(self):
+        return [
+            {"Date": date.fromordinal(int(day)).isoformat(), "Currency": currency, "Rate": rate}
+            for currency, (days, rates) in sorted(self.quotes.items())
+            for day, rate in zip(days, rates)
+        ]
+
+    def to_base(self, currency, days):
+        # Units of BASE_CURRENCY per unit of `currency` on each day: the last quote on or before it,
+        # the earliest quote before the first one, NaN for a currency with no quotes
+        if currency == BASE_CURRENCY:
+            return np.ones(len(days))
+        if currency not in self.quotes:
+            return np.full(len(days), np.nan)
+        quote_days, rates = self.quotes[currency]
+        return rates[np.maximum(np.searchsorted(quote_days, days, side="right") - 1, 0)]
+
+
+def base_factors(rates, dates, currencies, counts):
+    # BASE_CURRENCY per posted unit for every posting, in order; NaN where a rate is missing. `dates` has
+    # each transaction's date and `currencies` each posting's currency (None for the base currency);
+    # only the distinct values are looked at in Python, and dates not at all when nothing needs a rate
+    currency_codes, distinct_currencies = pd.factorize(pd.Series(currencies, dtype=object))
+    factors = np.ones(len(currency_codes))
+    foreign = [(code, currency) for code, currency in enumerate(distinct_currencies) if currency and currency != BASE_CURRENCY]
+    if not foreign:
+        return factors
+    day_codes, distinct_dates = pd.factorize(pd.Series(dates, dtype=object))
+    days = np.repeat(np.array([day_ordinal(value) for value in distinct_dates] + [LATEST_DAY], dtype=np.int64)[day_codes], counts)
+    for code, currency in foreign:
+        rows = currency_codes == code
+        factors[rows] = rates.to_base(currency, days[rows])
+    return factors
+
+
+class PostingFrame:
+    """Every posting as NumPy columns, appended on commit, so conversion is one multiply per report.
+
+    Conversion factors are cached per (reporting currency, rate-table version) and only extended for
+    rows appended since; deleted rows are masked out and compacted lazily like the ledger's slots.
+    """
+
+    COLUMNS = {
+        "txn_id": np.int64, "class_id": np.int32, "account_id": np.int64, "amount": np.float64,
+        "sign": np.float64, "currency": np.int16, "day": np.int32, "expense": np.bool_,
+        "flow": np.int16, "alive": np.bool_
+    }
+
+    def __init__(self, rates):
+        self.rates = rates
+        self.size = 0
+        self.columns = {name: np.empty(1024, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+        self.rows = {}              # transaction id -> (first row, end row)
+        self.dead = 0
+        self.currencies = []        # currency code -> currency
+        self.currency_codes = {}
+        self.factors = {}           # (reporting currency, rates version) -> factor per row
+        self.reports = {}           # (report, reporting currency, rates version) -> result, until the next commit
+
+    @classmethod
+    def build(cls, items, rates):
+        # Column by column, as in integrity.flatten_postings: only the distinct classifications
+        # and currencies are looked at in Python, then broadcast back by code
+        frame = cls(rates)
+        transactions = list(items)
+        if not transactions:
+            return frame
+        counts = np.fromiter((len(txn["accounts"]) for _, txn in transactions), dtype=np.int64, count=len(transactions))
+        ends = np.cumsum(counts)
+        txn_ids = np.fromiter(map(itemgetter(0), transactions), dtype=np.int64, count=len(transactions))
+        frame.rows = dict(zip(txn_ids.tolist(), zip((ends - counts).tolist(), ends.tolist())))
+        postings = [acc for _, txn in transactions for acc in txn["accounts"]]
+        size = len(postings)
+        txn_pos = np.repeat(np.arange(len(transactions)), counts)
+
+        class_codes, class_keys = pd.factorize(pd.Series(list(map(itemgetter("type", "sub", "line_item"), postings)), dtype=object))
+        class_ids = np.array([classification_id(*key) for key in class_keys], dtype=np.int32)
+        class_signs = np.array([TYPE_SIGNS.get(key[0], 1.0) for key in class_keys])
+        class_expense = np.array([key[0] == "Equity" and key[1] == "Expenses" for key in class_keys], dtype=bool)
+        class_cash = np.array([key[0] == "Asset" and key[2] == CASH_LINE_ITEM for key in class_keys], dtype=bool)
+        class_flow = np.array([FLOW_CODES[CASH_FLOW_CLASSES.get(key[1:], OTHER_OPERATING)] for key in class_keys], dtype=np.int16)
+        # Missing dates and currencies factorize to -1: the latest day and the base currency
+        currency_codes, currencies = pd.factorize(pd.Series([acc.get("currency") or None for acc in postings], dtype=object))
+        frame.currencies = list(currencies)
+        if BASE_CURRENCY not in frame.currencies:
+            frame.currencies.append(BASE_CURRENCY)
+        frame.currency_codes = {currency: code for code, currency in enumerate(frame.currencies)}
+        currency_codes[currency_codes < 0] = frame.currency_codes[BASE_CURRENCY]
+        day_codes, dates = pd.factorize(pd.Series([txn.get("date") or None for _, txn in transactions], dtype=object))
+        days = np.array([day_ordinal(value) for value in dates] + [LATEST_DAY], dtype=np.int32)[day_codes]
+
+        cash = class_cash[class_codes]
+        touches_cash = np.bincount(txn_pos, weights=cash, minlength=len(transactions)) > 0
+        frame.columns = {
+            "txn_id": txn_ids[txn_pos],
+            "class_id": class_ids[class_codes],
+            "account_id": np.fromiter(map(itemgetter("account_id"), postings), dtype=np.int64, count=size),
+            "amount": np.fromiter(map(itemgetter("amount"), postings), dtype=np.float64, count=size),
+            "sign": class_signs[class_codes],
+            "currency": currency_codes.astype(np.int16),
+            "day": days[txn_pos],
+            "expense": class_expense[class_codes],
+            "flow": np.where(touches_cash[txn_pos], np.where(cash, CASH_POSTING, class_flow[class_codes]), NOT_CASH).astype(np.int16),
+            "alive": np.ones(size, dtype=bool)
+        }
+        frame.size = size
+        return frame
+
+    def add(self, txn_id, txn):
+        rows = self._posting_rows(txn_id, txn)
+        start, end = self.size, self.size + len(rows)
+        if end > len(self.columns["amount"]):
+            capacity = max(end, 2 * len(self.columns["amount"]))
+            for name, column in self.columns.items():
+                grown = np.empty(capacity, dtype=column.dtype)
+                grown[:self.size] = column[:self.size]
+                self.columns[name] = grown
+        for row, values in enumerate(rows, start):
+            for name, value in zip(self.COLUMNS, values):
+                self.columns[name][row] = value
+        self.rows[txn_id] = (start, end)
+        self.size = end
+        self.reports = {}
+
+    def _posting_rows(self, txn_id, txn):
+        # One tuple per posting, in COLUMNS order
+        touches_cash = any(is_cash(acc) for acc in txn["accounts"])
+        day = transaction_day(txn)
+        rows = []
+        for acc in txn["accounts"]:
+            currency = posting_currency(acc)
+            if currency not in self.currency_codes:
+                self.currency_codes[currency] = len(self.currencies)
+                self.currencies.append(currency)
+            if not touches_cash:
+                flow = NOT_CASH
+            elif is_cash(acc):
+                flow = CASH_POSTING
+            else:
+                flow = FLOW_CODES[CASH_FLOW_CLASSES.get((acc["sub"], acc["line_item"]), OTHER_OPERATING)]
+            rows.append((
+                txn_id, classification_id(acc["type"], acc["sub"], acc["line_item"]), acc["account_id"], acc["amount"],
+                TYPE_SIGNS.get(acc["type"], 1.0), self.currency_codes[currency], day,
+                acc["type"] == "Equity" and acc["sub"] == "Expenses", flow, True
+            ))
+        return rows
+
+    def remove(self, txn_id, txn):
+        start, end = self.rows.pop(txn_id)
+        self.columns["alive"][start:end] = False
+        self.dead += end - start
+        self.reports = {}
+        if self.dead > FRAME_COMPACT_MIN and self.dead > self.size // 2:
+            self._compact()
+
+    def _compact(self):
+        keep = self.columns["alive"][:self.size]
+        for name, column in self.columns.items():
+            kept = column[:self.size][keep]
+            column[:len(kept)] = kept
+        self.size = int(keep.sum())
+        self.dead = 0
+        txn_ids = self.columns["txn_id"][:self.size]
+        ids, starts, counts = np.unique(txn_ids, return_index=True, return_counts=True)
+        self.rows = {int(txn_id): (int(start), int(start + count)) for txn_id, start, count in zip(ids, starts, counts)}
+        # Row numbers moved, so cached factors no longer line up
+        self.factors = {}
+
+    # ---------- Conversion ----------
+    def conversion(self, reporting):
+        # Reporting-currency units per posting unit, for rows [0, size)
+        self.rates.refresh()
+        key = (reporting, self.rates.version)
+        cached = self.factors.get(key, np.empty(0))
+        if len(cached) < self.size:
+            start = len(cached)
+            codes = self.columns["currency"][start:self.size]
+            days = self.columns["day"][start:self.size]
+            extra = np.empty(self.size - start)
+            reporting_rate = self.rates.to_base(reporting, days)
+            for code in np.unique(codes):
+                rows = codes == code
+                extra[rows] = self.rates.to_base(self.currencies[code], days[rows]) / reporting_rate[rows]
+            cached = np.concatenate([cached, extra])
+            # Switching reporting currency keeps the other currencies' factors; a reload of the rates drops them all
+            self.factors = {other: factors for other, factors in self.factors.items() if other[1] == self.rates.version}
+            self.factors[key] = cached
+        return cached[:self.size]
+
+    def _converted(self, reporting):
+        # Converted amounts of live rows, and the currencies that could not be converted
+        factors = self.conversion(reporting)
+        alive = self.columns["alive"][:self.size]
+        unknown = alive & np.isnan(factors)
+        if reporting not in self.rates.currencies():
+            missing = [reporting]
+        else:
+            missing = sorted({self.currencies[code] for code in np.unique(self.columns["currency"][:self.size][unknown])})
+        return self.columns["amount"][:self.size] * factors, alive & ~unknown, missing
+
+    def _cached(self, report, reporting, build):
+        key = (report, reporting, self.rates.refresh().version)
+        if key not in self.reports:
+            self.reports[key] = build(reporting)
+        return self.reports[key]
+
+    def totals(self, reporting):
+        # A LedgerTotals in the reporting currency, so every statement reads it unchanged
+        return self._cached("totals", reporting, self._build_totals)
+
+    def _build_totals(self, reporting):
+        amounts, valid, missing = self._converted(reporting)
+        account_ids = self.columns["account_id"][:self.size][valid]
+        width = int(account_ids.max()) + 1 if len(account_ids) else 1
+        keys = self.columns["class_id"][:self.size][valid].astype(np.int64) * width + account_ids
+        # Classifications times accounts is small next to the postings, so group with a dense bincount
+        sums = np.bincount(keys, weights=amounts[valid])
+        counts = np.bincount(keys)
+        groups = np.flatnonzero(counts)
+
+        totals = LedgerTotals()
+        for group, amount, count in zip(groups.tolist(), sums[groups].tolist(), counts[groups].tolist()):
+            totals.balances[divmod(group, width)] = amount
+            totals.postings[divmod(group, width)] = count
+        totals.expenses_abs = float(np.abs(amounts[valid & self.columns["expense"][:self.size]]).sum())
+        totals.transaction_count = len(self.rows)
+        return totals, missing
+
+    def cash_flow(self, reporting):
+        # Same lines as CashFlowIndex.statement(), from the converted columns
+        return self._cached("cash_flow", reporting, self._build_cash_flow)
+
+    def _build_cash_flow(self, reporting):
+        amounts, valid, missing = self._converted(reporting)
+        flow = self.columns["flow"][:self.size]
+        rows = valid & (flow != NOT_CASH)
+        converted, flow = amounts[rows], flow[rows]
+        signed = converted * self.columns["sign"][:self.size][rows]
+        counter = flow >= 0
+
+        # A counter-posting moves cash by minus its debit; whatever the entry leaves over is unallocated
+        moved = -signed[counter]
+        totals = np.bincount(flow[counter], weights=moved, minlength=len(FLOW_LINES))
+        counts = np.bincount(flow[counter][moved != 0], minlength=len(FLOW_LINES))
+        _, txn_rows = np.unique(self.columns["txn_id"][:self.size][rows], return_inverse=True)
+        residual = np.bincount(txn_rows, weights=np.where(counter, signed, converted))
+        residual = residual[np.abs(residual) > 0.005]
+
+        movements = {FLOW_LINES[code]: totals[code] for code in np.flatnonzero(counts)}
+        if len(residual):
+            movements[UNALLOCATED] = float(residual.sum())
+        lines = {activity: [] for activity in ACTIVITIES}
+        for (activity, label), amount in sorted(movements.items()):
+            lines[activity].append((label, float(amount)))
+        return lines, missing
+
+    def month_totals(self, reporting):
+        # A PeriodTotals in the reporting currency, as totals() is a LedgerTotals
+        return self._cached("month_totals", reporting, self._build_month_totals)
+
+    def _build_month_totals(self, reporting):
+        amounts, valid, missing = self._converted(reporting)
+        month_codes, months = pd.factorize(month_index(self.columns["day"][:self.size][valid]))
+        class_ids = self.columns["class_id"][:self.size][valid].astype(np.int64)
+        width = int(class_ids.max()) + 1 if len(class_ids) else 1
+        keys = month_codes.astype(np.int64) * width + class_ids
+        sums = np.bincount(keys, weights=amounts[valid])
+        counts = np.bincount(keys)
+        groups = np.flatnonzero(counts)
+        expense = self.columns["expense"][:self.size][valid]
+        expenses_abs = np.bincount(month_codes[expense], weights=np.abs(amounts[valid][expense]), minlength=len(months))
+
+        totals = PeriodTotals()
+        for group, amount, count in zip(groups.tolist(), sums[groups].tolist(), counts[groups].tolist()):
+            key = (int(months[group // width]), group % width)
+            totals.cells[key] = amount
+            totals.postings[key] = count
+        for month, amount in zip(months.tolist(), expenses_abs.tolist()):
+            if amount:
+                totals.expenses_abs[month] = amount
+        return totals, missing
+
+
+def rates_path(ledger_path):
+    return os.path.splitext(ledger_path)[0] + ".rates.csv"
+
+
+def posting_frame_builder(rates):
+    # View builder for LedgerStore, e.g. {"fx_postings": posting_frame_builder(rates)}
+    return lambda items: PostingFrame.build(items, rates)
+
+
+def needs_conversion(ledger, reporting=BASE_CURRENCY):
+    return reporting != BASE_CURRENCY or ledger.view("totals").foreign_postings > 0
+
+
+def posting_factor(ledger, reporting=BASE_CURRENCY):
+    # (transaction id, posting position) -> reporting-currency units per posted unit, for pages that
+    # walk individual postings; None when every posting is already in the reporting currency. The
+    # row map is copied under the lock, so later commits do not shift the rows it points at.
+    with ledger.reading():
+        if not needs_conversion(ledger, reporting):
+            return None
+        frame = ledger.view("fx_postings")
+        factors, rows = frame.conversion(reporting), dict(frame.rows)
+    return lambda txn_id, pos: float(factors[rows[txn_id][0] + pos])
+
+
+def transaction_postings(ledger, reporting=BASE_CURRENCY):
+    # (transactions in ledger order as (id, description), their postings as columns), read together under
+    # the lock for pages that add postings up per transaction. The columns are "txn" (position of the
+    # transaction in that order), "account_id", "class_id" and "amount" in the reporting currency, NaN
+    # where the posting's currency has no rate. The posting frame is built even for a ledger booked only
+    # in the base currency; only the conversion is skipped.
+    with ledger.reading():
+        frame = ledger.view("fx_postings")
+        transactions = [(txn["id"], txn["description"]) for txn in ledger]
+        alive = frame.columns["alive"][:frame.size]
+        amounts = frame.columns["amount"][:frame.size][alive]
+        if needs_conversion(ledger, reporting):
+            amounts = amounts * frame.conversion(reporting)[alive]
+        txn_ids = frame.columns["txn_id"][:frame.size][alive]
+        postings = {
+            "account_id": frame.columns["account_id"][:frame.size][alive],
+            "class_id": frame.columns["class_id"][:frame.size][alive],
+            "amount": amounts
+        }
+    postings["txn"] = pd.Index([txn_id for txn_id, _ in transactions]).get_indexer(txn_ids)
+    return transactions, postings
+
+
+def report_totals(ledger, reporting=BASE_CURRENCY):
+    # (totals, currencies without a rate). A ledger booked only in the base currency is reported
+    # from a copy of the running totals, taken under the lock so later commits cannot change it
+    # while a page reads it; no conversion runs.
+    with ledger.reading():
+        if not needs_conversion(ledger, reporting):
+            return ledger.view("totals").copy(), []
+        return ledger.view("fx_postings").totals(reporting)
+
+
+def report_cash_flow(ledger, reporting=BASE_CURRENCY):
+    with ledger.reading():
+        if not needs_conversion(ledger, reporting):
+            return ledger.view("cash_flow").statement(), []
+        return ledger.view("fx_postings").cash_flow(reporting)
+
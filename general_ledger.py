@@ -0,0 +1,110 @@
+# --- General Ledger: per-account posting index ---
+from bisect import bisect_left, insort
+from heapq import merge
+
+from accounts import TYPE_SIGNS, classification_id, posting_class
+
+
+class AccountPostingIndex:
+    """(Classification, account id) -> (transaction id, posting position) references, kept in ledger order on every commit."""
+
+    def __init__(self):
+        self.postings = {}      # (classification id, account id) -> sorted list of (transaction id, position in txn["accounts"])
+
+    @classmethod
+    def build(cls, items):
+        index = cls()
+        for txn_id, txn in items:
+            for pos, acc in enumerate(txn["accounts"]):
+                index.postings.setdefault(posting_key(acc), []).append((txn_id, pos))
+        for refs in index.postings.values():
+            refs.sort()
+        return index
+
+    def add(self, txn_id, txn):
+        # New ids are the largest, so this is an append in all but restores
+        for pos, acc in enumerate(txn["accounts"]):
+            insort(self.postings.setdefault(posting_key(acc), []), (txn_id, pos))
+
+    def remove(self, txn_id, txn):
+        for pos, acc in enumerate(txn["accounts"]):
+            key = posting_key(acc)
+            refs = self.postings[key]
+            del refs[bisect_left(refs, (txn_id, pos))]
+            if not refs:
+                del self.postings[key]
+
+    def refs(self, keys):
+        # A merged account reads its aliases' postings too, interleaved in ledger order
+        lists = [self.postings[key] for key in keys if key in self.postings]
+        if len(lists) == 1:
+            return lists[0]
+        return list(merge(*lists))
+
+
+def posting_key(acc):
+    return classification_id(*posting_class(acc)), acc["account_id"]
+
+
+def account_keys(ledger, account_id):
+    # Only postings under the account's own classification, the same cells LedgerTotals
+    # adds up for its trial balance row; an alias merged in from another classification
+    # keeps its own row
+    class_id = classification_id(*posting_class(ledger.accounts.classification(account_id)))
+    return [(class_id, member) for member in ledger.accounts.members(account_id)]
+
+
+def account_posting_count(ledger, account_id):
+    index = ledger.view("postings")
+    return sum(len(index.postings.get(key, ())) for key in account_keys(ledger, account_id))
+
+
+def account_history(ledger, account_id, offset=0, limit=None, factor=None):
+    # One page of an account's postings, its running balance and its closing balance;
+    # costs O(postings in the account). Balances are debits less credits, flipped for
+    # accounts whose normal balance is a credit. `factor(txn_id, pos)` converts each
+    # posting to the reporting currency (see fx.posting_factor).
+    refs = ledger.view("postings").refs(account_keys(ledger, account_id))
+    end = len(refs) if limit is None else min(offset + limit, len(refs))
+    normal_sign = TYPE_SIGNS.get(ledger.accounts.accounts[account_id]["type"], 1.0)
+
+    rows = []
+    balance = 0.0
+    for row, (txn_id, pos) in enumerate(refs):
+        txn = ledger.get(txn_id)
+        acc = txn["accounts"][pos]
+        debit = acc["amount"] * TYPE_SIGNS.get(acc["type"], 1.0)
+        if factor is not None:
+            debit *= factor(txn_id, pos)
+        balance += debit * normal_sign
+        if offset <= row < end:
+            rows.append({
+                "Txn ID": txn_id,
+                "Description": txn["description"],
+                "Posted As": acc["name"],
+                "Classification": f"{acc['type']} / {acc['sub']} / {acc['line_item']}",
+                "Debit": debit if debit > 0 else 0.0,
+                "Credit": -debit if debit < 0 else 0.0,
+                "Balance": balance
+            })
+    return rows, len(refs), balance
+
+
+def trial_balance(totals, accounts):
+    # One row per account and classification, read from the running totals rather than the postings
+    rows = []
+    balances = sorted(
+        totals.statement_totals(accounts).items(),
+        key=lambda item: (classification_id(*item[0][:3]), item[0][3].casefold())
+    )
+    for (acc_type, sub, line_item, name), amount in balances:
+        debit = amount * TYPE_SIGNS.get(acc_type, 1.0)
+        rows.append({
+            "Account": name,
+            "Type": acc_type,
+            "Sub-Classification": sub,
+            "Line Item": line_item,
+            "Debit": debit if debit > 0 else 0.0,
+            "Credit": -debit if debit < 0 else 0.0
+        })
+    return rows
@@ -0,0 +1,181 @@
+# --- Ledger Integrity Checker ---
+# Usage: python integrity.py [student_transactions.json] [--tolerance 0.01] [--limit 20] [--json]
+import argparse
+import json
+import sys
+from operator import itemgetter, methodcaller
+
+import numpy as np
+import pandas as pd
+
+from accounts import BASE_CURRENCY, TYPE_SIGNS, line_item_options, sub_classification_options
+from fx import RateTable, base_factors, rates_path
+from ledger import LedgerStore
+
+REPORT_TITLES = {
+    "unbalanced": "Transactions where Assets != Liabilities + Equity",
+    "unconvertible": "Transactions with a posting in a currency that has no rate (balance not checked)",
+    "single_entry": "Transactions with fewer than two postings",
+    "invalid_classification": "Postings with an unknown type / sub-classification / line item",
+    "inconsistent_accounts": "Account names booked under more than one classification",
+    "duplicate_names": "Account names that differ only by whitespace or case"
+}
+
+
+def flatten_postings(transactions):
+    # One flat list of posting dicts, then each column pulled out at C speed
+    counts = np.fromiter(map(len, map(itemgetter("accounts"), transactions)), dtype=np.int64, count=len(transactions))
+    postings = [acc for txn in transactions for acc in txn["accounts"]]
+    txn_ids = np.fromiter(map(itemgetter("id"), transactions), dtype=np.int64, count=len(transactions))
+    return pd.DataFrame({
+        "txn_pos": np.repeat(np.arange(len(transactions)), counts),
+        "txn_id": np.repeat(txn_ids, counts),
+        "name": list(map(itemgetter("name"), postings)),
+        "type": list(map(itemgetter("type"), postings)),
+        "sub": list(map(itemgetter("sub"), postings)),
+        "line_item": list(map(itemgetter("line_item"), postings)),
+        "currency": list(map(methodcaller("get", "currency"), postings)),
+        "amount": np.fromiter(map(itemgetter("amount"), postings), dtype=np.float64, count=len(postings))
+    }), counts, txn_ids
+
+
+def check_ledger(transactions, tolerance=0.01, rates=None):
+    # With a rate table, entries booked in several currencies are balanced in the base currency
+    transactions = list(transactions)
+    postings, counts, txn_ids = flatten_postings(transactions)
+    report = {}
+
+    # Per-transaction signed balance in one bincount over transaction positions
+    type_codes, types = pd.factorize(postings["type"])
+    signs = np.array([TYPE_SIGNS.get(acc_type, 0.0) for acc_type in types] + [0.0])[type_codes]
+    amounts = postings["amount"].to_numpy()
+    txn_pos = postings["txn_pos"].to_numpy()
+    unconvertible = np.zeros(len(amounts), dtype=bool)
+    if rates is not None and len(amounts):
+        dates = list(map(methodcaller("get", "date"), transactions))
+        amounts = amounts * base_factors(rates, dates, postings["currency"], counts)
+        unconvertible = np.isnan(amounts)
+    balance = np.bincount(txn_pos, weights=np.where(unconvertible, 0.0, amounts) * signs, minlength=len(transactions))
+    # A posting without a rate has no base amount, so its transaction can be neither passed nor failed
+    skipped = np.bincount(txn_pos[unconvertible], minlength=len(transactions)) > 0
+    bad = np.flatnonzero((np.abs(balance) > tolerance) & ~skipped)
+    report["unbalanced"] = pd.DataFrame({
+        "txn_id": txn_ids[bad],
+        "description": [transactions[pos].get("description", "") for pos in bad],
+        "imbalance": balance[bad]
+    })
+    missing = np.flatnonzero(skipped)
+    starts = np.cumsum(counts) - counts     # each transaction's postings are contiguous rows
+    report["unconvertible"] = pd.DataFrame({
+        "txn_id": txn_ids[missing],
+        "description": [transactions[pos].get("description", "") for pos in missing],
+        "currencies": [
+            sorted({
+                acc.get("currency") or BASE_CURRENCY
+                for acc, no_rate in zip(transactions[pos]["accounts"], unconvertible[starts[pos]:starts[pos] + counts[pos]]) if no_rate
+            })
+            for pos in missing
+        ]
+    }, columns=["txn_id", "description", "currencies"])
+    single = np.flatnonzero(counts < 2)
+    report["single_entry"] = pd.DataFrame({
+        "txn_id": txn_ids[single],
+        "description": [transactions[pos].get("description", "") for pos in single]
+    })
+
+    # Classifications are few, so validate the distinct ones and broadcast back by code
+    sub_codes, subs = pd.factorize(postings["sub"])
+    item_codes, items = pd.factorize(postings["line_item"])
+    class_codes, class_keys = pd.factorize((type_codes * len(subs) + sub_codes) * len(items) + item_codes)
+    classes = [
+        (types[key // (len(subs) * len(items))], subs[key // len(items) % len(subs)], items[key % len(items)])
+        for key in class_keys
+    ]
+    valid = np.array([
+        sub in sub_classification_options.get(acc_type, []) and line_item in line_item_options.get(sub, [])
+        for acc_type, sub, line_item in classes
+    ], dtype=bool)
+    invalid_rows = postings[~valid[class_codes]] if len(classes) else postings.iloc[:0]
+    report["invalid_classification"] = invalid_rows[["txn_id", "name", "type", "sub", "line_item"]].reset_index(drop=True)
+
+    # One account name booked under more than one classification
+    name_codes, names = pd.factorize(postings["name"])
+    txn_id_values = postings["txn_id"].to_numpy()
+    pairs = np.unique(name_codes * len(classes) + class_codes)
+    pair_names, pair_classes = pairs // len(classes), pairs % len(classes)
+    class_counts = np.bincount(pair_names, minlength=len(names))
+    rows = []
+    for name_code, positions in group_rows(name_codes, class_counts[name_codes] > 1):
+        start, end = np.searchsorted(pair_names, [name_code, name_code + 1])
+        in_pairs = pair_classes[start:end]
+        rows.append({
+            "name": names[name_code],
+            "classifications": sorted(" / ".join(classes[code]) for code in in_pairs),
+            "txn_ids": np.unique(txn_id_values[positions]).tolist()
+        })
+    report["inconsistent_accounts"] = pd.DataFrame(rows, columns=["name", "classifications", "txn_ids"])
+
+    # Names that only differ by whitespace or case ("cash", "cash ", "Cash"), normalised as account_key does
+    norm_codes, norm_names = pd.factorize(pd.Series(names, dtype=object).str.split().str.join(" ").str.casefold())
+    variant_counts = np.bincount(norm_codes, minlength=len(norm_names))
+    row_norm = norm_codes[name_codes]
+    rows = []
+    for norm_code, positions in group_rows(row_norm, variant_counts[row_norm] > 1):
+        variant_codes = np.unique(name_codes[positions])
+        variant_classes = np.unique(name_codes[positions] * len(classes) + class_codes[positions])
+        rows.append({
+            "account": norm_names[norm_code],
+            "variants": sorted(names[code] for code in variant_codes),
+            "classifications": sorted({
+                f"{names[key // len(classes)]!r}: {classes[key % len(classes)][0]} / {classes[key % len(classes)][1]}"
+                for key in variant_classes
+            }),
+            "txn_ids": np.unique(txn_id_values[positions]).tolist()
+        })
+    report["duplicate_names"] = pd.DataFrame(rows, columns=["account", "variants", "classifications", "txn_ids"])
+
+    return report
+
+
+def group_rows(keys, mask):
+    # (key, row positions) for every key among the masked rows, via one stable sort
+    positions = np.flatnonzero(mask)
+    if not len(positions):
+        return []
+    order = positions[np.argsort(keys[positions], kind="stable")]
+    sorted_keys = keys[order]
+    bounds = np.flatnonzero(np.diff(sorted_keys)) + 1
+    return zip(sorted_keys[np.r_[0, bounds]], np.split(order, bounds))
+
+
+def format_report(report, limit=20):
+    lines = []
+    for key, title in REPORT_TITLES.items():
+        frame = report[key]
+        lines.append(f"{title}: {len(frame)}")
+        if len(frame):
+            lines.append(frame.head(limit).to_string(index=False))
+            if len(frame) > limit:
+                lines.append(f"... {len(frame) - limit} more")
+        lines.append("")
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check every stored transaction for accounting equation and account naming problems.")
+    parser.add_argument("ledger", nargs="?", default="student_transactions.json", help="ledger snapshot (its journal is read too)")
+    parser.add_argument("--tolerance", type=float, default=0.01, help="largest imbalance treated as rounding")
+    parser.add_argument("--limit", type=int, default=20, help="rows shown per section")
+    parser.add_argument("--json", action="store_true", help="print the full report as JSON")
+    args = parser.parse_args(argv)
+
+    report = check_ledger(LedgerStore(args.ledger, read_only=True), tolerance=args.tolerance, rates=RateTable(rates_path(args.ledger)))
+    if args.json:
+        print(json.dumps({key: frame.to_dict(orient="records") for key, frame in report.items()}, indent=2, default=str))
+    else:
+        print(format_report(report, limit=args.limit))
+    return 1 if any(len(frame) for frame in report.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,735 @@
+# --- Ledger Store and Aggregates ---
+import json
+import os
+import threading
+from collections import defaultdict, deque
+from contextlib import contextmanager
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:  # Windows: sessions in one process are still serialised by the thread lock
+    fcntl = None
+
+from accounts import BASE_CURRENCY, AccountRegistry, classification_id, classifications, posting_currency
+from audit import AuditTrail, StateDigest
+
+JOURNAL_COMPACT_MIN = 1000
+TOMBSTONE_COMPACT_MIN = 1024
+HISTORY_BUDGET_BYTES = 4 * 1024 * 1024
+UNDATED_MONTH = -1                  # month index of undated transactions, placed by the report that reads them
+AUDIT_STATE_VIEW = "audit_state"
+
+
+class LedgerTotals:
+    """Running balances per (classification id, account id), updated on every commit."""
+
+    def __init__(self):
+        self.balances = defaultdict(float)   # (classification id, account id) -> amount
+        self.postings = defaultdict(int)     # same key -> number of postings, so empty groups drop out
+        self.expenses_abs = 0.0              # expenses are summed as absolute postings
+        self.transaction_count = 0
+        self.foreign_postings = 0            # postings not in BASE_CURRENCY; while zero no conversion is needed
+
+    @classmethod
+    def build(cls, items):
+        totals = cls()
+        for txn_id, txn in items:
+            totals.add(txn_id, txn)
+        return totals
+
+    def add(self, txn_id, txn, sign=1):
+        for acc in txn["accounts"]:
+            key = (classification_id(acc["type"], acc["sub"], acc["line_item"]), acc["account_id"])
+            self.balances[key] += sign * acc["amount"]
+            self.postings[key] += sign
+            if not self.postings[key]:
+                del self.balances[key], self.postings[key]
+            if acc["type"] == "Equity" and acc["sub"] == "Expenses":
+                self.expenses_abs += sign * abs(acc["amount"])
+            if posting_currency(acc) != BASE_CURRENCY:
+                self.foreign_postings += sign
+        self.transaction_count += sign
+
+    def remove(self, txn_id, txn):
+        self.add(txn_id, txn, sign=-1)
+
+    def copy(self):
+        totals = LedgerTotals()
+        totals.balances.update(self.balances)
+        totals.postings.update(self.postings)
+        totals.expenses_abs = self.expenses_abs
+        totals.transaction_count = self.transaction_count
+        totals.foreign_postings = self.foreign_postings
+        return totals
+
+    def total(self, acc_type=None, sub=None, line_item=None):
+        return sum(
+            amount for (class_id, _), amount in self.balances.items()
+            if (acc_type is None or classifications[class_id][0] == acc_type)
+            and (sub is None or classifications[class_id][1] == sub)
+            and (line_item is None or classifications[class_id][2] == line_item)
+        )
+
+    def account_balances(self, accounts):
+        # Canonical account id -> amount; merged aliases roll up into their target
+        balances = defaultdict(float)
+        for (_, account_id), amount in self.balances.items():
+            balances[accounts.canonical_id(account_id)] += amount
+        return balances
+
+    def statement_totals(self, accounts):
+        # (type, sub, line_item, account name) -> amount, the grouping the statements display
+        grouped = defaultdict(float)
+        for (class_id, account_id), amount in self.balances.items():
+            grouped[(class_id, accounts.canonical_id(account_id))] += amount
+        return {
+            (*classifications[class_id], accounts.name(account_id)): amount
+            for (class_id, account_id), amount in grouped.items()
+        }
+
+    def summary(self):
+        # Same inputs show_ratio_analysis derives from the transactions
+        revenue = self.total("Equity", "Incomes")
+        return {
+            "total_assets": self.total("Asset"),
+            "total_liabilities": self.total("Liability"),
+            "total_equity": self.total("Equity") - revenue - self.total("Equity", "Expenses"),
+            "current_assets": self.total("Asset", "Current Assets"),
+            "current_liabilities": self.total("Liability", "Current Liabilities"),
+            "inventory": self.total("Asset", "Current Assets", "Inventory"),
+            "cash": self.total("Asset", line_item="Cash and Cash Equivalents"),
+            "revenue": revenue,
+            "total_expenses": self.expenses_abs,
+            "net_income": revenue - self.expenses_abs
+        }
+
+
+@lru_cache(maxsize=4096)
+def date_month(value):
+    # Months since year 0 (year * 12 + month - 1) for an ISO date
+    if not value:
+        return UNDATED_MONTH
+    day = date.fromisoformat(value)
+    return day.year * 12 + day.month - 1
+
+
+class PeriodTotals:
+    """Running balances per (month, classification id), updated on every commit."""
+
+    def __init__(self):
+        self.cells = defaultdict(float)          # (month index, classification id) -> amount
+        self.postings = defaultdict(int)         # same key -> number of postings, so empty cells drop out
+        self.expenses_abs = defaultdict(float)   # month index -> expenses summed as absolute postings
+
+    @classmethod
+    def build(cls, items):
+        totals = cls()
+        for txn_id, txn in items:
+            totals.add(txn_id, txn)
+        return totals
+
+    def add(self, txn_id, txn, sign=1):
+        month = date_month(txn.get("date") or None)
+        for acc in txn["accounts"]:
+            key = (month, classification_id(acc["type"], acc["sub"], acc["line_item"]))
+            self.cells[key] += sign * acc["amount"]
+            self.postings[key] += sign
+            if not self.postings[key]:
+                del self.cells[key], self.postings[key]
+            if acc["type"] == "Equity" and acc["sub"] == "Expenses":
+                self.expenses_abs[month] += sign * abs(acc["amount"])
+
+    def remove(self, txn_id, txn):
+        self.add(txn_id, txn, sign=-1)
+
+    def copy(self):
+        totals = PeriodTotals()
+        totals.cells.update(self.cells)
+        totals.postings.update(self.postings)
+        totals.expenses_abs.update(self.expenses_abs)
+        return totals
+
+
+def ratio_values(summary):
+    current_liabilities = summary["current_liabilities"]
+    total_equity = summary["total_equity"]
+    total_assets = summary["total_assets"]
+    revenue = summary["revenue"]
+    net_income = summary["net_income"]
+    return {
+        "Current Ratio": summary["current_assets"] / current_liabilities if current_liabilities else float('inf'),
+        "Quick Ratio": (summary["current_assets"] - summary["inventory"]) / current_liabilities if current_liabilities else float('inf'),
+        "Debt to Equity": summary["total_liabilities"] / total_equity if total_equity else float('inf'),
+        "Debt to Assets": summary["total_liabilities"] / total_assets if total_assets else 0,
+        "Net Profit Margin": (net_income / revenue * 100) if revenue else 0,
+        "Return on Assets": (net_income / total_assets * 100) if total_assets else 0,
+        "Return on Equity": (net_income / total_equity * 100) if total_equity else 0
+    }
+
+
+def ratio_arrays(summary):
+    # ratio_values over NumPy arrays (one element per scenario or period), with the same zero rules
+    summary = {key: np.asarray(value, dtype=np.float64) for key, value in summary.items()}
+
+    def ratio(numerator, denominator, when_zero):
+        safe = np.where(denominator != 0, denominator, 1.0)
+        return np.where(denominator != 0, numerator / safe, when_zero)
+
+    current_liabilities = summary["current_liabilities"]
+    total_equity = summary["total_equity"]
+    total_assets = summary["total_assets"]
+    revenue = summary["revenue"]
+    net_income = summary["net_income"]
+    return {
+        "Current Ratio": ratio(summary["current_assets"], current_liabilities, np.inf),
+        "Quick Ratio": ratio(summary["current_assets"] - summary["inventory"], current_liabilities, np.inf),
+        "Debt to Equity": ratio(summary["total_liabilities"], total_equity, np.inf),
+        "Debt to Assets": ratio(summary["total_liabilities"], total_assets, 0.0),
+        "Net Profit Margin": ratio(net_income, revenue, 0.0) * 100,
+        "Return on Assets": ratio(net_income, total_assets, 0.0) * 100,
+        "Return on Equity": ratio(net_income, total_equity, 0.0) * 100
+    }
+
+
+class LedgerStore:
+    """Transactions addressed by stable id, persisted as a snapshot plus an append-only journal.
+
+    Every commit appends one journal line under a file lock, so edits and deletes are O(1)
+    and sessions never overwrite each other's changes. Deleted slots become tombstones;
+    both the slot list and the snapshot are compacted lazily once enough garbage builds up.
+
+    Journal lines double as undo deltas: each carries the before/after image of the one
+    transaction it touched, and undo/redo are journal lines of their own carrying the change
+    they make, so every process replays the same history. The undo stack is trimmed to
+    ``history_budget`` bytes; a process whose budget dropped a delta still replays its undo.
+
+    Every posting carries the integer ``account_id`` of its chart-of-accounts entry; ledgers
+    written before the registry existed are given ids on load, the same in every process.
+
+    Unless ``audit`` is False, every change committed here is also appended to an audit trail
+    (see audit.py) that is never compacted, with who made it and a digest of the ledger after it.
+
+    A ``read_only`` store loads the snapshot and journal under a shared lock and never writes:
+    no migration rewrite, no journal, lock or archive files. Committing through it raises.
+    """
+
+    def __init__(self, path, view_builders=None, history_budget=HISTORY_BUDGET_BYTES, audit=True, read_only=False):
+        self.path = path
+        self.read_only = read_only
+        base = os.path.splitext(path)[0]
+        self.base = base
+        self.journal_path = base + ".journal.jsonl"
+        self.lock_path = base + ".lock"
+        self.view_builders = dict(view_builders or {})
+        self.history_budget = history_budget
+        self.audit = AuditTrail(base) if audit else None
+        if audit:
+            self.view_builders[AUDIT_STATE_VIEW] = StateDigest.build
+        self.version = 0
+        self._lock = threading.RLock()
+        self._reset()
+        self.refresh()
+
+    def _reset(self):
+        self._clear_transactions()
+        self.accounts = AccountRegistry()
+        self.migrated = False
+        self.next_id = 1
+        self.snapshot_stamp = None
+        self.journal_offset = 0
+        self.journal_entries = 0
+        self.seq = 0                # sequence number of the last recorded change
+        self.undo_stack = deque()   # (size in bytes, delta), oldest first
+        self.redo_stack = []
+        self.history_bytes = 0
+
+    def _clear_transactions(self):
+        self.slots = []             # slot -> transaction, None for a tombstone
+        self.slot_of = {}           # transaction id -> slot
+        self.deleted_slots = {}     # transaction id -> its tombstone, so undo restores in place
+        self.tombstones = 0
+        self.views = {}
+
+    # ---------- Reading ----------
+    def __len__(self):
+        return len(self.slot_of)
+
+    def __bool__(self):
+        return bool(self.slot_of)
+
+    def __contains__(self, txn_id):
+        return txn_id in self.slot_of
+
+    def __iter__(self):
+        return (txn for txn in self.slots if txn is not None)
+
+    def items(self):
+        return ((txn["id"], txn) for txn in self.slots if txn is not None)
+
+    def get(self, txn_id):
+        slot = self.slot_of.get(txn_id)
+        return None if slot is None else self.slots[slot]
+
+    def chunks(self, size):
+        # Transactions in ledger order, `size` at a time. Each chunk is read under the lock and commits can
+        # land in between; after a compaction or reload it resumes after the last transaction handed out.
+        slots, position, last_id = None, 0, None
+        while True:
+            with self._lock:
+                if self.slots is not slots:
+                    position = 0 if slots is None else self._slot_after(last_id)
+                    slots = self.slots
+                chunk = [txn for txn in slots[position:position + size] if txn is not None]
+                position += size
+                done = position >= len(slots)
+            if chunk:
+                last_id = chunk[-1]["id"]
+                yield chunk
+            if done:
+                return
+
+    def _slot_after(self, txn_id):
+        if txn_id is None:
+            return 0
+        if txn_id in self.slot_of:
+            return self.slot_of[txn_id] + 1
+        # Deleted meanwhile: ids are handed out in ledger order, so carry on from the next higher one
+        return next((slot for slot, txn in enumerate(self.slots) if txn is not None and txn["id"] > txn_id), len(self.slots))
+
+    def recent(self, count):
+        found = []
+        for txn in reversed(self.slots):
+            if len(found) == count:
+                break
+            if txn is not None:
+                found.append(txn)
+        return found[::-1]
+
+    def view(self, name):
+        # Derived structures (search index, totals, ...) built once, then updated on every commit
+        with self._lock:
+            if name not in self.views:
+                self.views[name] = self.view_builders[name](self.items())
+            return self.views[name]
+
+    @contextmanager
+    def reading(self):
+        # Holds off commits from other threads while a caller reads several views together
+        with self._lock:
+            yield self
+
+    def peek_undo(self):
+        return self.undo_stack[-1][1] if self.undo_stack else None
+
+    def peek_redo(self):
+        return self.redo_stack[-1][1] if self.redo_stack else None
+
+    @contextmanager
+    def committed(self):
+        # Caught up with every process and holding off their commits, e.g. to check the files against each other
+        with self._file_lock():
+            self._sync()
+            yield self
+
+    # ---------- Persistence ----------
+    @contextmanager
+    def _file_lock(self):
+        with self._lock:
+            if self.read_only:
+                with self._shared_lock():
+                    yield
+                return
+            if fcntl is None:
+                yield
+                return
+            with open(self.lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    @contextmanager
+    def _shared_lock(self):
+        # Keeps writers from swapping the snapshot and truncating the journal between the two reads;
+        # without a lock file no writer has opened this ledger yet
+        if fcntl is None or not os.path.exists(self.lock_path):
+            yield
+            return
+        with open(self.lock_path, "r") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _snapshot_stamp(self):
+        if not os.path.exists(self.path):
+            return None
+        stat = os.stat(self.path)
+        return (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+
+    def refresh(self):
+        # Cheap when nothing changed: one stat plus reading any journal lines written by others
+        with self._file_lock():
+            self._sync()
+
+    def _sync(self):
+        stamp = self._snapshot_stamp()
+        if stamp != self.snapshot_stamp:
+            self._load_snapshot(stamp)
+        self._read_journal()
+        if self.migrated and not self.read_only:
+            # Persist ids given to old postings once, rather than on every load
+            self._write_snapshot()
+
+    def _load_snapshot(self, stamp):
+        self._reset()
+        data = {}
+        if stamp is not None:
+            with open(self.path, "r") as f:
+                data = json.load(f)
+
+        # A snapshot with a chart of accounts keyed by classification was written from fully resolved
+        # postings; an older chart could file one name under another classification's account
+        chart = data.get("chart_of_accounts", {})
+        self.accounts = AccountRegistry.from_dict(chart)
+        self._load_transactions(
+            data.get("submitted_transactions", []), data.get("next_id", 1),
+            resolved=chart.get("classified", False)
+        )
+        if chart and not chart.get("classified", False):
+            self.migrated = True
+        self.seq = data.get("seq", 0)
+        history = data.get("history", {})
+        for delta in history.get("undo", []):
+            self._push_undo(delta, len(json.dumps(delta)))
+        self.redo_stack = [(len(json.dumps(delta)), delta) for delta in history.get("redo", [])]
+        self.snapshot_stamp = stamp
+        self.version += 1
+
+    def _load_transactions(self, transactions, next_id=1, resolved=False):
+        # Files written before ids existed get positional ids, identical in every session
+        next_id = max([txn.get("id", 0) for txn in transactions] + [next_id - 1, self.next_id - 1]) + 1
+        for txn in transactions:
+            if "id" not in txn:
+                txn["id"] = next_id
+                next_id += 1
+            if not resolved:
+                self._observe_accounts(txn)
+            self.slot_of[txn["id"]] = len(self.slots)
+            self.slots.append(txn)
+        self.next_id = next_id
+
+    def _observe_accounts(self, txn):
+        # Postings from before the chart of accounts, or filed under an account of another classification,
+        # are resolved in ledger order, so ids match everywhere
+        if any("account_id" not in acc or self.accounts.misfiled(acc) for acc in txn["accounts"]):
+            self.accounts.reassign(txn)
+            self.migrated = True
+        self.accounts.observe(txn)
+
+    def _read_journal(self):
+        if not os.path.exists(self.journal_path):
+            return
+        with open(self.journal_path, "rb") as f:
+            f.seek(self.journal_offset)
+            data = f.read()
+        # A trailing partial line is an append still in progress; pick it up next time
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line), len(line))
+        self.journal_offset += end
+
+    def _apply(self, entry, size):
+        # Undo and redo lines carry the change they make, so every process replays them the same way
+        # whatever its own history budget has kept; the local stacks only follow along when they can
+        op = entry["op"]
+        if op == "undo":
+            delta = entry["delta"]
+            self._apply_change(entry["change"])
+            if self.undo_stack and self.undo_stack[-1][1]["seq"] == delta["seq"]:
+                size = self.undo_stack.pop()[0]
+                self.history_bytes -= size
+            else:
+                size = len(json.dumps(delta))
+            self.redo_stack.append((size, delta))
+        elif op == "redo":
+            delta = entry["change"]
+            self._apply_change(delta)
+            if self.redo_stack and self.redo_stack[-1][1]["seq"] == delta["seq"]:
+                size = self.redo_stack.pop()[0]
+            else:
+                size = len(json.dumps(delta))
+            self._push_undo(delta, size)
+        else:
+            self._apply_change(entry)
+            self.seq = entry["seq"]
+            self._discard_redo()
+            self._push_undo(entry, size)
+        self.journal_entries += 1
+        self.version += 1
+
+    def _apply_change(self, change):
+        op, txn_id = change["op"], change["id"]
+        if op == "merge":
+            self.accounts.merge(txn_id, change["into"])
+        elif op == "unmerge":
+            self.accounts.unmerge(txn_id)
+        elif op in ("add", "restore"):
+            txn = change["txn"]
+            self._observe_accounts(txn)
+            slot = self.deleted_slots.pop(txn_id, None)
+            if slot is not None and self.slots[slot] is None:
+                self.slots[slot] = txn
+                self.tombstones -= 1
+            else:
+                slot = len(self.slots)
+                self.slots.append(txn)
+            self.slot_of[txn_id] = slot
+            self.next_id = max(self.next_id, txn_id + 1)
+            for view in self.views.values():
+                view.add(txn_id, txn)
+        elif op == "replace" and txn_id in self.slot_of:
+            slot = self.slot_of[txn_id]
+            old, txn = self.slots[slot], change["txn"]
+            self._observe_accounts(txn)
+            self.slots[slot] = txn
+            for view in self.views.values():
+                view.remove(txn_id, old)
+                view.add(txn_id, txn)
+        elif op == "delete" and txn_id in self.slot_of:
+            slot = self.slot_of.pop(txn_id)
+            old = self.slots[slot]
+            self.slots[slot] = None
+            self.deleted_slots[txn_id] = slot
+            self.tombstones += 1
+            for view in self.views.values():
+                view.remove(txn_id, old)
+            if self.tombstones > TOMBSTONE_COMPACT_MIN and self.tombstones > len(self.slots) // 2:
+                self._compact_slots()
+
+    def _compact_slots(self):
+        self.slots = [txn for txn in self.slots if txn is not None]
+        self.slot_of = {txn["id"]: slot for slot, txn in enumerate(self.slots)}
+        self.deleted_slots = {}
+        self.tombstones = 0
+
+    def _push_undo(self, delta, size):
+        self.undo_stack.append((size, delta))
+        self.history_bytes += size
+        while self.history_bytes > self.history_budget and self.undo_stack:
+            size, dropped = self.undo_stack.popleft()
+            self.history_bytes -= size
+            self._drop_archive(dropped)
+
+    def _discard_redo(self):
+        for _, delta in self.redo_stack:
+            self._drop_archive(delta)
+        self.redo_stack = []
+
+    def _drop_archive(self, delta):
+        # Every process replaying the same history gets here; the first one removes the file
+        if delta["op"] == "clear" and not self.read_only:
+            try:
+                os.remove(delta["archive"])
+            except FileNotFoundError:
+                pass
+
+    def _append(self, *entries):
+        # Several entries go out in one write, so a batch lands in the journal together
+        if self.read_only:
+            raise PermissionError(f"{self.path} was opened read-only")
+        lines = [(json.dumps(entry) + "\n").encode() for entry in entries]
+        records = self._audit_records()
+        with open(self.journal_path, "ab") as f:
+            f.write(b"".join(lines))
+        for entry, line in zip(entries, lines):
+            change = self._audit_change(entry)
+            self.journal_offset += len(line)
+            self._apply(entry, len(line) - 1)
+            self._audit_record(records, change)
+        self._audit_commit(records)
+        if self.journal_entries > max(JOURNAL_COMPACT_MIN, len(self)):
+            self._write_snapshot()
+
+    def _write_snapshot(self):
+        self._compact_slots()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            # dumps() takes the C encoder; dump() to a file falls back to the pure-Python one
+            f.write(json.dumps({
+                "next_id": self.next_id,
+                "seq": self.seq,
+                "chart_of_accounts": self.accounts.to_dict(),
+                "history": {
+                    "undo": [delta for _, delta in self.undo_stack],
+                    "redo": [delta for _, delta in self.redo_stack]
+                },
+                "submitted_transactions": self.slots
+            }))
+        os.replace(tmp_path, self.path)
+        open(self.journal_path, "w").close()
+        self.migrated = False
+        self.snapshot_stamp = self._snapshot_stamp()
+        self.journal_offset = 0
+        self.journal_entries = 0
+
+    # ---------- Audit ----------
+    def _audit_records(self):
+        # None when not auditing; a new trail opens with the state it found, so its first change can be checked
+        if self.audit is None:
+            return None
+        if not self.audit.is_empty():
+            return []
+        return [({"op": "start"}, self.view(AUDIT_STATE_VIEW).hex(), len(self))]
+
+    def _audit_change(self, entry):
+        # Undo and redo lines are recorded with the change they make, so the trail reads on its own
+        if entry["op"] in ("undo", "redo"):
+            return {"op": entry["op"], "seq": entry["seq"], "change": entry["change"]}
+        return entry
+
+    def _audit_record(self, records, change):
+        if records is not None:
+            records.append((change, self.view(AUDIT_STATE_VIEW).hex(), len(self)))
+
+    def _audit_commit(self, records):
+        if records:
+            self.audit.append(records)
+
+    # ---------- Commits ----------
+    def _with_account_ids(self, txn, txn_id):
+        # Resolved under the lock, after catching up, so two sessions never mint the same account id
+        txn = dict(txn, id=txn_id, accounts=[dict(acc) for acc in txn["accounts"]])
+        self.accounts.assign(txn)
+        return txn
+
+    def add(self, txn):
+        with self._file_lock():
+            self._sync()
+            txn = self._with_account_ids(txn, self.next_id)
+            self._append({"op": "add", "id": txn["id"], "txn": txn, "seq": self.seq + 1})
+        return txn["id"]
+
+    def add_many(self, txns):
+        # One lock, one catch-up and one journal write for the whole batch; each add is still its own undo step
+        with self._file_lock():
+            self._sync()
+            entries = []
+            for offset, txn in enumerate(txns):
+                txn = self._with_account_ids(txn, self.next_id + offset)
+                entries.append({"op": "add", "id": txn["id"], "txn": txn, "seq": self.seq + 1 + offset})
+            if entries:
+                self._append(*entries)
+        return [entry["id"] for entry in entries]
+
+    def replace(self, txn_id, txn):
+        # False when another session deleted the transaction first
+        with self._file_lock():
+            self._sync()
+            if txn_id not in self.slot_of:
+                return False
+            self._append({
+                "op": "replace", "id": txn_id, "txn": self._with_account_ids(txn, txn_id),
+                "before": self.get(txn_id), "seq": self.seq + 1
+            })
+        return True
+
+    def delete(self, txn_id):
+        with self._file_lock():
+            self._sync()
+            if txn_id not in self.slot_of:
+                return False
+            self._append({"op": "delete", "id": txn_id, "before": self.get(txn_id), "seq": self.seq + 1})
+        return True
+
+    def merge_accounts(self, alias_id, target_id):
+        # Postings keep their ids; the alias just resolves to the target from now on
+        with self._file_lock():
+            self._sync()
+            alias = self.accounts.accounts.get(alias_id)
+            target_id = self.accounts.canonical_id(target_id)
+            if alias is None or alias["merged_into"] is not None or target_id == alias_id \
+                    or target_id not in self.accounts.accounts:
+                return False
+            self._append({"op": "merge", "id": alias_id, "into": target_id, "seq": self.seq + 1})
+        return True
+
+    def clear(self):
+        # The cleared ledger is moved to an archive file rather than kept as a delta
+        with self._file_lock():
+            self._sync()
+            records = self._audit_records()
+            self.seq += 1
+            archive = f"{self.base}.reset-{self.seq}.json"
+            with open(archive, "w") as f:
+                json.dump({"submitted_transactions": list(self)}, f)
+            self._clear_transactions()
+            self._discard_redo()
+            delta = {"op": "clear", "archive": archive, "seq": self.seq}
+            self._push_undo(delta, len(json.dumps(delta)))
+            self._write_snapshot()
+            self.version += 1
+            self._audit_record(records, delta)
+            self._audit_commit(records)
+
+    def undo(self, expected_seq=None):
+        # False when the latest change is no longer the one the caller was shown
+        with self._file_lock():
+            self._sync()
+            delta = self.peek_undo()
+            if delta is None or (expected_seq is not None and delta["seq"] != expected_seq):
+                return False
+            if delta["op"] == "clear":
+                records = self._audit_records()
+                size, delta = self.undo_stack.pop()
+                self.history_bytes -= size
+                with open(delta["archive"], "r") as f:
+                    self._load_transactions(json.load(f)["submitted_transactions"])
+                self.views = {}
+                self.redo_stack.append((size, delta))
+                self._write_snapshot()
+                self.version += 1
+                change = {"op": "restore-archive", "archive": delta["archive"]}
+                self._audit_record(records, {"op": "undo", "seq": delta["seq"], "change": change})
+                self._audit_commit(records)
+            else:
+                self._append({"op": "undo", "seq": delta["seq"], "change": inverse_change(delta), "delta": delta})
+        return True
+
+    def redo(self, expected_seq=None):
+        with self._file_lock():
+            self._sync()
+            delta = self.peek_redo()
+            if delta is None or (expected_seq is not None and delta["seq"] != expected_seq):
+                return False
+            if delta["op"] == "clear":
+                # The archive written by the original reset still holds these transactions
+                records = self._audit_records()
+                size, delta = self.redo_stack.pop()
+                self._clear_transactions()
+                self._push_undo(delta, size)
+                self._write_snapshot()
+                self.version += 1
+                self._audit_record(records, {"op": "redo", "seq": delta["seq"], "change": delta})
+                self._audit_commit(records)
+            else:
+                self._append({"op": "redo", "seq": delta["seq"], "change": delta})
+        return True
+
+
+def inverse_change(delta):
+    op, txn_id = delta["op"], delta["id"]
+    if op == "add":
+        return {"op": "delete", "id": txn_id}
+    if op == "merge":
+        return {"op": "unmerge", "id": txn_id}
+    if op == "delete":
+        return {"op": "restore", "id": txn_id, "txn": delta["before"]}
+    return {"op": "replace", "id": txn_id, "txn": delta["before"]}
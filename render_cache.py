@@ -0,0 +1,65 @@
+# --- Render Cache: figures and tables reused until the ledger changes ---
+import pickle
+import threading
+from collections import OrderedDict
+
+RENDER_CACHE_BUDGET_BYTES = 32 * 1024 * 1024
+
+
+class RenderCache:
+    """Least-recently-used renders keyed by (name, ledger version, view parameters).
+
+    The ledger version goes up on every change, so an entry can never be served stale; entries
+    for older versions are simply never asked for again and fall off the end once the cache
+    holds more than ``budget`` bytes. Shared by every session in the process, so renders are
+    kept pickled: each hit hands out its own copy, and an entry's size is its payload's length.
+    """
+
+    def __init__(self, budget=RENDER_CACHE_BUDGET_BYTES):
+        self.budget = budget
+        self.entries = OrderedDict()    # key -> pickled render, least recently used first
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, name, version, build, *params):
+        key = (name, version) + params
+        with self._lock:
+            payload = self.entries.get(key)
+            if payload is not None:
+                self.entries.move_to_end(key)
+                self.hits += 1
+            else:
+                self.misses += 1
+        if payload is not None:
+            return pickle.loads(payload)
+        # Built outside the lock; two sessions missing together both build and the last one is kept
+        value = build()
+        self._put(key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        return value
+
+    def _put(self, key, payload):
+        with self._lock:
+            old = self.entries.pop(key, None)
+            if old is not None:
+                self.bytes -= len(old)
+            if len(payload) > self.budget:
+                return
+            self.entries[key] = payload
+            self.bytes += len(payload)
+            while self.bytes > self.budget:
+                _, dropped = self.entries.popitem(last=False)
+                self.bytes -= len(dropped)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "budget": self.budget
+            }
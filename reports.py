@@ -0,0 +1,79 @@
+# --- Financial Reports as plain data (used by the HTTP API) ---
+import math
+
+from accounts import sub_classification_options
+from cash_flow import ACTIVITIES, CASH_LINE_ITEM
+from ledger import ratio_values
+
+
+def statement_section(account_totals, acc_type, sub, absolute=False):
+    lines = [
+        {"account": name, "line_item": line_item, "amount": abs(amount) if absolute else amount}
+        for (t, s, line_item, name), amount in account_totals.items()
+        if t == acc_type and s == sub
+    ]
+    return {"lines": lines, "total": sum(line["amount"] for line in lines)}
+
+
+def balance_sheet(totals, accounts):
+    # Same figures as the Balance Sheet tab: retained earnings are incomes less absolute expenses
+    account_totals = totals.statement_totals(accounts)
+    assets = {sub: statement_section(account_totals, "Asset", sub) for sub in sub_classification_options["Asset"]}
+    liabilities = {sub: statement_section(account_totals, "Liability", sub) for sub in sub_classification_options["Liability"]}
+    total_assets = sum(section["total"] for section in assets.values())
+    total_liabilities = sum(section["total"] for section in liabilities.values())
+
+    capital = statement_section(account_totals, "Equity", "Capital")["total"]
+    retained_earnings = (
+        statement_section(account_totals, "Equity", "Incomes")["total"]
+        - statement_section(account_totals, "Equity", "Expenses", absolute=True)["total"]
+    )
+    total_equity = capital + retained_earnings
+    return {
+        "assets": assets,
+        "total_assets": total_assets,
+        "liabilities": liabilities,
+        "total_liabilities": total_liabilities,
+        "equity": {"capital": capital, "retained_earnings": retained_earnings},
+        "total_equity": total_equity,
+        "total_liabilities_and_equity": total_liabilities + total_equity,
+        "balanced": abs(total_assets - (total_liabilities + total_equity)) < 0.01
+    }
+
+
+def income_statement(totals, accounts):
+    account_totals = totals.statement_totals(accounts)
+    revenue = statement_section(account_totals, "Equity", "Incomes")
+    expenses = statement_section(account_totals, "Equity", "Expenses", absolute=True)
+    return {
+        "revenue": revenue["lines"],
+        "total_revenue": revenue["total"],
+        "expenses": expenses["lines"],
+        "total_expenses": expenses["total"],
+        "net_income": revenue["total"] - expenses["total"]
+    }
+
+
+def cash_flow_statement(lines, totals):
+    # `lines` as from CashFlowIndex.statement() or fx.report_cash_flow()
+    activities = {
+        activity: {
+            "lines": [{"label": label, "amount": amount} for label, amount in lines[activity]],
+            "total": sum(amount for _, amount in lines[activity])
+        }
+        for activity in ACTIVITIES
+    }
+    return {
+        "method": "direct",
+        "activities": activities,
+        "net_change_in_cash": sum(activity["total"] for activity in activities.values()),
+        "closing_cash": totals.total("Asset", line_item=CASH_LINE_ITEM)
+    }
+
+
+def ratios(totals):
+    # JSON has no infinity; an undefined ratio is null
+    return {
+        name: None if math.isinf(value) else value
+        for name, value in ratio_values(totals.summary()).items()
+    }
@@ -0,0 +1,76 @@
+# --- What-If Scenarios: Monte Carlo shocks to the ratio inputs ---
+# Each shock is drawn from a normal distribution (mean, standard deviation; a deviation of 0 fixes it) and
+# applied as a balanced entry against cash, so every simulated balance sheet still balances:
+#   revenue / expense change  % of the ledger's revenue / expenses, settled in cash
+#   inventory writedown       % of inventory, booked as an expense
+#   new borrowing             cash in, short- or long-term borrowings up
+import re
+
+import numpy as np
+
+from ledger import ratio_arrays
+
+SHOCKS = {
+    "revenue_pct": "Revenue change (%)",
+    "expense_pct": "Expense change (%)",
+    "inventory_writedown_pct": "Inventory writedown (%)",
+    "short_term_borrowing": "New short-term borrowing",
+    "long_term_borrowing": "New long-term borrowing"
+}
+PERCENTILES = (5, 50, 95)
+HISTOGRAM_BINS = 40
+
+
+def simulate(summary, shocks, runs=10_000, seed=0):
+    # Ratio name -> array of `runs` simulated values, all drawn and computed in one batch
+    rng = np.random.default_rng(seed)
+
+    def draw(key):
+        mean, deviation = shocks.get(key, (0.0, 0.0))
+        return mean + deviation * rng.standard_normal(runs) if deviation else np.full(runs, float(mean))
+
+    revenue = summary["revenue"] * (1 + draw("revenue_pct") / 100)
+    expenses = summary["total_expenses"] * (1 + draw("expense_pct") / 100)
+    writedown = summary["inventory"] * np.clip(draw("inventory_writedown_pct"), 0, 100) / 100
+    short_term, long_term = draw("short_term_borrowing"), draw("long_term_borrowing")
+    cash_change = (revenue - summary["revenue"]) - (expenses - summary["total_expenses"]) + short_term + long_term
+    expenses = expenses + writedown
+
+    return ratio_arrays({
+        "current_assets": summary["current_assets"] + cash_change - writedown,
+        "inventory": summary["inventory"] - writedown,
+        "total_assets": summary["total_assets"] + cash_change - writedown,
+        "current_liabilities": summary["current_liabilities"] + short_term,
+        "total_liabilities": summary["total_liabilities"] + short_term + long_term,
+        "total_equity": summary["total_equity"],
+        "revenue": revenue,
+        "net_income": revenue - expenses
+    })
+
+
+def parse_threshold(band):
+    # "< 1.0" or "> 10%" -> ("<", 1.0); None for a range such as "1.0 - 1.5"
+    match = re.fullmatch(r"\s*([<>])\s*(-?[\d.]+)\s*%?\s*", band)
+    return (match.group(1), float(match.group(2))) if match else None
+
+
+def breach_probability(values, threshold):
+    op, limit = threshold
+    return float(np.mean(values < limit if op == "<" else values > limit))
+
+
+def summarise(simulated, thresholds):
+    # Per ratio: percentiles, share undefined (infinite), breach probability and a pre-binned histogram
+    results = {}
+    for name, values in simulated.items():
+        finite = values[np.isfinite(values)]
+        counts, edges = np.histogram(finite, bins=HISTOGRAM_BINS) if len(finite) else (np.zeros(0), np.zeros(1))
+        threshold = thresholds.get(name)
+        results[name] = {
+            "percentiles": dict(zip(PERCENTILES, np.percentile(values, PERCENTILES, method="lower").tolist())),
+            "infinite": float(np.mean(np.isinf(values))),
+            "threshold": threshold,
+            "breach": breach_probability(values, threshold) if threshold else None,
+            "histogram": (counts.tolist(), edges.tolist())
+        }
+    return results
@@ -0,0 +1,193 @@
+# --- Inverted Index for Transaction Search ---
+import heapq
+import re
+from bisect import bisect_left, bisect_right, insort
+
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+")
+CHUNK_SIZE = 512
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class SortedChunks:
+    """Sorted list held as chunks of CHUNK_SIZE to 2 * CHUNK_SIZE values, so an insert or delete shifts one chunk."""
+
+    def __init__(self, values=()):
+        values = sorted(values)
+        self.chunks = [values[i:i + CHUNK_SIZE] for i in range(0, len(values), CHUNK_SIZE)]
+        self.maxes = [chunk[-1] for chunk in self.chunks]
+
+    def add(self, value):
+        if not self.chunks:
+            self.chunks, self.maxes = [[value]], [value]
+            return
+        i = min(bisect_left(self.maxes, value), len(self.chunks) - 1)
+        chunk = self.chunks[i]
+        insort(chunk, value)
+        self.maxes[i] = chunk[-1]
+        if len(chunk) > 2 * CHUNK_SIZE:
+            self.chunks[i:i + 1] = [chunk[:CHUNK_SIZE], chunk[CHUNK_SIZE:]]
+            self.maxes[i:i + 1] = [chunk[CHUNK_SIZE - 1], chunk[-1]]
+
+    def remove(self, value):
+        i = bisect_left(self.maxes, value)
+        chunk = self.chunks[i]
+        del chunk[bisect_left(chunk, value)]
+        if chunk:
+            self.maxes[i] = chunk[-1]
+        else:
+            del self.chunks[i], self.maxes[i]
+
+    def irange(self, low, high):
+        # Values from low to high inclusive, in order
+        for i in range(bisect_left(self.maxes, low), len(self.chunks)):
+            chunk = self.chunks[i]
+            if chunk[0] > high:
+                return
+            yield from chunk[bisect_left(chunk, low):bisect_right(chunk, high)]
+
+
+class TransactionSearchIndex:
+    """Token -> transaction id postings, kept up to date on every commit."""
+
+    def __init__(self):
+        self.postings = {}          # token -> set of transaction ids
+        self.sorted_tokens = []     # every indexed token, for prefix lookups
+        self.by_type = {}           # account type -> set of transaction ids
+        self.amounts = SortedChunks()   # sorted (abs amount, transaction id) pairs
+        self.entries = {}           # transaction id -> what was indexed, for removal
+
+    def __len__(self):
+        return len(self.entries)
+
+    @classmethod
+    def build(cls, items):
+        # Bulk load (txn_id, txn) pairs, sorting the lookup lists once at the end
+        index = cls()
+        pairs = []
+        for txn_id, txn in items:
+            tokens, types, amounts = index._entry(txn)
+            for token in tokens:
+                index.postings.setdefault(token, set()).add(txn_id)
+            for acc_type in types:
+                index.by_type.setdefault(acc_type, set()).add(txn_id)
+            pairs.extend((amount, txn_id) for amount in amounts)
+            index.entries[txn_id] = (tokens, types, amounts)
+        index.sorted_tokens = sorted(index.postings)
+        index.amounts = SortedChunks(pairs)
+        return index
+
+    @staticmethod
+    def _entry(txn):
+        text = " ".join([txn.get("description", "")] + [acc["name"] for acc in txn["accounts"]])
+        tokens = set(tokenize(text))
+        types = {acc["type"] for acc in txn["accounts"]}
+        amounts = {abs(acc["amount"]) for acc in txn["accounts"]}
+        return tokens, types, amounts
+
+    # ---------- Maintenance ----------
+    def add(self, txn_id, txn):
+        if txn_id in self.entries:
+            self.remove(txn_id, txn)
+
+        tokens, types, amounts = self._entry(txn)
+        for token in tokens:
+            ids = self.postings.get(token)
+            if ids is None:
+                ids = self.postings[token] = set()
+                insort(self.sorted_tokens, token)
+            ids.add(txn_id)
+        for acc_type in types:
+            self.by_type.setdefault(acc_type, set()).add(txn_id)
+        for amount in amounts:
+            self.amounts.add((amount, txn_id))
+
+        self.entries[txn_id] = (tokens, types, amounts)
+
+    def remove(self, txn_id, txn=None):
+        entry = self.entries.pop(txn_id, None)
+        if entry is None:
+            return
+        tokens, types, amounts = entry
+
+        for token in tokens:
+            ids = self.postings[token]
+            ids.discard(txn_id)
+            if not ids:
+                del self.postings[token]
+                del self.sorted_tokens[bisect_left(self.sorted_tokens, token)]
+        for acc_type in types:
+            self.by_type[acc_type].discard(txn_id)
+        for amount in amounts:
+            self.amounts.remove((amount, txn_id))
+
+    # ---------- Queries ----------
+    def prefix_range(self, prefix):
+        return (
+            bisect_left(self.sorted_tokens, prefix),
+            bisect_left(self.sorted_tokens, prefix + "\uffff")
+        )
+
+    def prefix_width(self, prefix):
+        start, end = self.prefix_range(prefix)
+        return end - start
+
+    def match_prefix(self, prefix):
+        start, end = self.prefix_range(prefix)
+        if end - start == 1:
+            return self.postings[self.sorted_tokens[start]]
+        matched = set()
+        for token in self.sorted_tokens[start:end]:
+            matched |= self.postings[token]
+        return matched
+
+    def match_amount(self, min_amount=None, max_amount=None):
+        low = (float("-inf") if min_amount is None else min_amount, float("-inf"))
+        high = (float("inf") if max_amount is None else max_amount, float("inf"))
+        return {txn_id for _, txn_id in self.amounts.irange(low, high)}
+
+    def search(self, query="", account_types=None, min_amount=None, max_amount=None, limit=None):
+        # (number of matches, matching ids newest first); with a limit only the newest are picked, the rest never sorted
+        result = self.match(query, account_types, min_amount, max_amount)
+        if limit is None:
+            return len(result), sorted(result, reverse=True)
+        return len(result), heapq.nlargest(limit, result)
+
+    def match(self, query="", account_types=None, min_amount=None, max_amount=None):
+        # Every query term is a prefix and terms are ANDed together. Only the narrowest
+        # term is expanded through the postings; the other terms and the type and amount
+        # filters are checked against the surviving transactions.
+        terms = sorted(set(tokenize(query)), key=self.prefix_width)
+        amount_filter = min_amount is not None or max_amount is not None
+
+        if terms:
+            result = set(self.match_prefix(terms[0]))
+            for term in terms[1:]:
+                if not result:
+                    break
+                result = {
+                    txn_id for txn_id in result
+                    if any(token.startswith(term) for token in self.entries[txn_id][0])
+                }
+        elif account_types:
+            result = set().union(*(self.by_type.get(acc_type, ()) for acc_type in account_types))
+            account_types = None
+        elif amount_filter:
+            result = self.match_amount(min_amount, max_amount)
+            amount_filter = False
+        else:
+            return set()
+
+        if account_types:
+            wanted = set(account_types)
+            result = {txn_id for txn_id in result if self.entries[txn_id][1] & wanted}
+        if amount_filter:
+            low = float("-inf") if min_amount is None else min_amount
+            high = float("inf") if max_amount is None else max_amount
+            result = {
+                txn_id for txn_id in result
+                if any(low <= amount <= high for amount in self.entries[txn_id][2])
+            }
+        return result
@@ -0,0 +1,275 @@
+# --- Receivables and Payables Sub-ledger: open items by counterparty and due date ---
+# Postings to Trade Receivables and Trade Payables may carry a "counterparty" and a "due_date". A positive amount
+# opens an item: the counterparty owes it (receivables) or is owed it (payables). A negative amount is a settlement,
+# applied to that counterparty's open items oldest due date first. Open items are kept sorted by due date and their
+# amounts summed per due day, both updated on every commit, so the aging buckets are read off the due days rather
+# than the items, and a commit only moves the point where a touched counterparty's payments run out, opening or
+# closing just the items it passes.
+# Balances are per currency: a counterparty dealing in two currencies has two. A posting without a counterparty is
+# filed under UNASSIGNED, so the sub-ledger still adds up to its control account. Without a due date an item is due
+# on its transaction date, and an undated one is never overdue.
+from bisect import bisect_left, bisect_right, insort
+from collections import defaultdict
+from datetime import date
+from itertools import chain, islice
+
+import numpy as np
+import pandas as pd
+
+from accounts import posting_currency
+from fx import LATEST_DAY, day_ordinal
+
+SUBLEDGERS = {"Trade Receivables": "Receivables", "Trade Payables": "Payables"}
+SIDES = tuple(SUBLEDGERS.values())
+UNASSIGNED = "(no counterparty)"
+AGING_BUCKETS = ("Not Due", "0–30", "31–60", "61–90", "90+")
+AGING_EDGES = np.array([0, 31, 61, 91])     # days past due at which each bucket after "Not Due" starts
+OPEN_TOLERANCE = 0.005
+
+
+def posting_counterparty(acc):
+    return (acc.get("counterparty") or "").strip() or UNASSIGNED
+
+
+def posting_due_day(txn, acc):
+    return day_ordinal(acc.get("due_date") or txn.get("date"))
+
+
+def aging_bucket(due_days, as_of):
+    # Bucket index per due day (ordinals); undated items fall due on date.max, so they are never overdue
+    return np.searchsorted(AGING_EDGES, as_of - due_days, side="right")
+
+
+class CounterpartyAccount:
+    """One counterparty's items in one currency, and what has been paid against them."""
+
+    def __init__(self):
+        self.charges = []       # sorted (due day, transaction id, position)
+        self.items = {}         # (transaction id, position) -> (due day, amount charged)
+        self.open = {}          # (transaction id, position) -> (due day, amount still open), for open items only
+        self.charged = 0.0
+        self.settled = 0.0
+        self.paid = 0           # charges[:paid] are settled in full
+        self.covered = 0.0      # what those charges come to
+        self.partial = None     # charges[paid] as an item, the one the payments run out in
+        self.stale = set()      # items whose open amount is not yet re-applied
+
+    def balance(self):
+        # Negative when more was paid than charged: a credit not yet applied to any item
+        return self.charged - self.settled
+
+
+class OpenItemLedger:
+    """Receivables or payables: counterparty accounts, open items in due-date order and open amounts per due day."""
+
+    def __init__(self):
+        self.accounts = {}                      # (counterparty, currency) -> CounterpartyAccount
+        self.by_due = []                        # sorted (due day, counterparty, currency, transaction id, position)
+        self.due_totals = defaultdict(float)    # (currency, due day) -> amount open
+        self.building = False                   # while built from scratch, by_due is appended to and sorted once
+
+    def post(self, key, item, due, amount, sign):
+        account = self.accounts.setdefault(key, CounterpartyAccount())
+        if amount < 0:
+            account.settled -= sign * amount
+        elif sign > 0:
+            position = bisect_left(account.charges, (due,) + item)
+            account.charges.insert(position, (due,) + item)
+            account.items[item] = (due, amount)
+            account.charged += amount
+            if position < account.paid:
+                # Due before the payments ran out: counted as settled until reapply works back to it
+                account.paid += 1
+                account.covered += amount
+            account.stale.add(item)
+        else:
+            self._set_open(key, account, item, 0.0)
+            position = bisect_left(account.charges, (due,) + item)
+            del account.charges[position]
+            del account.items[item]
+            account.charged -= amount
+            if position < account.paid:
+                account.paid -= 1
+                account.covered -= amount
+            account.stale.discard(item)
+            if account.partial == item:
+                account.partial = None
+
+    def reapply(self, key):
+        # Settlements go to the earliest due items first. The point where they run out moves back while the settled
+        # charges come to more than was paid and forward while the next one is paid in full; only the charges it
+        # passes, the one it stops in and the ones posted or left partly paid since are touched.
+        account = self.accounts[key]
+        if not account.charges and abs(account.settled) < OPEN_TOLERANCE:
+            del self.accounts[key]
+            return
+        charges, touched = account.charges, account.stale
+        account.stale = set()
+        if account.partial is not None:
+            touched.add(account.partial)
+        while account.paid and account.covered - account.settled >= OPEN_TOLERANCE:
+            account.paid -= 1
+            due, *item = charges[account.paid]
+            account.covered -= account.items[tuple(item)][1]
+            touched.add(tuple(item))
+        while account.paid < len(charges):
+            due, *item = charges[account.paid]
+            amount = account.items[tuple(item)][1]
+            if account.covered + amount - account.settled >= OPEN_TOLERANCE:
+                break
+            account.covered += amount
+            account.paid += 1
+            touched.add(tuple(item))
+        if not account.paid:
+            account.covered = 0.0
+        frontier = charges[account.paid] if account.paid < len(charges) else None
+        account.partial = frontier[1:] if frontier else None
+        if frontier:
+            touched.add(account.partial)
+        for item in touched:
+            due, amount = account.items[item]
+            if frontier is None or (due,) + item < frontier:
+                amount = 0.0
+            elif (due,) + item == frontier:
+                amount -= max(account.settled - account.covered, 0.0)
+            self._set_open(key, account, item, amount)
+
+    def _set_open(self, key, account, item, amount):
+        old = account.open[item][1] if item in account.open else 0.0
+        if amount < OPEN_TOLERANCE:
+            amount = 0.0
+        if amount == old:
+            return
+        due = account.items[item][0]
+        entry = (due,) + key + item
+        if not old:
+            if self.building:
+                self.by_due.append(entry)
+            else:
+                insort(self.by_due, entry)
+        elif not amount:
+            del self.by_due[bisect_left(self.by_due, entry)]
+        if amount:
+            account.open[item] = (due, amount)
+        else:
+            del account.open[item]
+        cell = (key[1], due)
+        self.due_totals[cell] += amount - old
+        if abs(self.due_totals[cell]) < OPEN_TOLERANCE:
+            del self.due_totals[cell]
+
+
+class SubledgerIndex:
+    """Open-item ledgers for Trade Receivables and Trade Payables, kept up to date on every commit."""
+
+    def __init__(self):
+        self.sides = {side: OpenItemLedger() for side in SIDES}
+
+    @classmethod
+    def build(cls, items):
+        index = cls()
+        touched = set()
+        for txn_id, txn in items:
+            touched |= index._post(txn_id, txn, 1)
+        for subledger in index.sides.values():
+            subledger.building = True
+        index._reapply(touched)
+        for subledger in index.sides.values():
+            subledger.by_due.sort()
+            subledger.building = False
+        return index
+
+    def add(self, txn_id, txn):
+        self._reapply(self._post(txn_id, txn, 1))
+
+    def remove(self, txn_id, txn):
+        self._reapply(self._post(txn_id, txn, -1))
+
+    def _post(self, txn_id, txn, sign):
+        touched = set()
+        for pos, acc in enumerate(txn["accounts"]):
+            side = SUBLEDGERS.get(acc["line_item"])
+            if side is None:
+                continue
+            key = (posting_counterparty(acc), posting_currency(acc))
+            self.sides[side].post(key, (txn_id, pos), posting_due_day(txn, acc), acc["amount"], sign)
+            touched.add((side, key))
+        return touched
+
+    def _reapply(self, touched):
+        for side, key in touched:
+            self.sides[side].reapply(key)
+
+
+# ---------- Reports ----------
+def as_of_day(as_of=None):
+    return (as_of or date.today()).toordinal()
+
+
+def aging_summary(ledger, side, as_of=None):
+    # Open amount per currency and bucket, from the per-day totals: costs O(due days), not O(open items)
+    as_of = as_of_day(as_of)
+    with ledger.reading():
+        cells = list(ledger.view("subledger").sides[side].due_totals.items())
+    rows = []
+    for currency in sorted({currency for (currency, _), _ in cells}):
+        days = np.array([day for (cell_currency, day), _ in cells if cell_currency == currency], dtype=np.int64)
+        amounts = np.array([amount for (cell_currency, _), amount in cells if cell_currency == currency])
+        buckets = np.bincount(aging_bucket(days, as_of), weights=amounts, minlength=len(AGING_BUCKETS))
+        rows.append({"Currency": currency, **dict(zip(AGING_BUCKETS, buckets)), "Total Open": amounts.sum()})
+    return pd.DataFrame(rows, columns=["Currency", *AGING_BUCKETS, "Total Open"])
+
+
+def counterparty_balances(ledger, side, as_of=None):
+    # One row per counterparty and currency, largest balance first
+    as_of = as_of_day(as_of)
+    with ledger.reading():
+        subledger = ledger.view("subledger").sides[side]
+        keys = list(subledger.accounts)
+        balances = np.array([account.balance() for account in subledger.accounts.values()])
+        # Every open item into its counterparty's row, then each row's amounts into buckets in one go
+        counts = [len(account.open) for account in subledger.accounts.values()]
+        items = np.fromiter(
+            chain.from_iterable(due_amount for account in subledger.accounts.values() for due_amount in account.open.values()),
+            dtype=np.float64, count=2 * sum(counts)
+        ).reshape(-1, 2)
+    cells = np.repeat(np.arange(len(keys)), counts) * len(AGING_BUCKETS) + aging_bucket(items[:, 0].astype(np.int64), as_of)
+    buckets = np.bincount(cells, weights=items[:, 1], minlength=len(keys) * len(AGING_BUCKETS)).reshape(-1, len(AGING_BUCKETS))
+    table = pd.DataFrame(buckets, columns=list(AGING_BUCKETS))
+    table.insert(0, "Currency", [currency for _, currency in keys])
+    table.insert(0, "Counterparty", [counterparty for counterparty, _ in keys])
+    table["Open Items"] = np.array(counts, dtype=np.int64)
+    table["Unapplied Credit"] = np.maximum(-balances, 0.0) if len(keys) else 0.0
+    table["Balance"] = balances
+    return table.sort_values(["Balance", "Counterparty"], ascending=[False, True], ignore_index=True)
+
+
+def open_item_rows(ledger, side, as_of=None, counterparty=None, due_by=None, limit=None):
+    # Open items oldest due date first, straight off the due-date index; due_by (a date) stops at that due date
+    as_of = as_of_day(as_of)
+    rows = []
+    with ledger.reading():
+        subledger = ledger.view("subledger").sides[side]
+        if counterparty is None:
+            entries = subledger.by_due
+        else:
+            # Just this counterparty's accounts, one per currency
+            entries = sorted(
+                (due, name, currency) + item
+                for (name, currency), account in subledger.accounts.items() if name == counterparty
+                for item, (due, _) in account.open.items()
+            )
+        end = len(entries) if due_by is None else bisect_right(entries, (due_by.toordinal() + 1,))
+        for due, name, currency, txn_id, pos in islice(entries, end):
+            txn = ledger.get(txn_id)
+            amount = subledger.accounts[(name, currency)].open[(txn_id, pos)][1]
+            rows.append({
+                "Due Date": "" if due == LATEST_DAY else date.fromordinal(due).isoformat(),
+                "Days Overdue": 0 if due == LATEST_DAY else max(as_of - due, 0),
+                "Counterparty": name, "Currency": currency, "Open Amount": amount,
+                "Txn ID": txn_id, "Date": txn.get("date", ""), "Description": txn["description"]
+            })
+            if limit is not None and len(rows) == limit:
+                break
+    return rows
+
@@ -0,0 +1,41 @@
+import json
+
+from accounts import AccountRegistry
+from ledger import LedgerStore
+
+
+def posting(name, acc_type, sub, line_item, amount):
+    return {"name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": amount}
+
+
+def test_namesakes_with_different_classifications_stay_apart():
+    registry = AccountRegistry()
+    txn = {"accounts": [
+        posting("cash", "Asset", "Current Assets", "Cash and Cash Equivalents", 100.0),
+        posting("cash ", "Equity", "Capital", "Not Applicable", -100.0),
+        posting("Cash", "Asset", "Current Assets", "Cash and Cash Equivalents", 0.0),
+    ]}
+    registry.assign(txn)
+    asset, capital, alias = (acc["account_id"] for acc in txn["accounts"])
+    assert asset == alias != capital
+    assert registry.classification(asset)["type"] == "Asset"
+    assert registry.classification(capital)["type"] == "Equity"
+    # Namesakes are told apart in pickers, and the label leads back to the account
+    assert registry.label(asset) != registry.label(capital)
+    assert registry.find(registry.label(capital)) == capital
+
+
+def test_chart_without_classified_keys_is_repaired_on_load(tmp_path):
+    path = str(tmp_path / "ledger.json")
+    txn = {"id": 1, "date": "2026-01-05", "description": "capital", "accounts": [
+        dict(posting("cash", "Asset", "Current Assets", "Cash and Cash Equivalents", 500.0), account_id=1),
+        dict(posting("cash ", "Equity", "Capital", "Not Applicable", -500.0), account_id=1),
+    ]}
+    chart = {"accounts": [{"id": 1, "name": "cash", "type": "Asset", "sub": "Current Assets", "line_item": "Cash and Cash Equivalents"}]}
+    with open(path, "w") as f:
+        json.dump({"submitted_transactions": [txn], "chart_of_accounts": chart}, f)
+    store = LedgerStore(path)
+    ids = {acc["type"]: acc["account_id"] for acc in store.get(1)["accounts"]}
+    assert ids["Asset"] == 1 and ids["Equity"] != 1
+    with open(path) as f:
+        assert json.load(f)["chart_of_accounts"]["classified"]
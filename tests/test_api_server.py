@@ -0,0 +1,104 @@
+import pytest
+
+from api_server import MAX_BATCH_SIZE, MAX_PAGE_SIZE, APIError, dispatch, open_ledger
+
+CASH = {"name": "Cash", "type": "Asset", "sub": "Current Assets", "line_item": "Cash and Cash Equivalents"}
+CAPITAL = {"name": "Capital", "type": "Equity", "sub": "Capital", "line_item": "Not Applicable"}
+
+
+def entry(amount=100.0, **cash):
+    return {"date": "2026-02-01", "description": "capital", "accounts": [dict(CASH, amount=amount, **cash), dict(CAPITAL, amount=amount)]}
+
+
+@pytest.fixture
+def ledger(tmp_path):
+    ledger = open_ledger(str(tmp_path / "ledger.json"))
+    ledger.add_many([entry(float(n + 1)) for n in range(5)])
+    return ledger
+
+
+def call(ledger, method, path, query=None, body=None):
+    try:
+        return dispatch(ledger, method, path, query or {}, body)
+    except APIError as error:
+        return error.status, {"error": str(error)}
+
+
+@pytest.mark.parametrize("txn, message", [
+    ([], "transaction must be a JSON object"),
+    (dict(entry(), description=" "), "description is required"),
+    (dict(entry(), accounts=[]), "accounts must be a non-empty list"),
+    (dict(entry(), date="31/03/2024"), "date must be an ISO date"),
+    (entry(amount=0), "accounts[0].amount must be a non-zero number"),
+    (entry(amount=True), "accounts[0].amount must be a non-zero number"),
+    (dict(entry(), accounts=[dict(CASH, type="Asset", sub="Capital", amount=1.0)]), "accounts[0].sub must be one of"),
+    (entry(currency="usd"), "accounts[0].currency"),
+    (entry(counterparty="Acme"), "counterparty and due_date apply to"),
+])
+def test_invalid_transactions_are_refused_with_400(ledger, txn, message):
+    status, body = call(ledger, "POST", "/transactions", body=txn)
+    assert status == 400 and message in body["error"]
+    assert len(ledger) == 5
+
+
+def test_missing_things_are_404_and_wrong_methods_405(ledger):
+    assert call(ledger, "GET", "/transactions/99")[0] == 404
+    assert call(ledger, "PUT", "/transactions/99", body=entry())[0] == 404
+    assert call(ledger, "DELETE", "/transactions/99")[0] == 404
+    assert call(ledger, "GET", "/accounts/99/history")[0] == 404
+    assert call(ledger, "GET", "/nowhere")[0] == 404
+    assert call(ledger, "DELETE", "/accounts")[0] == 405
+
+
+def test_create_update_and_delete(ledger):
+    status, body = call(ledger, "POST", "/transactions/", body=entry(7.0))
+    assert status == 201 and body == {"id": 6}
+    status, body = call(ledger, "PUT", "/transactions/6", body=entry(8.0))
+    assert status == 200 and body["accounts"][0]["amount"] == 8.0
+    assert call(ledger, "DELETE", "/transactions/6") == (200, {"deleted": 6})
+    assert call(ledger, "GET", "/transactions/6")[0] == 404
+
+
+@pytest.mark.parametrize("path", ["/transactions", "/accounts/1/history", "/reports/aging", "/reports/open-items"])
+def test_page_size_is_bounded(ledger, path):
+    assert call(ledger, "GET", path, {"limit": [str(MAX_PAGE_SIZE)]})[0] == 200
+    status, body = call(ledger, "GET", path, {"limit": [str(MAX_PAGE_SIZE + 1)]})
+    assert status == 400 and body["error"] == f"limit must be at most {MAX_PAGE_SIZE}"
+    assert call(ledger, "GET", path, {"limit": ["-1"]})[0] == 400
+    assert call(ledger, "GET", path, {"limit": ["ten"]})[0] == 400
+
+
+def test_paging_transactions(ledger):
+    status, body = call(ledger, "GET", "/transactions", {"offset": ["1"], "limit": ["2"]})
+    assert status == 200 and body["total"] == 5
+    assert [txn["id"] for txn in body["transactions"]] == [2, 3]
+
+
+def test_bulk_rejects_the_whole_batch_for_one_bad_entry(ledger):
+    status, body = call(ledger, "POST", "/transactions/bulk", body={"transactions": [entry(), entry(amount=0)]})
+    assert status == 400 and body["error"].startswith("transactions[1]: ")
+    assert len(ledger) == 5
+    status, body = call(ledger, "POST", "/transactions/bulk", body={"transactions": [entry()] * (MAX_BATCH_SIZE + 1)})
+    assert status == 413 and len(ledger) == 5
+
+
+def test_batch_reports_each_call_on_its_own(ledger):
+    status, body = call(ledger, "POST", "/batch", body={"requests": [
+        {"path": "/transactions/1"},
+        {"path": "/transactions/99"},
+        {"method": "POST", "path": "/transactions", "body": entry(9.0)},
+        {"path": "/transactions?limit=5000"},
+        {"path": "/export"},
+        {"method": "POST", "path": "/batch", "body": {"requests": []}},
+    ]})
+    assert status == 200
+    assert [response["status"] for response in body["responses"]] == [200, 404, 201, 400, 400, 400]
+    assert len(ledger) == 6
+    assert call(ledger, "POST", "/batch", body={"requests": [{"path": "/health"}] * (MAX_BATCH_SIZE + 1)})[0] == 413
+
+
+def test_reports_refuse_a_currency_without_rates(ledger):
+    assert call(ledger, "GET", "/reports/balance-sheet")[0] == 200
+    assert call(ledger, "GET", "/reports/balance-sheet", {"currency": ["usd"]})[0] == 400
+    status, body = call(ledger, "GET", "/reports/balance-sheet", {"currency": ["USD"]})
+    assert status == 422 and body["error"] == "no exchange rate for USD"
@@ -0,0 +1,61 @@
+import pytest
+
+from accounts import line_item_options, sub_classification_options
+from assistant import FALLBACK_RESPONSE, AccountingAssistant, build_documents
+from ledger import LedgerStore, LedgerTotals
+
+LEARNING = {"Basics": """
+    ### Double Entry
+    Every transaction is recorded twice, as a debit in one account and a credit in another.
+    """}
+
+
+def posting(name, acc_type, sub, line_item, amount):
+    return {"name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": amount}
+
+
+@pytest.fixture
+def assistant():
+    return AccountingAssistant(build_documents(LEARNING, sub_classification_options, line_item_options))
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.json"), {"totals": LedgerTotals.build})
+    store.add_many([
+        {"date": "2026-01-02", "description": "capital", "accounts": [
+            posting("Cash", "Asset", "Current Assets", "Cash and Cash Equivalents", 5000.0),
+            posting("Capital", "Equity", "Capital", "Not Applicable", 5000.0)]},
+        {"date": "2026-01-03", "description": "supplier credit", "accounts": [
+            posting("Inventory", "Asset", "Current Assets", "Inventory", 2000.0),
+            posting("Supplier", "Liability", "Current Liabilities", "Trade Payables", 2000.0)]},
+    ])
+    return store
+
+
+def ask(assistant, store, question):
+    return assistant.answer(question, store.view("totals"), store.accounts)
+
+
+def test_questions_about_the_books_are_answered_from_the_ledger(assistant, store):
+    assert ask(assistant, store, "What is my current ratio?") == \
+        "Your **Current Ratio** is **3.50** (Current Assets / Current Liabilities)."
+    assert ask(assistant, store, "How much cash do I have?") == "Your **Cash balance** is **₹5,000.00**."
+    assert ask(assistant, store, "What is the balance of inventory?") == "The balance of **Inventory** is **₹2,000.00**."
+
+
+def test_definitions_go_to_retrieval_even_when_they_name_a_total(assistant, store):
+    # No "my", "total", "balance", ... so the glossary answers rather than the ledger
+    answer = ask(assistant, store, "What are current assets?")
+    assert answer.startswith("**Current Assets** (sub-classification of Asset)")
+    assert ask(assistant, store, "explain double entry").startswith("**Double Entry**")
+    assert ask(assistant, store, "What is a balance sheet?").startswith("A balance sheet shows")
+
+
+def test_unrelated_questions_fall_back(assistant, store):
+    assert ask(assistant, store, "what's the weather like in Paris") == FALLBACK_RESPONSE
+
+
+def test_ratios_on_an_empty_ledger_say_so(assistant, tmp_path):
+    empty = LedgerStore(str(tmp_path / "empty.json"), {"totals": LedgerTotals.build})
+    assert ask(assistant, empty, "what is my quick ratio").startswith("No transactions recorded yet")
@@ -0,0 +1,106 @@
+import json
+import random
+
+import pytest
+
+from audit import read_checkpoints, set_actor, transaction_history, verify_full, verify_ledger, verify_quick
+from ledger import LedgerStore
+from test_ledger import transaction
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.json"))
+    store.audit.checkpoint_interval = 4
+    rng = random.Random(11)
+    set_actor("alice")
+    for n in range(10):
+        store.add(transaction(rng, n))
+    store.replace(3, transaction(rng, 10))
+    store.delete(5)
+    store.undo()
+    set_actor(None)
+    return store
+
+
+def lines(store):
+    with open(store.audit.path, "rb") as f:
+        return f.read().splitlines(keepends=True)
+
+
+def rewrite(store, n, edit):
+    # Edit entry n in place, keeping its length so checkpoint offsets still line up
+    entries = lines(store)
+    entry = json.loads(entries[n])
+    edit(entry)
+    line = (json.dumps(entry) + "\n").encode()
+    assert len(line) == len(entries[n])
+    entries[n] = line
+    with open(store.audit.path, "wb") as f:
+        f.write(b"".join(entries))
+
+
+def same_length(text):
+    return "x" * len(text)
+
+
+def test_an_untouched_trail_and_ledger_verify_both_ways(store):
+    for result in (verify_quick(store.audit), verify_full(store.audit)):
+        assert result["problem"] is None
+        assert result["entries"] == 14          # the start record, 10 adds, a replace, a delete and its undo
+        assert verify_ledger(store, result) == []
+    quick = verify_quick(store.audit)
+    assert quick["checkpoint"] == 12 and quick["checked"] == 1 + 2
+
+
+def test_full_check_names_the_first_edited_entry(store):
+    rewrite(store, 6, lambda entry: entry.update(actor=same_length(entry["actor"])))
+    problem = verify_full(store.audit)["problem"]
+    assert problem["entry"] == 6 and "does not match its hash" in problem["reason"]
+
+
+def test_quick_check_proves_the_newest_checkpointed_entry(store):
+    rewrite(store, 11, lambda entry: entry.update(actor=same_length(entry["actor"])))
+    problem = verify_quick(store.audit)["problem"]
+    assert problem["entry"] == 11 and "checkpoint 12" in problem["reason"]
+
+
+def test_quick_check_rehashes_the_entries_since_the_checkpoint(store):
+    rewrite(store, 13, lambda entry: entry.update(actor=same_length(entry["actor"])))
+    assert verify_quick(store.audit)["problem"]["entry"] == 13
+
+
+def test_checkpoint_with_a_forged_root_is_caught(store):
+    checkpoints = read_checkpoints(store.audit.checkpoint_path)
+    checkpoints[-1]["root"] = "0" * 64
+    with open(store.audit.checkpoint_path, "w") as f:
+        f.write("".join(json.dumps(checkpoint) + "\n" for checkpoint in checkpoints))
+    assert "do not fold to its root" in verify_quick(store.audit)["problem"]["reason"]
+    assert "checkpoint 12 disagrees" in verify_full(store.audit)["problem"]["reason"]
+
+
+def test_truncation_is_caught(store):
+    with open(store.audit.path, "wb") as f:
+        f.write(b"".join(lines(store)[:9]))
+    assert "truncated" in verify_quick(store.audit)["problem"]["reason"]
+    assert "truncated" in verify_full(store.audit)["problem"]["reason"]
+
+
+def test_editing_the_ledger_behind_the_trail_is_named(store):
+    with open(store.journal_path) as f:
+        journal = [json.loads(line) for line in f]
+    for entry in journal:
+        if entry["op"] == "add" and entry["id"] == 2:
+            entry["txn"]["description"] = "edited by hand"
+    with open(store.journal_path, "w") as f:
+        f.write("".join(json.dumps(entry) + "\n" for entry in journal))
+    reopened = LedgerStore(store.path, read_only=True)
+    full = verify_full(reopened.audit)
+    assert verify_ledger(reopened, full)[-1] == "transaction 2 edited since entry 2"
+    assert verify_ledger(reopened, verify_quick(reopened.audit))[0].startswith("ledger does not match the trail")
+
+
+def test_history_of_one_transaction_lists_who_changed_it(store):
+    history = transaction_history(store.audit, 5)
+    assert [entry["change"]["op"] for entry in history] == ["add", "delete", "undo"]
+    assert {entry["actor"] for entry in history} == {"alice"}
@@ -0,0 +1,68 @@
+import pytest
+
+from cash_flow import OTHER_OPERATING, UNALLOCATED, CashFlowIndex, classify_cash_movements
+from ledger import LedgerStore
+
+CASH = ("Cash", "Asset", "Current Assets", "Cash and Cash Equivalents")
+SALES = ("Sales", "Equity", "Incomes", "Revenue from Operations")
+RENT = ("Rent", "Equity", "Expenses", "Other Expenses")
+MACHINE = ("Machine", "Asset", "Non-Current Assets", "Property, Plant & Equipment")
+LOAN = ("Bank Loan", "Liability", "Non-Current Liabilities", "Borrowings")
+INTEREST = ("Interest", "Equity", "Expenses", "Finance Costs")
+STOCK = ("Stock", "Asset", "Current Assets", "Inventory")
+SUPPLIER = ("Supplier", "Liability", "Current Liabilities", "Trade Payables")
+PREPAID = ("Prepaid", "Asset", "Current Assets", "Other Current Assets")
+
+
+def entry(*postings):
+    return {"date": "2026-02-01", "description": "entry", "accounts": [
+        {"name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": amount}
+        for (name, acc_type, sub, line_item), amount in postings
+    ]}
+
+
+@pytest.mark.parametrize("txn, expected", [
+    (entry((CASH, 900.0), (SALES, 900.0)), [("Operating", "Cash received from customers", 900.0)]),
+    (entry((RENT, -200.0), (CASH, -200.0)), [("Operating", "Other operating cash flows", -200.0)]),
+    (entry((MACHINE, 5000.0), (CASH, -5000.0)), [("Investing", "Property, plant & equipment", -5000.0)]),
+    (entry((CASH, 8000.0), (LOAN, 8000.0)), [("Financing", "Long-term borrowings", 8000.0)]),
+    (entry((INTEREST, -80.0), (CASH, -80.0)), [("Financing", "Interest paid", -80.0)]),
+    (entry((SUPPLIER, -300.0), (CASH, -300.0)), [("Operating", "Cash paid to suppliers", -300.0)]),
+])
+def test_the_other_side_of_the_entry_decides_the_line(txn, expected):
+    assert classify_cash_movements(txn) == expected
+
+
+def test_entries_without_cash_move_nothing():
+    assert classify_cash_movements(entry((STOCK, 300.0), (SUPPLIER, 300.0))) is None
+
+
+def test_a_split_entry_allocates_each_counter_posting():
+    movements = classify_cash_movements(entry((CASH, -1000.0), (STOCK, 600.0), (PREPAID, 400.0)))
+    assert sorted(movements) == [("Operating", "Cash paid to suppliers", -600.0), (*OTHER_OPERATING, -400.0)]
+
+
+def test_whatever_an_unbalanced_entry_leaves_over_is_unallocated():
+    movements = classify_cash_movements(entry((CASH, 1000.0), (SALES, 700.0)))
+    assert sorted(movements) == [("Operating", "Cash received from customers", 700.0), (*UNALLOCATED, 300.0)]
+
+
+def test_statement_follows_edits_and_deletes(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.json"), {"cash_flow": CashFlowIndex.build})
+    sale, machine, _ = store.add_many([
+        entry((CASH, 900.0), (SALES, 900.0)),
+        entry((MACHINE, 5000.0), (CASH, -5000.0)),
+        entry((STOCK, 300.0), (SUPPLIER, 300.0)),
+    ])
+    statement = store.view("cash_flow").statement()
+    assert statement == {
+        "Operating": [("Cash received from customers", 900.0)],
+        "Investing": [("Property, plant & equipment", -5000.0)],
+        "Financing": []
+    }
+    store.replace(sale, entry((CASH, 8000.0), (LOAN, 8000.0)))
+    store.delete(machine)
+    assert store.view("cash_flow").statement() == {
+        "Operating": [], "Investing": [], "Financing": [("Long-term borrowings", 8000.0)]
+    }
+    assert store.view("cash_flow").statement() == CashFlowIndex.build(store.items()).statement()
@@ -0,0 +1,91 @@
+import random
+
+import pytest
+
+from comparatives import (
+    baseline_period, comparative_periods, comparative_statement, period_column, period_label, ratio_series,
+    report_period_totals
+)
+from ledger import LedgerStore, LedgerTotals, PeriodTotals, date_month, ratio_values
+from test_ledger import transaction
+
+CASH = ("Cash", "Asset", "Current Assets", "Cash and Cash Equivalents")
+CAPITAL = ("Capital", "Equity", "Capital", "Not Applicable")
+SALES = ("Sales", "Equity", "Incomes", "Revenue from Operations")
+RENT = ("Rent", "Equity", "Expenses", "Other Expenses")
+
+
+def entry(day, *postings):
+    return {"date": day, "description": "entry", "accounts": [
+        {"name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": amount}
+        for (name, acc_type, sub, line_item), amount in postings
+    ]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.json"), {"totals": LedgerTotals.build, "period_totals": PeriodTotals.build})
+    store.add_many([
+        entry("2026-01-05", (CASH, 1000.0), (CAPITAL, 1000.0)),
+        entry("2026-01-20", (CASH, 300.0), (SALES, 300.0)),
+        entry("2026-02-10", (CASH, 500.0), (SALES, 500.0)),
+        entry("2026-02-15", (RENT, -200.0), (CASH, -200.0)),
+    ])
+    return store
+
+
+def row(table, line_item):
+    return table[table["Line Item"] == line_item].iloc[0]
+
+
+def test_labels_and_baselines():
+    month = date_month("2026-02-10")
+    assert period_label(month, 1) == "2026-02"
+    assert period_label(month // 3, 3) == "2026 Q1"
+    assert period_label(month // 12, 12) == "2026"
+    assert baseline_period(month, 1, "Previous period") == month - 1
+    assert baseline_period(month // 3, 3, "Same period last year") == month // 3 - 4
+    assert comparative_periods(10, 3) == [8, 9, 10]
+
+
+def test_months_side_by_side_with_change_against_the_baseline(store):
+    totals, missing = report_period_totals(store)
+    assert missing == []
+    current = date_month("2026-03-01")
+    january, february = date_month("2026-01-01"), date_month("2026-02-01")
+    columns = [period_column(totals, 1, period, current) for period in (january, february)]
+
+    income = comparative_statement("Income Statement", columns, ["Jan", "Feb"], columns[0], "Jan")
+    assert row(income, "Total Revenue")[["Jan", "Feb"]].tolist() == [300.0, 500.0]
+    assert row(income, "Total Expenses")[["Jan", "Feb"]].tolist() == [0.0, 200.0]
+    net = row(income, "Net Income")
+    assert (net["Jan"], net["Feb"], net["Change vs Jan"], net["Change %"]) == (300.0, 300.0, 0.0, 0.0)
+
+    balance = comparative_statement("Balance Sheet", columns, ["Jan", "Feb"], columns[0], "Jan")
+    assert row(balance, "Cash and Cash Equivalents")[["Jan", "Feb"]].tolist() == [1300.0, 1600.0]
+    assert row(balance, "Total Equity")[["Jan", "Feb"]].tolist() == [1300.0, 1600.0]
+    assert row(balance, "Cash and Cash Equivalents")["Change %"] == pytest.approx(300 / 1300 * 100)
+
+
+def test_ratio_series_matches_the_single_period_ratios_at_each_period_end(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.json"), {"period_totals": PeriodTotals.build})
+    rng = random.Random(9)
+    store.add_many([transaction(rng, n) for n in range(120)])
+    current = date_month("2027-01-01")
+    for months in (1, 3):
+        labels, series = ratio_series(store.view("period_totals"), months, current)
+        first = min(date_month(txn["date"]) for txn in store) // months
+        assert len(labels) == len(series["Current Ratio"])
+        for offset, label in enumerate(labels):
+            upto = [(txn["id"], txn) for txn in store if date_month(txn["date"]) // months <= first + offset]
+            expected = ratio_values(LedgerTotals.build(upto).summary())
+            for name, values in series.items():
+                assert values[offset] == pytest.approx(expected[name]), (label, name)
+
+
+def test_period_totals_are_a_copy(store):
+    totals, _ = report_period_totals(store)
+    cells = dict(totals.cells)
+    store.add(entry("2026-03-01", (CASH, 50.0), (SALES, 50.0)))
+    assert dict(totals.cells) == cells
+    assert dict(store.view("period_totals").cells) != cells
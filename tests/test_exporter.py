@@ -0,0 +1,64 @@
+import csv
+import gzip
+import io
+import json
+import random
+
+import pytest
+
+from exporter import EXPORT_COLUMNS, export_postings, posting_rows
+from ledger import LedgerStore
+from test_ledger import transaction
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.json"))
+    rng = random.Random(10)
+    store.add_many([transaction(rng, n) for n in range(60)])
+    store.add({"description": "undated", "accounts": [
+        {"name": "Cash", "type": "Asset", "sub": "Current Assets", "line_item": "Cash and Cash Equivalents", "amount": 5.0, "currency": "USD"},
+        {"name": "Capital", "type": "Equity", "sub": "Capital", "line_item": "Share Capital", "amount": 5.0, "currency": "USD"},
+    ]})
+    return store
+
+
+def test_filters_pick_postings_by_type_and_transactions_by_date(store):
+    columns = ("Transaction ID", "Date", "Account Type", "Amount")
+    rows = list(posting_rows(store, columns, account_types=["Liability"], start="2026-03-01", end="2026-05-31"))
+    expected = [
+        (txn["id"], txn["date"], acc["type"], acc["amount"])
+        for txn in store if txn.get("date") and "2026-03-01" <= txn["date"] <= "2026-05-31"
+        for acc in txn["accounts"] if acc["type"] == "Liability"
+    ]
+    assert rows == expected and rows
+    # Undated transactions only show up when no date range is given
+    assert (61, "", "Asset", 5.0) in list(posting_rows(store, columns))
+    assert all(row[0] != 61 for row in posting_rows(store, columns, start="2000-01-01"))
+
+
+def test_chunks_cover_the_ledger_once_in_order(store):
+    every = list(posting_rows(store, ("Transaction ID",), chunk_size=7))
+    assert every == [(txn["id"],) for txn in store for _ in txn["accounts"]]
+
+
+@pytest.mark.parametrize("file_format", ["csv", "jsonl"])
+def test_gzip_round_trip(store, file_format):
+    columns = list(EXPORT_COLUMNS)
+    out = io.BytesIO()
+    count = export_postings(store, out, file_format, columns, compress=True, account_types=["Asset"])
+    text = gzip.decompress(out.getvalue()).decode("utf-8")
+    if file_format == "csv":
+        header, *records = list(csv.reader(io.StringIO(text)))
+        assert header == columns
+    else:
+        records = [[str(value) for value in json.loads(line).values()] for line in text.splitlines()]
+    expected = [[str(value) for value in row] for row in posting_rows(store, columns, account_types=["Asset"])]
+    assert len(records) == count == len(expected)
+    assert records == expected
+    assert ["61", "", "undated", "Asset", "Current Assets", "Cash and Cash Equivalents", "Cash", "5.0", "USD", "", ""] in records
+
+
+def test_unknown_format_is_refused(store):
+    with pytest.raises(ValueError):
+        export_postings(store, io.BytesIO(), "xml")
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from cash_flow import CashFlowIndex
+from fx import RateTable, day_ordinal, posting_factor, posting_frame_builder, report_cash_flow, report_totals
+from ledger import LedgerStore, LedgerTotals
+
+CASH = ("Cash", "Asset", "Current Assets", "Cash and Cash Equivalents")
+CAPITAL = ("Capital", "Equity", "Capital", "Not Applicable")
+SALES = ("Sales", "Equity", "Incomes", "Revenue from Operations")
+
+
+def entry(day, *postings):
+    return {"date": day, "description": "entry", "accounts": [
+        dict({"name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": amount},
+             **({"currency": currency} if currency else {}))
+        for (name, acc_type, sub, line_item), amount, currency in postings
+    ]}
+
+
+@pytest.fixture
+def rates(tmp_path):
+    rates = RateTable(str(tmp_path / "ledger.rates.csv"))
+    rates.add("2026-01-01", "USD", 80.0)
+    rates.add("2026-03-01", "USD", 90.0)
+    return rates
+
+
+@pytest.fixture
+def store(tmp_path, rates):
+    return LedgerStore(str(tmp_path / "ledger.json"), {
+        "totals": LedgerTotals.build, "cash_flow": CashFlowIndex.build, "fx_postings": posting_frame_builder(rates)
+    })
+
+
+def test_rates_apply_from_their_date_on(rates):
+    days = np.array([day_ordinal(value) for value in ["2025-06-01", "2026-01-01", "2026-02-28", "2026-03-02"]])
+    assert rates.to_base("USD", days).tolist() == [80.0, 80.0, 80.0, 90.0]
+    assert rates.to_base("INR", days).tolist() == [1.0] * 4
+    assert np.isnan(rates.to_base("EUR", days)).all()
+
+
+def test_totals_convert_each_posting_at_its_own_date(store):
+    store.add_many([
+        entry("2026-02-01", (CASH, 10.0, "USD"), (CAPITAL, 800.0, None)),
+        entry("2026-03-05", (CASH, 1.0, "USD"), (SALES, 90.0, None)),
+    ])
+    totals, missing = report_totals(store)
+    assert missing == []
+    assert totals.total("Asset") == pytest.approx(890.0)
+    usd, _ = report_totals(store, "USD")
+    # Each INR posting at its own day's rate: 800 / 80 + 90 / 90
+    assert usd.total("Equity") == pytest.approx(11.0)
+    assert usd.total("Asset") == pytest.approx(11.0)
+    factor = posting_factor(store, "USD")
+    assert factor(1, 0) == pytest.approx(1.0) and factor(1, 1) == pytest.approx(1 / 80)
+
+
+def test_postings_without_a_rate_are_left_out_and_named(store):
+    store.add_many([
+        entry("2026-02-01", (CASH, 100.0, None), (CAPITAL, 100.0, None)),
+        entry("2026-02-01", (CASH, 5.0, "EUR"), (CAPITAL, 450.0, None)),
+    ])
+    totals, missing = report_totals(store)
+    assert missing == ["EUR"]
+    assert totals.total("Asset") == pytest.approx(100.0)
+    assert totals.total("Equity") == pytest.approx(550.0)
+    # A reporting currency with no rates at all is missing itself
+    assert report_totals(store, "GBP")[1] == ["GBP"]
+
+
+def test_base_only_ledger_reads_a_copy_of_the_running_totals(store):
+    store.add(entry("2026-02-01", (CASH, 100.0, None), (CAPITAL, 100.0, None)))
+    totals, missing = report_totals(store)
+    assert missing == [] and totals is not store.view("totals")
+    store.add(entry("2026-02-02", (CASH, 50.0, None), (CAPITAL, 50.0, None)))
+    assert totals.total("Asset") == 100.0
+    assert report_cash_flow(store) == (store.view("cash_flow").statement(), [])
+
+
+def test_cash_flow_converts_foreign_cash_at_the_day_rate(store):
+    store.add_many([
+        entry("2026-02-01", (CASH, 800.0, None), (SALES, 800.0, None)),
+        entry("2026-02-03", (CASH, 1.0, "USD"), (CAPITAL, 80.0, None)),
+    ])
+    lines, missing = report_cash_flow(store)
+    assert missing == []
+    assert lines == {
+        "Operating": [("Cash received from customers", 800.0)],
+        "Investing": [],
+        "Financing": [("Capital contributed (withdrawn)", 80.0)]
+    }
+
+
+def test_switching_reporting_currency_keeps_both_factor_arrays(store, rates):
+    store.add(entry("2026-02-01", (CASH, 10.0, "USD"), (CAPITAL, 800.0, None)))
+    frame = store.view("fx_postings")
+    frame.conversion("USD")
+    frame.conversion("INR")
+    assert set(frame.factors) == {("USD", rates.version), ("INR", rates.version)}
+    rates.add("2026-02-01", "USD", 85.0)
+    assert frame.conversion("INR").tolist() == [85.0, 1.0]
+    assert set(frame.factors) == {("INR", rates.version)}
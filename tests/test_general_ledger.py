@@ -0,0 +1,58 @@
+import os
+import random
+import shutil
+
+import pytest
+
+from accounts import classification_id, posting_class
+from general_ledger import AccountPostingIndex, account_history, account_posting_count
+from ledger import LedgerStore, LedgerTotals
+from test_ledger import transaction
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "student_transactions.json")
+VIEWS = {"totals": LedgerTotals.build, "postings": AccountPostingIndex.build}
+
+
+@pytest.fixture
+def store(tmp_path):
+    # The sample ledger books "cash" as an asset and "cash " as capital
+    path = str(tmp_path / "ledger.json")
+    shutil.copy(SAMPLE, path)
+    store = LedgerStore(path, VIEWS)
+    rng = random.Random(6)
+    store.add_many([transaction(rng, n) for n in range(50)])
+    return store
+
+
+def test_closing_balances_reconcile_with_ledger_totals(store):
+    totals = store.view("totals")
+    for record in store.accounts.active():
+        class_id = classification_id(*posting_class(record))
+        rows, count, closing_balance = account_history(store, record["id"])
+        assert count == len(rows) == account_posting_count(store, record["id"])
+        expected = sum(totals.balances.get((class_id, member), 0.0) for member in store.accounts.members(record["id"]))
+        assert closing_balance == pytest.approx(expected), record["name"]
+        if rows:
+            assert rows[-1]["Balance"] == pytest.approx(closing_balance)
+
+
+def test_capital_booked_as_cash_stays_out_of_the_cash_ledger(store):
+    cash = [record for record in store.accounts.active() if record["name"].strip() == "cash"]
+    assert sorted(record["type"] for record in cash) == ["Asset", "Equity"]
+    for record in cash:
+        rows, _, _ = account_history(store, record["id"])
+        assert {row["Classification"].split(" / ")[0] for row in rows} == {record["type"]}
+
+
+def test_a_page_carries_the_running_balance_from_earlier_pages(store):
+    account_id = max(store.accounts.active(), key=lambda record: account_posting_count(store, record["id"]))["id"]
+    everything, count, closing_balance = account_history(store, account_id)
+    page, page_count, page_closing = account_history(store, account_id, offset=5, limit=5)
+    assert page == everything[5:10]
+    assert (page_count, page_closing) == (count, closing_balance)
+
+
+def test_merged_account_from_another_classification_keeps_its_own_row(store):
+    cash = {record["type"]: record["id"] for record in store.accounts.active() if record["name"].strip() == "cash"}
+    store.merge_accounts(cash["Equity"], cash["Asset"])
+    test_closing_balances_reconcile_with_ledger_totals(store)
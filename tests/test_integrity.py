@@ -0,0 +1,59 @@
+from fx import RateTable
+from integrity import check_ledger
+
+CASH = ("cash", "Asset", "Current Assets", "Cash and Cash Equivalents")
+CAPITAL = ("Capital", "Equity", "Capital", "Not Applicable")
+
+
+def posting(account, amount, currency=None):
+    name, acc_type, sub, line_item = account
+    acc = {"name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": amount}
+    if currency:
+        acc["currency"] = currency
+    return acc
+
+
+def entry(txn_id, *postings, **fields):
+    return {"id": txn_id, "description": f"entry {txn_id}", "accounts": [posting(*args) for args in postings], **fields}
+
+
+def test_reports_each_kind_of_problem_once():
+    report = check_ledger([
+        entry(1, (CASH, 100.0), (CAPITAL, 100.0)),
+        entry(2, (CASH, 100.0), (CAPITAL, 90.0)),
+        entry(3, (CASH, 50.0)),
+        entry(4, (("Shop", "Asset", "Current Assets", "Shops"), 10.0), (CAPITAL, 10.0)),
+        entry(5, (("Cash ", "Equity", "Capital", "Not Applicable"), 5.0), (("cash", "Equity", "Capital", "Not Applicable"), -5.0)),
+    ])
+    assert report["unbalanced"][["txn_id", "imbalance"]].values.tolist() == [[2, 10.0], [3, 50.0]]
+    assert report["single_entry"]["txn_id"].tolist() == [3]
+    assert report["invalid_classification"][["txn_id", "name"]].values.tolist() == [[4, "Shop"]]
+    inconsistent = report["inconsistent_accounts"].to_dict(orient="records")
+    assert inconsistent == [{
+        "name": "cash",
+        "classifications": ["Asset / Current Assets / Cash and Cash Equivalents", "Equity / Capital / Not Applicable"],
+        "txn_ids": [1, 2, 3, 5]
+    }]
+    duplicates = report["duplicate_names"].to_dict(orient="records")
+    assert [(row["account"], row["variants"], row["txn_ids"]) for row in duplicates] == [("cash", ["Cash ", "cash"], [1, 2, 3, 5])]
+    assert report["unconvertible"].empty
+
+
+def test_rounding_within_the_tolerance_passes():
+    report = check_ledger([entry(1, (CASH, 100.004), (CAPITAL, 100.0))])
+    assert report["unbalanced"].empty
+    assert not check_ledger([entry(1, (CASH, 100.004), (CAPITAL, 100.0))], tolerance=0.001)["unbalanced"].empty
+
+
+def test_foreign_postings_are_balanced_in_the_base_currency(tmp_path):
+    rates = RateTable(str(tmp_path / "ledger.rates.csv"))
+    rates.add("2026-01-01", "USD", 80.0)
+    report = check_ledger([
+        entry(1, (CASH, 10.0, "USD"), (CAPITAL, 800.0), date="2026-02-01"),
+        entry(2, (CASH, 10.0, "USD"), (CAPITAL, 10.0), date="2026-02-01"),
+        entry(3, (CASH, 10.0, "EUR"), (CAPITAL, 900.0), date="2026-02-01"),
+    ], rates=rates)
+    assert report["unbalanced"]["txn_id"].tolist() == [2]
+    assert report["unbalanced"]["imbalance"].tolist() == [790.0]
+    # No EUR rate: neither passed nor failed, but listed with the missing currency
+    assert report["unconvertible"][["txn_id", "currencies"]].values.tolist() == [[3, ["EUR"]]]
@@ -0,0 +1,176 @@
+import json
+import random
+
+import pytest
+
+import ledger
+from general_ledger import AccountPostingIndex
+from ledger import LedgerStore, LedgerTotals, PeriodTotals
+
+VIEWS = {"totals": LedgerTotals.build, "months": PeriodTotals.build, "postings": AccountPostingIndex.build}
+ACCOUNTS = [
+    ("Cash", "Asset", "Current Assets", "Cash and Cash Equivalents"),
+    ("Stock", "Asset", "Current Assets", "Inventories"),
+    ("Bank Loan", "Liability", "Non-Current Liabilities", "Borrowings"),
+    ("Capital", "Equity", "Capital", "Share Capital"),
+    ("Sales", "Equity", "Incomes", "Revenue from Operations"),
+    ("Rent", "Equity", "Expenses", "Other Expenses"),
+]
+
+
+def transaction(rng, n):
+    # Whole amounts, so running totals and a fresh build add up to exactly the same floats
+    debit, credit = rng.sample(ACCOUNTS, 2)
+    amount = float(rng.randrange(1, 500))
+    return {
+        "date": f"2026-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+        "description": f"entry {n}",
+        "accounts": [
+            {"name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": value}
+            for (name, acc_type, sub, line_item), value in ((debit, amount), (credit, -amount))
+        ],
+    }
+
+
+def view_state(name, view):
+    # What a view answers with, leaving out keys that only hold zeros after a removal
+    if name == "totals":
+        return dict(view.balances), dict(view.postings), view.expenses_abs, view.transaction_count, view.foreign_postings
+    if name == "months":
+        return dict(view.cells), dict(view.postings), {month: value for month, value in view.expenses_abs.items() if value}
+    if name == "postings":
+        return view.postings
+    return view.value
+
+
+def assert_views_match(store):
+    with store.reading():
+        items = list(store.items())
+        for name, build in store.view_builders.items():
+            assert view_state(name, store.view(name)) == view_state(name, build(items)), name
+
+
+def assert_in_step(stores):
+    for store in stores:
+        store.refresh()
+    first, *others = stores
+    for other in others:
+        assert list(other) == list(first)
+        assert other.peek_undo() == first.peek_undo()
+        assert other.peek_redo() == first.peek_redo()
+    for store in stores:
+        assert_views_match(store)
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "ledger.json")
+
+
+def test_two_stores_on_one_file_agree_with_a_fresh_build(path, monkeypatch):
+    # Small thresholds, so slot compaction and snapshot rewrites happen many times over
+    monkeypatch.setattr(ledger, "JOURNAL_COMPACT_MIN", 8)
+    monkeypatch.setattr(ledger, "TOMBSTONE_COMPACT_MIN", 4)
+    stores = [LedgerStore(path, VIEWS), LedgerStore(path, VIEWS)]
+    rng = random.Random(0)
+    for step in range(400):
+        store = rng.choice(stores)
+        store.refresh()
+        ids = [txn["id"] for txn in store]
+        roll = rng.random()
+        if roll < 0.3 or not ids:
+            store.add(transaction(rng, step))
+        elif roll < 0.4:
+            store.add_many([transaction(rng, step) for _ in range(3)])
+        elif roll < 0.55:
+            assert store.delete(rng.choice(ids))
+        elif roll < 0.65:
+            assert store.replace(rng.choice(ids), transaction(rng, step))
+        elif roll < 0.8:
+            store.undo()
+        elif roll < 0.95:
+            store.redo()
+        else:
+            store.clear()
+        assert_in_step(stores)
+    with open(stores[0].journal_path) as f:
+        assert sum(1 for _ in f) < 400
+
+
+def test_stale_session_cannot_delete_twice(path):
+    first, second = LedgerStore(path, VIEWS), LedgerStore(path, VIEWS)
+    txn_id = first.add(transaction(random.Random(1), 0))
+    second.refresh()
+    assert first.delete(txn_id)
+    assert not second.delete(txn_id)
+    assert not second.replace(txn_id, transaction(random.Random(2), 1))
+    assert_in_step([first, second])
+
+
+def test_undo_replays_past_a_small_history_budget(path):
+    # Each delta is larger than a third of the budget, so the small store keeps only the latest one
+    big, small = LedgerStore(path, VIEWS), LedgerStore(path, VIEWS, history_budget=600)
+    rng = random.Random(3)
+    ids = big.add_many([transaction(rng, n) for n in range(3)])
+    assert_in_step([big, small])
+    for _ in ids:
+        assert big.undo()
+    assert_in_step([big, small])
+    assert len(small) == 0
+    assert big.redo()
+    assert_in_step([big, small])
+    assert small.undo()
+    assert_in_step([big, small])
+    assert len(big) == 0
+
+
+def test_clear_and_its_undo_reach_the_other_store(path):
+    first, second = LedgerStore(path, VIEWS), LedgerStore(path, VIEWS)
+    rng = random.Random(4)
+    first.add_many([transaction(rng, n) for n in range(5)])
+    second.clear()
+    assert_in_step([first, second])
+    assert len(first) == 0
+    assert first.undo()
+    assert_in_step([first, second])
+    assert len(second) == 5
+    assert second.redo()
+    assert_in_step([first, second])
+    assert len(first) == 0
+
+
+def test_file_without_ids_loads_with_the_same_ids_everywhere(path):
+    rng = random.Random(5)
+    transactions = [transaction(rng, n) for n in range(4)]
+    with open(path, "w") as f:
+        json.dump({"submitted_transactions": transactions}, f)
+    first = LedgerStore(path, VIEWS)
+    second = LedgerStore(path, VIEWS)
+    assert [txn["id"] for txn in first] == [1, 2, 3, 4]
+    assert all("account_id" in acc for txn in first for acc in txn["accounts"])
+    assert_in_step([first, second])
+    assert first.delete(2)
+    second.refresh()
+    assert 2 not in second
+    assert [txn["id"] for txn in LedgerStore(path)] == [1, 3, 4]
+
+
+def test_read_only_store_writes_nothing(path, tmp_path):
+    rng = random.Random(7)
+    with open(path, "w") as f:
+        json.dump({"submitted_transactions": [transaction(rng, n) for n in range(3)]}, f)
+    with open(path) as f:
+        before = f.read()
+    store = LedgerStore(path, VIEWS, read_only=True)
+    assert [txn["id"] for txn in store] == [1, 2, 3]
+    with pytest.raises(PermissionError):
+        store.add(transaction(rng, 3))
+    assert [entry.name for entry in tmp_path.iterdir()] == ["ledger.json"]
+    with open(path) as f:
+        assert f.read() == before
+
+    # Commits from a writer are picked up on refresh
+    writer = LedgerStore(path, VIEWS)
+    writer.add(transaction(rng, 4))
+    store.refresh()
+    assert_in_step([writer, store])
@@ -0,0 +1,44 @@
+import pickle
+
+import pandas as pd
+import plotly.graph_objects as go
+
+from render_cache import RenderCache
+
+
+def test_hits_hand_out_copies_of_the_first_build():
+    cache = RenderCache()
+    builds = []
+
+    def build():
+        builds.append(1)
+        return go.Figure(go.Bar(x=["Assets"], y=[100.0])), pd.DataFrame({"Cash": [1.0, 2.0]})
+
+    first_fig, first_df = cache.get("dashboard", 1, build, "INR")
+    first_df.loc[0, "Cash"] = -1.0
+    first_fig.update_layout(title="edited by one session")
+    fig, df = cache.get("dashboard", 1, build, "INR")
+    assert len(builds) == 1
+    assert df["Cash"].tolist() == [1.0, 2.0]
+    assert fig.layout.title.text is None
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+    # A new ledger version or other parameters build again
+    cache.get("dashboard", 2, build, "INR")
+    cache.get("dashboard", 2, build, "USD")
+    assert len(builds) == 3
+
+
+def test_budget_counts_pickled_bytes_and_evicts_least_recently_used():
+    size = len(pickle.dumps("x" * 1000, protocol=pickle.HIGHEST_PROTOCOL))
+    cache = RenderCache(budget=2 * size)
+    for name in ("a", "b"):
+        cache.get(name, 1, lambda: "x" * 1000)
+    assert cache.stats()["bytes"] == 2 * size
+    cache.get("a", 1, lambda: "unused")
+    cache.get("c", 1, lambda: "x" * 1000)
+    assert list(key[0] for key in cache.entries) == ["a", "c"]
+    # Larger than the whole budget: returned, never kept
+    assert cache.get("d", 1, lambda: "y" * 5000) == "y" * 5000
+    assert "d" not in [key[0] for key in cache.entries]
+    assert cache.stats()["bytes"] == 2 * size
@@ -0,0 +1,93 @@
+import random
+
+import pytest
+
+from ledger import LedgerStore
+from search_index import TransactionSearchIndex
+
+
+def posting(name, acc_type, amount):
+    return {"name": name, "type": acc_type, "sub": "Current Assets", "line_item": "Inventories", "amount": amount}
+
+
+def entry(description, *accounts):
+    return {"date": "2026-03-01", "description": description, "accounts": list(accounts)}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.json"), {"search": TransactionSearchIndex.build})
+    store.add_many([
+        entry("Office rent for March", posting("Rent", "Equity", 500.0), posting("Cash", "Asset", -500.0)),
+        entry("Rental income", posting("Cash", "Asset", 1200.0), posting("Rent Income", "Equity", 1200.0)),
+        entry("Stock purchase on credit", posting("Inventory", "Asset", 300.0), posting("Supplier", "Liability", 300.0)),
+        entry("Loan from bank", posting("Cash", "Asset", 10000.0), posting("Bank Loan", "Liability", 10000.0)),
+    ])
+    return store
+
+
+def test_terms_are_prefixes_and_all_must_match(store):
+    index = store.view("search")
+    assert index.search("ren") == (2, [2, 1])
+    assert index.search("ren inc") == (1, [2])
+    assert index.search("RENT march") == (1, [1])
+    assert index.search("rent loan") == (0, [])
+    assert index.search("") == (0, [])
+
+
+def test_type_and_amount_filters_narrow_a_query_or_stand_alone(store):
+    index = store.view("search")
+    assert index.search(account_types=["Liability"]) == (2, [4, 3])
+    assert index.search("cash", account_types=["Liability"]) == (1, [4])
+    assert index.search(min_amount=1000) == (2, [4, 2])
+    assert index.search("cash", min_amount=400, max_amount=1200) == (2, [2, 1])
+    assert index.search(account_types=["Liability"], max_amount=300) == (1, [3])
+
+
+def test_limit_keeps_the_newest_and_counts_every_match(store):
+    count, ids = store.view("search").search("cash", limit=2)
+    assert (count, ids) == (3, [4, 2])
+
+
+def test_an_edit_drops_the_old_terms_and_amounts(store):
+    store.replace(1, entry("Office cleaning", posting("Cleaning", "Equity", 75.0), posting("Cash", "Asset", -75.0)))
+    index = store.view("search")
+    assert index.search("march") == (0, [])
+    assert index.search("clean") == (1, [1])
+    assert 1 not in index.match_amount(400, 600)
+    assert index.search(max_amount=100) == (1, [1])
+    store.delete(1)
+    assert "clean" not in " ".join(index.sorted_tokens)
+    assert index.search(max_amount=100) == (0, [])
+
+
+def test_matches_a_brute_force_scan_through_random_edits(tmp_path):
+    words = ["rent", "rental", "cash", "stock", "store", "loan", "bank", "banner"]
+    rng = random.Random(8)
+    store = LedgerStore(str(tmp_path / "ledger.json"), {"search": TransactionSearchIndex.build})
+
+    def random_entry():
+        amount = float(rng.randrange(1, 50))
+        return entry(" ".join(rng.sample(words, 2)), posting(rng.choice(words), rng.choice(["Asset", "Liability"]), amount),
+                     posting("Cash", "Asset", -amount))
+
+    for _ in range(300):
+        ids = [txn["id"] for txn in store]
+        roll = rng.random()
+        if roll < 0.6 or not ids:
+            store.add(random_entry())
+        elif roll < 0.8:
+            store.replace(rng.choice(ids), random_entry())
+        else:
+            store.delete(rng.choice(ids))
+    index = store.view("search")
+    for query in ["ren", "ban", "st cash", "bank rent", "s"]:
+        for low, high in [(None, None), (10, 30)]:
+            terms = query.split()
+            expected = sorted((
+                txn["id"] for txn in store
+                if all(any(word.startswith(term) for word in (txn["description"] + " " + " ".join(acc["name"] for acc in txn["accounts"])).lower().split())
+                       for term in terms)
+                and (low is None or any(low <= abs(acc["amount"]) <= high for acc in txn["accounts"]))
+            ), reverse=True)
+            assert index.search(query, min_amount=low, max_amount=high) == (len(expected), expected), (query, low)
@@ -0,0 +1,117 @@
+import random
+from datetime import date
+
+import pytest
+
+from ledger import LedgerStore
+from subledger import AGING_BUCKETS, SubledgerIndex, aging_summary, counterparty_balances, open_item_rows
+
+CASH = ("Cash", "Asset", "Current Assets", "Cash and Cash Equivalents")
+SALES = ("Sales", "Equity", "Incomes", "Revenue from Operations")
+DEBTORS = ("Debtors", "Asset", "Current Assets", "Trade Receivables")
+
+
+def posting(account, amount, **fields):
+    name, acc_type, sub, line_item = account
+    return dict({"name": name, "type": acc_type, "sub": sub, "line_item": line_item, "amount": amount}, **fields)
+
+
+def invoice(customer, amount, day, due_date):
+    return {"date": day, "description": f"invoice {customer}", "accounts": [
+        posting(DEBTORS, amount, counterparty=customer, due_date=due_date), posting(SALES, amount)
+    ]}
+
+
+def payment(customer, amount, day):
+    return {"date": day, "description": f"payment {customer}", "accounts": [
+        posting(CASH, amount), posting(DEBTORS, -amount, counterparty=customer)
+    ]}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.json"), {"subledger": SubledgerIndex.build})
+    store.add_many([
+        invoice("Acme", 100.0, "2026-01-01", "2026-01-10"),
+        invoice("Acme", 200.0, "2026-01-15", "2026-02-10"),
+        invoice("Acme", 300.0, "2026-02-01", "2026-03-10"),
+        invoice("Bolt", 50.0, "2026-04-01", "2026-05-01"),
+    ])
+    return store
+
+
+def open_items(store, counterparty=None):
+    return [(row["Txn ID"], row["Open Amount"]) for row in open_item_rows(store, "Receivables", counterparty=counterparty)]
+
+
+def test_payments_settle_the_oldest_due_items_first(store):
+    payment_id = store.add(payment("Acme", 250.0, "2026-03-01"))
+    assert open_items(store, "Acme") == [(2, 50.0), (3, 300.0)]
+    # The payment gone, every item is open again
+    store.delete(payment_id)
+    assert open_items(store, "Acme") == [(1, 100.0), (2, 200.0), (3, 300.0)]
+
+
+def test_an_invoice_due_earlier_takes_the_payment_first(store):
+    store.add(payment("Acme", 250.0, "2026-03-01"))
+    store.replace(3, invoice("Acme", 300.0, "2026-02-01", "2026-01-05"))
+    assert open_items(store, "Acme") == [(3, 50.0), (1, 100.0), (2, 200.0)]
+
+
+def test_aging_buckets_by_days_past_due(store):
+    store.add(payment("Acme", 250.0, "2026-03-01"))
+    as_of = date(2026, 4, 15)
+    summary = aging_summary(store, "Receivables", as_of).iloc[0]
+    # Acme's 50 is 64 days past due, its 300 is 36, Bolt's 50 is not due yet
+    assert [summary[bucket] for bucket in AGING_BUCKETS] == [50.0, 0.0, 300.0, 50.0, 0.0]
+    assert summary["Total Open"] == 400.0
+    rows = open_item_rows(store, "Receivables", as_of=as_of)
+    assert [(row["Txn ID"], row["Days Overdue"]) for row in rows] == [(2, 64), (3, 36), (4, 0)]
+    assert len(open_item_rows(store, "Receivables", due_by=date(2026, 2, 28))) == 1
+    assert len(open_item_rows(store, "Receivables", limit=2)) == 2
+
+
+def test_overpayment_is_an_unapplied_credit(store):
+    store.add(payment("Bolt", 80.0, "2026-04-20"))
+    balances = counterparty_balances(store, "Receivables", date(2026, 4, 30)).set_index("Counterparty")
+    assert balances.loc["Bolt", "Balance"] == -30.0
+    assert balances.loc["Bolt", "Unapplied Credit"] == 30.0
+    assert balances.loc["Bolt", "Open Items"] == 0
+    assert balances.loc["Acme", "Balance"] == 600.0
+
+
+def test_random_edits_match_a_fifo_recomputation(tmp_path):
+    store = LedgerStore(str(tmp_path / "ledger.json"), {"subledger": SubledgerIndex.build})
+    rng = random.Random(12)
+    customers = ["Acme", "Bolt", "Cogs"]
+
+    def random_entry():
+        day = f"2026-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}"
+        customer = rng.choice(customers)
+        if rng.random() < 0.6:
+            return invoice(customer, float(rng.randrange(1, 100)), day, day if rng.random() < 0.5 else "2026-06-15")
+        return payment(customer, float(rng.randrange(1, 150)), day)
+
+    for _ in range(250):
+        ids = [txn["id"] for txn in store]
+        roll = rng.random()
+        if roll < 0.6 or not ids:
+            store.add(random_entry())
+        elif roll < 0.8:
+            store.replace(rng.choice(ids), random_entry())
+        else:
+            store.delete(rng.choice(ids))
+
+        for customer in customers:
+            charges = sorted(
+                (acc["due_date"], txn["id"], acc["amount"]) for txn in store for acc in txn["accounts"]
+                if acc.get("counterparty") == customer and acc["amount"] > 0
+            )
+            paid = -sum(acc["amount"] for txn in store for acc in txn["accounts"] if acc.get("counterparty") == customer and acc["amount"] < 0)
+            expected = []
+            for _, txn_id, amount in charges:
+                applied = min(paid, amount)
+                paid -= applied
+                if amount - applied > 0.005:
+                    expected.append((txn_id, pytest.approx(amount - applied)))
+            assert open_items(store, customer) == expected